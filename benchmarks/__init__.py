@@ -0,0 +1,4 @@
+"""
+性能基准测试
+在不同数据集规模与分辨率下测量生成、标注和验证的吞吐量，并与保存的基线比较
+"""
@@ -0,0 +1,290 @@
+"""
+UAV 数据集基准测试
+对 UAVDataPipeline 生成、AnnotationGenerator 标注和 DatasetValidator 验证
+在多种数据集规模与分辨率下计时，输出每秒场景数、MB/s、单场景延迟 p50/p99
+和峰值常驻内存 (RSS) 的 JSON 报告；指定基线时任何指标超出容差即判为性能回退。
+单场景延迟只对逐场景执行的阶段（LATENCY_STAGES）记录；annotate_all 与 validate
+为对整个目录的一次调用，报告中没有延迟字段，也不参与延迟比较。
+
+用法（在仓库根目录）：
+    python -m benchmarks.run_benchmarks --sizes 20 100 --resolutions 640x480 1280x720
+    python -m benchmarks.run_benchmarks --save-baseline           # 记录当前结果为基线
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.validate_dataset_fixed import DatasetValidator
+from scripts.image_processing.annotation_generator import AnnotationGenerator, process_all_scenes
+
+STAGES = ('generate', 'annotate', 'annotate_all', 'validate')
+# 逐场景计时、报告 p50/p99 延迟的阶段
+LATENCY_STAGES = ('generate', 'annotate')
+LATENCY_METRICS = ('p50_latency_ms', 'p99_latency_ms')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# 与基线比较的指标：(名称, 越大越好)
+COMPARED_METRICS = (
+    ('scenes_per_sec', True),
+    ('p99_latency_ms', False),
+    ('peak_rss_mb', False)
+)
+
+
+def compared_metrics(stage):
+    """阶段参与基线比较的指标；不记录单场景延迟的阶段不比较延迟"""
+    return [(metric, higher_is_better) for metric, higher_is_better in COMPARED_METRICS
+            if stage in LATENCY_STAGES or metric not in LATENCY_METRICS]
+
+
+def _peak_rss_mb():
+    """当前进程及其已结束子进程中的峰值常驻内存 (MB)
+
+    Linux 下 ru_maxrss 会跨 exec 继承父进程的峰值，本进程优先读取 /proc 中的 VmHWM。
+    """
+    import resource
+    unit = 1 if sys.platform == 'darwin' else 1024  # macOS 以字节为单位，Linux 以 KB 为单位
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    own = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return max(own, children) / 1e6
+
+
+def _dir_bytes(path):
+    """目录下全部文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _scene_files(data_dir):
+    """数据目录中的 (图像路径, 元数据路径)"""
+    pairs = []
+    for name in sorted(os.listdir(data_dir)):
+        if name.startswith('scene_') and name.endswith('.png'):
+            metadata_path = os.path.join(data_dir, name[:-4] + '.json')
+            if os.path.exists(metadata_path):
+                pairs.append((os.path.join(data_dir, name), metadata_path))
+    return pairs
+
+
+def _generate(data_dir, num_scenes, resolution, workers=1, batch_size=1, seed=0):
+    """生成场景，逐个产出完成时刻（用于计算单场景延迟）"""
+    pipeline = UAVDataPipeline(data_dir, seed=seed, resolution=resolution)
+    for _ in pipeline.stream_scenes(num_scenes, workers=workers, batch_size=batch_size):
+        yield time.perf_counter()
+
+
+def prepare_case(stage, data_dir, num_scenes, resolution, workers=1, batch_size=1):
+    """准备被测阶段的输入数据（不计时）"""
+    if stage == 'generate':
+        return
+    for _ in _generate(data_dir, num_scenes, resolution, workers, batch_size):
+        pass
+    if stage == 'validate':
+        process_all_scenes(data_dir, incremental=False)
+
+
+def measure_case(stage, data_dir, num_scenes, resolution, workers=1, batch_size=1):
+    """运行被测阶段并返回指标（在独立进程中调用，峰值内存只反映本阶段）"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        bytes_before = _dir_bytes(data_dir)
+        latencies = []
+        start = time.perf_counter()
+
+        if stage == 'generate':
+            last = start
+            for done in _generate(data_dir, num_scenes, resolution, workers, batch_size):
+                latencies.append(done - last)
+                last = done
+        elif stage == 'annotate':
+            generator = AnnotationGenerator()
+            for image_path, metadata_path in _scene_files(data_dir):
+                scene_start = time.perf_counter()
+                generator.generate_annotations(image_path, metadata_path)
+                latencies.append(time.perf_counter() - scene_start)
+        elif stage == 'annotate_all':
+            process_all_scenes(data_dir, incremental=False)
+        elif stage == 'validate':
+            DatasetValidator(data_dir, workers=workers, use_cache=False).validate_all()
+        else:
+            raise ValueError(f"未知的基准阶段: {stage}")
+
+        elapsed = time.perf_counter() - start
+        bytes_after = _dir_bytes(data_dir)
+
+    # 验证只读不写，以扫描的数据量计算吞吐
+    processed = bytes_after if stage == 'validate' else bytes_after - bytes_before
+    metrics = {
+        'elapsed_sec': elapsed,
+        'scenes_per_sec': num_scenes / elapsed if elapsed > 0 else None,
+        'bytes': processed,
+        'io': 'read' if stage == 'validate' else 'write',
+        'mb_per_sec': processed / 1e6 / elapsed if elapsed > 0 else None,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+    if stage in LATENCY_STAGES:
+        latencies_ms = np.array(latencies) * 1e3
+        metrics['p50_latency_ms'] = float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None
+        metrics['p99_latency_ms'] = float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None
+    return metrics
+
+
+def run_case(stage, num_scenes, resolution, workers=1, batch_size=1):
+    """在临时目录中准备数据，再于全新的子进程中测量一个用例"""
+    width, height = resolution
+    print(f"⏱️  {stage}: {num_scenes} 个场景 @ {width}x{height}")
+    with tempfile.TemporaryDirectory(prefix="uav_bench_") as data_dir:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            prepare_case(stage, data_dir, num_scenes, resolution, workers, batch_size)
+        # spawn 保证子进程的峰值内存不含准备阶段和父进程的占用
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            metrics = executor.submit(measure_case, stage, data_dir, num_scenes, resolution,
+                                      workers, batch_size).result()
+    case = {
+        'name': case_name(stage, num_scenes, resolution),
+        'stage': stage,
+        'num_scenes': num_scenes,
+        'resolution': [width, height],
+        'workers': workers,
+        'batch_size': batch_size
+    }
+    case.update(metrics)
+    latency = ""
+    if metrics.get('p50_latency_ms') is not None:
+        latency = f", p50/p99 {metrics['p50_latency_ms']:.1f}/{metrics['p99_latency_ms']:.1f} ms"
+    print(f"   {metrics['scenes_per_sec']:.1f} 场景/s, {metrics['mb_per_sec']:.2f} MB/s{latency}, "
+          f"峰值内存 {metrics['peak_rss_mb']:.0f} MB")
+    return case
+
+
+def case_name(stage, num_scenes, resolution):
+    return f"{stage}/{num_scenes}/{resolution[0]}x{resolution[1]}"
+
+
+def environment_info():
+    """结果对应的运行环境"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare_to_baseline(cases, baseline, tolerance=0.25):
+    """与基线比较，返回回退列表；基线中不存在的用例不参与比较，各阶段比较的指标见 compared_metrics"""
+    reference = {case['name']: case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in cases:
+        base = reference.get(case['name'])
+        if base is None:
+            continue
+        for metric, higher_is_better in compared_metrics(case['stage']):
+            current, expected = case.get(metric), base.get(metric)
+            if current is None or not expected:
+                continue
+            change = (current - expected) / expected
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    'case': case['name'],
+                    'metric': metric,
+                    'baseline': expected,
+                    'current': current,
+                    'change': change
+                })
+    return regressions
+
+
+def run_benchmarks(sizes, resolutions, stages=STAGES, workers=1, batch_size=1):
+    """运行全部用例组合"""
+    cases = []
+    for resolution in resolutions:
+        for num_scenes in sizes:
+            for stage in stages:
+                cases.append(run_case(stage, num_scenes, resolution, workers, batch_size))
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'environment': environment_info(),
+        'cases': cases
+    }
+
+
+def _parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    """主函数：运行基准测试，出现性能回退时以非零状态退出"""
+    parser = argparse.ArgumentParser(description="UAV 数据集基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100], help="数据集规模（场景数）")
+    parser.add_argument('--resolutions', type=_parse_resolution, nargs='+', default=[(640, 480), (1280, 720)],
+                        help="分辨率，形如 640x480")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES), help="被测阶段")
+    parser.add_argument('--workers', type=int, default=1, help="生成与验证的并行进程数")
+    parser.add_argument('--batch-size', type=int, default=1, help="批量渲染的场景数")
+    parser.add_argument('--output', default="benchmark_results.json", help="结果 JSON 路径")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线 JSON 路径")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="允许的相对退化比例")
+    parser.add_argument('--save-baseline', action='store_true', help="将本次结果保存为基线")
+    args = parser.parse_args()
+
+    print("🚀 UAV Synthetic Dataset - 基准测试")
+    print("=" * 60)
+
+    results = run_benchmarks(args.sizes, args.resolutions, args.stages, args.workers, args.batch_size)
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            regressions = compare_to_baseline(results['cases'], json.load(f), args.tolerance)
+        results['baseline'] = args.baseline
+        results['regressions'] = regressions
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 基准结果已保存: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 已保存为基线: {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        print(f"⚠️  未找到基线 {args.baseline}，跳过回退检查（使用 --save-baseline 创建）")
+
+    if regressions:
+        print("\n" + "=" * 60)
+        print(f"❌ 检测到 {len(regressions)} 项性能回退（容差 {args.tolerance:.0%}）:")
+        for r in regressions:
+            print(f"   {r['case']} {r['metric']}: {r['baseline']:.2f} → {r['current']:.2f} ({r['change']:+.0%})")
+        sys.exit(1)
+    print("✅ 未检测到性能回退")
+
+
+if __name__ == "__main__":
+    main()
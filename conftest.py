@@ -0,0 +1 @@
+"""pytest 根目录配置：使测试可以 import scripts 包"""
@@ -3,161 +3,841 @@ UAV 数据流水线框架
 纯 Python 实现，不依赖 UE4.27 API
 """
 
+import argparse
 import cv2
 import numpy as np
-import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
+from itertools import islice
+
+if __package__ in (None, ''):
+    # 以 python scripts/data_pipeline.py 直接运行时，将仓库根目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.dataset_utils.array_store import ArrayStore
+from scripts.dataset_utils.async_writer import AsyncSampleWriter
+from scripts.dataset_utils.manifest import Manifest, file_digests, params_hash
+from scripts.dataset_utils.metadata_codec import METADATA_FORMATS, MetadataCodec
+from scripts.dataset_utils.object_table import build_object_table
+from scripts.dataset_utils.scene_model import SceneObjects, as_scene_objects, with_object_list
+from scripts.dataset_utils.storage import (DirectoryWriter, EncodeStats, ImageEncoder, ShardWriter, encode_sample,
+                                           write_json_atomic)
+from scripts.dataset_utils.work_queue import LeaseQueue
+from scripts.image_processing.annotation_generator import ANNOTATION_VERSION, AnnotationGenerator
+from scripts.image_processing import (batch_renderer, camera, depth_renderer, flight_sequence, frame_pool, spatial_index,
+                                      tiled_renderer)
+from scripts.instrumentation import PROFILE_MODES, Metrics, RunProfiler
+from scripts.streaming import StreamPipeline, bounded_map
+
+MANIFEST_FILE = "manifest.json"
+# 场景元数据格式版本，参与参数哈希；元数据字段变化时递增
+SCENE_FORMAT_VERSION = 3
+METRICS_JSON_FILE = "metrics.json"
+METRICS_PROM_FILE = "metrics.prom"
+SCENE_TYPES = ['urban', 'forest', 'open_field', 'industrial', 'residential']
+# 相机高度不低于场景最高物体顶面的倍数，保证物体位于相机下方且排布大致落在画面内
+CAMERA_CLEARANCE = 3
+# 飞行序列世界的种子 spawn_key 前缀，与场景的 [scene_id] 区分
+WORLD_SPAWN_KEY = 1 << 31
+
+def camera_altitude(scene_id, objects):
+    """场景相机高度：随场景 ID 递增的 100 + 50 * scene_id，且不低于最高物体顶面的 CAMERA_CLEARANCE 倍"""
+    tallest = int((objects.positions[:, 2] + objects.sizes[:, 2]).max()) if len(objects) else 0
+    return max(100 + scene_id * 50, CAMERA_CLEARANCE * tallest)
 
 class UAVDataPipeline:
     """UAV 数据生成流水线"""
     
-    def __init__(self):
-        self.output_dir = "generated_data"
-        os.makedirs(self.output_dir, exist_ok=True)
+    def __init__(self, output_dir="generated_data", seed=None, storage='files', samples_per_shard=1000,
+                 array_split=None, image_format='png', png_compression=None, writer_threads=0, resume=False,
+                 depth_format='uint16', resolution=(640, 480), tile_size=None, tile_layout='stream',
+                 objects_per_scene=None, metadata_format='json'):
+        # 输出目录；为 None 时只在内存中创建和渲染场景（如 VirtualUAVDataset），不写盘
+        self.output_dir = output_dir
+        # 输出分辨率 (宽, 高)
+        self.width, self.height = resolution
+        # 分块渲染（超高分辨率）：tile_size 为分块边长，'stream' 逐条带流式写成单个 PNG，
+        # 'tiles' 每块写成一个文件；峰值内存只与分块大小有关
+        if tile_layout not in tiled_renderer.TILE_LAYOUTS:
+            raise ValueError(f"不支持的分块布局: {tile_layout}")
+        if tile_size is not None and tile_layout == 'stream' and image_format != 'png':
+            raise ValueError("流式分块输出只支持 PNG")
+        self.tile_size = tile_size
+        self.tile_layout = tile_layout
+        # 每个场景的物体数，None 为各场景类型的默认数量（城市 5、森林 8、其他 3）
+        self.objects_per_scene = objects_per_scene
+        self.png_compression = png_compression
+        # 存储布局：'files' 为逐文件平铺目录，'shards' 为带索引的 tar 分片
+        self.storage = storage
+        self.samples_per_shard = samples_per_shard
+        # 指定划分名时，深度图 (float32) 与掩码 (uint16) 存入内存映射 .npy 而非 PNG
+        self.array_split = array_split
+        # 图像编码格式（png / webp 无损 / npy）；writer_threads > 0 时由后台线程池编码写盘
+        self.encoder = ImageEncoder(image_format, png_compression)
+        # 场景元数据与标注的格式：'json'（indent=2）或紧凑的 'binary'（见 metadata_codec）
+        self.metadata_codec = MetadataCodec(metadata_format)
+        self.writer_threads = writer_threads
+        self.write_stats = EncodeStats()
+        # 各阶段耗时与计数，见 save_metrics
+        self.metrics = Metrics()
+        # 根种子：未指定时随机抽取一次，保证同一次运行内与 worker 数无关；
+        # 续跑时沿用清单中的根种子，否则每个场景的参数哈希都会变化而全部重新生成
+        if seed is None and resume and output_dir is not None:
+            seed = self._manifest_root_seed()
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        # 续跑：清单中已完成且参数哈希未变的场景直接跳过
+        self.resume = resume
+        # 标注深度图输出类型（uint16 / float32）
+        self.depth_format = depth_format
+        self.annotator = None
+        # 多进程协同生成时本进程清单 part 的名称（见 generate_shared）
+        self.manifest_part = None
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
         print("🚀 UAV 数据流水线初始化完成")
     
-    def generate_synthetic_scenes(self, num_scenes=5):
-        """生成合成场景数据"""
-        print(f"\n🎨 生成 {num_scenes} 个合成场景...")
-        
-        scenes = []
-        for i in range(num_scenes):
-            scene_data = self._create_scene(i)
-            scenes.append(scene_data)
-            
-            # 生成场景图像
-            scene_image = self._render_scene(scene_data)
-            image_path = f"{self.output_dir}/scene_{i:03d}.png"
-            cv2.imwrite(image_path, scene_image)
-            
-            # 保存场景元数据
-            meta_path = f"{self.output_dir}/scene_{i:03d}.json"
-            with open(meta_path, 'w') as f:
-                json.dump(scene_data, f, indent=2)
-            
-            print(f"✅ 场景 {i} 生成完成: {image_path}")
-        
-        return scenes
-    
-    def _create_scene(self, scene_id):
-        """创建场景数据"""
-        scene_types = ['urban', 'forest', 'open_field', 'industrial', 'residential']
-        scene_type = scene_types[scene_id % len(scene_types)]
-        
-        return {
+    def _manifest_root_seed(self):
+        """已有清单中记录的根种子；清单为空时返回 None，条目缺少种子或种子不一致时抛出 ValueError"""
+        seeds = Manifest(os.path.join(self.output_dir, MANIFEST_FILE)).root_seeds()
+        if None in seeds or len(seeds) > 1:
+            raise ValueError(f"{self.output_dir} 的清单中没有唯一的根种子，--resume 需要指定与原运行相同的 --seed")
+        if not seeds:
+            return None
+        seed = seeds.pop()
+        print(f"♻️  续跑沿用清单中的根种子 {seed}")
+        return seed
+    
+    def generate_synthetic_scenes(self, num_scenes=5, workers=1, annotate=False, batch_size=1):
+        """生成合成场景数据
+
+        workers > 1 时使用进程池并行生成，结果按场景 ID 顺序返回。
+        annotate=True 时在同一次渲染中直接生成掩码、深度图和边界框，
+        无需再运行 annotation_generator 重新读取 PNG。
+        batch_size > 1 时每批场景使用向量化批量渲染器一次性光栅化。
+        大规模生成请使用 stream_scenes，避免在内存中保留全部场景。
+        """
+        return list(self.stream_scenes(num_scenes, workers=workers, annotate=annotate, batch_size=batch_size))
+    
+    def iter_scenes(self, num_scenes, start=0):
+        """惰性逐个创建场景字典（不渲染、不写盘）"""
+        for scene_id in range(start, start + num_scenes):
+            yield with_object_list(self._create_scene(scene_id))
+    
+    def regenerate_scene(self, scene_id, seed=None):
+        """按场景 ID 单独重建一个场景，返回 (scene_data, image)
+
+        每个场景只由 (根种子, spawn_key) 决定，与其他场景和 worker 数无关，重建耗时为 O(1)。
+        seed 可传入场景元数据中保存的 'seed' 字典，以从冷归档（只保留元数据或清单）
+        恢复像素；默认使用本流水线的根种子。除 timestamp 外，重建结果与原始输出逐位一致。
+        """
+        scene_data = self._create_scene(scene_id, seed=seed)
+        return with_object_list(scene_data), self._render_scene(scene_data)
+    
+    def generate_shared(self, num_scenes, chunk_size=100, lease_ttl=60.0, workers=1, annotate=False, batch_size=1,
+                        wait=True):
+        """与其他进程 / 主机协同生成同一数据集，返回本进程生成的场景数
+
+        场景 ID 按 chunk_size 分块，通过输出目录中的租约文件认领（见 work_queue.LeaseQueue），
+        持有期间定期心跳；进程退出后其租约在 lease_ttl 秒后过期并被其他进程回收。
+        任意数量的进程可随时加入或退出，每个块只记一次完成。wait=True 时在其他进程
+        仍持有租约的块全部完成前保持等待，以便接手崩溃进程的块。
+        首个进程的根种子与分块参数记入 .leases/run.json，后加入的进程沿用同一根种子。
+        各进程写入各自的清单 part，全部完成后合并为 manifest.json。
+        """
+        if self.storage == 'shards':
+            raise ValueError("分片存储不支持多进程协同写入，请使用 storage='files'")
+        queue = LeaseQueue(self.output_dir, num_scenes, chunk_size, lease_ttl)
+        run = queue.join({'root_seed': self.seed, 'num_scenes': num_scenes, 'chunk_size': chunk_size})
+        if (run['num_scenes'], run['chunk_size']) != (num_scenes, chunk_size):
+            raise ValueError(f"输出目录中已有的协同运行使用 num_scenes={run['num_scenes']}, "
+                             f"chunk_size={run['chunk_size']}；请使用相同参数或清空 {queue.lease_dir}")
+        if run['root_seed'] != self.seed:
+            # 所有进程必须使用同一根种子，后加入的进程沿用首个进程的种子
+            print(f"⚠️  沿用已有协同运行的根种子 {run['root_seed']}")
+            self.seed = run['root_seed']
+        print(f"🤝 协同生成 {num_scenes} 个场景（{queue.num_chunks} 块），worker: {queue.worker_id}")
+        if annotate and self.array_split:
+            # 共享的 .npy 只由一个进程预分配，避免并发创建互相截断
+            queue.setup_once('array_store', lambda: ArrayStore.open_or_create(
+                self.output_dir, self.array_split, num_scenes, self.height, self.width))
+        
+        generated = 0
+        self.manifest_part = queue.worker_id
+        try:
+            while True:
+                chunk = queue.claim()
+                if chunk is None:
+                    if not wait or queue.all_done():
+                        break
+                    time.sleep(min(5.0, lease_ttl / 3))
+                    continue
+                name = queue.chunk_name(chunk)
+                with queue.hold(name) as lost:
+                    for _ in self._stream_scenes(num_scenes, workers=workers, annotate=annotate,
+                                                 batch_size=batch_size, scene_ids=queue.chunk_range(chunk)):
+                        generated += 1
+                if lost.is_set():
+                    print(f"⚠️  {name} 的租约已被其他进程回收（输出内容相同，可安全重复写入）")
+                queue.complete(name)
+        finally:
+            # 各块只追加到本进程 part 的日志，结束时压实一次
+            Manifest(os.path.join(self.output_dir, MANIFEST_FILE), part=self.manifest_part).save()
+            self.manifest_part = None
+            queue.close()
+        if queue.all_done():
+            Manifest.consolidate(os.path.join(self.output_dir, MANIFEST_FILE))
+        print(f"🤝 本进程生成 {generated} 个场景")
+        return generated
+    
+    def stream_scenes(self, num_scenes=5, workers=1, annotate=False, batch_size=1, queue_size=8, scene_ids=None):
+        """流式生成场景：create → render → annotate → write
+
+        各阶段由有界队列串联，逐个产出已写出的场景字典；下游消费慢时上游阻塞，
+        调用方不保留结果时峰值内存与场景总数无关。
+        workers > 1 时每批在进程池中完成全部阶段，在途批次数不超过 workers * queue_size。
+        每个完成的场景都记入输出目录下的 manifest.json；resume=True 时只生成缺失或过期的场景。
+        scene_ids 指定时只（重新）生成这些场景，其余已有输出保持不变。
+        产出的场景字典中 objects 为 JSON 物体列表，与写出的元数据相同。
+        """
+        for scene_data in self._stream_scenes(num_scenes, workers, annotate, batch_size, queue_size, scene_ids):
+            yield with_object_list(scene_data)
+    
+    def _stream_scenes(self, num_scenes, workers=1, annotate=False, batch_size=1, queue_size=8, scene_ids=None):
+        """stream_scenes 的内部实现，产出物体为 SceneObjects 的场景字典（只计数等内部调用不做列表转换）"""
+        if self.tile_size and (annotate or self.storage == 'shards'):
+            raise ValueError("分块渲染模式只生成图像与元数据，不支持标注和分片存储")
+        if scene_ids is not None:
+            scene_ids = sorted(set(scene_ids))
+            # 数组存储至少要容纳最大的场景 ID；已有存储只扩容、不缩小也不重建（见 ArrayStore.open_or_create）
+            num_scenes = max(num_scenes, scene_ids[-1] + 1) if scene_ids else num_scenes
+        print(f"\n🎨 生成 {len(scene_ids) if scene_ids is not None else num_scenes} 个合成场景...")
+        
+        if annotate and self.annotator is None:
+            self.annotator = AnnotationGenerator(depth_format=self.depth_format, metrics=self.metrics,
+                                                 metadata_format=self.metadata_codec.format)
+        store = None
+        if annotate and self.array_split:
+            if self.resume or scene_ids is not None:
+                store = ArrayStore.open_or_create(self.output_dir, self.array_split, num_scenes, self.height,
+                                                  self.width)
+            else:
+                store = ArrayStore.create(self.output_dir, self.array_split, num_scenes, self.height, self.width)
+        
+        self.write_stats = EncodeStats()
+        self.metrics.reset()
+        manifest = Manifest(os.path.join(self.output_dir, MANIFEST_FILE), part=self.manifest_part)
+        skipped = []
+        scene_ids = self._pending_scene_ids(scene_ids if scene_ids is not None else range(num_scenes),
+                                            annotate, manifest, skipped, store)
+        # 分片模式下由主进程统一写入，子进程只负责渲染和编码
+        writer = ShardWriter(self.output_dir, self.samples_per_shard) if self.storage == 'shards' else None
+        try:
+            for item in self._stream_results(scene_ids, workers, annotate, batch_size, queue_size, writer, manifest):
+                yield self._collect_scene(writer, manifest, annotate, *item)
+        finally:
+            if writer is not None:
+                writer.close()
+            # 协同生成时每块只关闭日志，由 generate_shared 在结束时压实
+            if self.manifest_part is None:
+                manifest.save()
+            else:
+                manifest.close()
+        if skipped:
+            print(f"⏭️  跳过 {len(skipped)} 个未变化的场景")
+            self.metrics.increment('scenes_skipped', len(skipped))
+        self.metrics.merge_encode_stats(self.write_stats.as_dict())
+        self._print_write_stats()
+    
+    def _pending_scene_ids(self, scene_ids, annotate, manifest, skipped, store=None):
+        """需要（重新）生成的场景 ID；跳过的场景 ID 追加到 skipped
+
+        给出 store（ArrayStore）时还要求该场景的数组行已写入，清单与数组存储不一致时重新生成。
+        """
+        output_dir = self.output_dir if self.storage == 'files' else None
+        for scene_id in scene_ids:
+            if (self.resume and manifest.is_current(scene_id, self._scene_params_hash(scene_id, annotate), output_dir)
+                    and (store is None or store.has_row(scene_id, scene_id))):
+                skipped.append(scene_id)
+                continue
+            yield scene_id
+    
+    def _scene_params_hash(self, scene_id, annotate):
+        """决定场景输出内容的全部参数的哈希
+
+        objects_per_scene 与非 JSON 的元数据格式只在指定时加入，未指定时已有数据集仍可 --resume。
+        """
+        params = {
+            'root_seed': self.seed,
+            'scene_id': scene_id,
+            'annotate': annotate,
+            'resolution': [self.width, self.height],
+            'image_format': self.encoder.format,
+            'encoder_params': self.encoder.params,
+            'storage': self.storage,
+            'array_split': self.array_split,
+            'annotation_version': ANNOTATION_VERSION if annotate else None,
+            'depth_format': self.depth_format if annotate else None,
+            'scene_format': SCENE_FORMAT_VERSION,
+            'tiling': [self.tile_size, self.tile_layout] if self.tile_size else None
+        }
+        if self.objects_per_scene is not None:
+            params['objects_per_scene'] = self.objects_per_scene
+        if self.metadata_codec.format != 'json':
+            params['metadata_format'] = self.metadata_codec.format
+        return params_hash(params)
+    
+    def _record_scene(self, manifest, annotate, scene_id, files=None, digests=None):
+        """将场景的输出哈希记入清单"""
+        if digests is None:
+            digests = file_digests(files)
+        manifest.record(scene_id, self._scene_seed(scene_id), self._scene_params_hash(scene_id, annotate), digests)
+    
+    def _stream_results(self, scene_ids, workers, annotate, batch_size, queue_size, writer=None, manifest=None):
+        """按场景 ID 顺序产出 (scene_data, 位置, 待主进程写入的文件, 输出哈希)"""
+        ids = iter(scene_ids)
+        batches = iter(lambda: list(islice(ids, batch_size)), [])
+        
+        if workers > 1:
+            produce = partial(self._produce_batch, annotate=annotate)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for results, stats, metrics in bounded_map(executor, produce, batches, workers * queue_size):
+                    self.write_stats.merge(stats)
+                    self.metrics.merge(metrics)
+                    yield from results
+            return
+        
+        if self.tile_size:
+            # 分块模式：渲染与写盘在同一阶段内逐条带 / 逐块交替进行，整帧不驻留内存
+            stages = [
+                ('create', self._create_batch),
+                ('write', partial(self._write_tiled_batch, stats=self.write_stats))
+            ]
+            yield from (item for results in StreamPipeline(stages, queue_size).run(batches) for item in results)
+            return
+        
+        store = self._open_array_store(annotate)
+        async_writer = None
+        if self.writer_threads > 0:
+            sink = writer if writer is not None else DirectoryWriter(self.output_dir)
+            on_written = partial(self._record_scene, manifest, annotate) if manifest is not None else None
+            async_writer = AsyncSampleWriter(sink, self.encoder, self.writer_threads,
+                                             queue_size=queue_size * batch_size, stats=self.write_stats,
+                                             on_written=on_written, on_encoded=self._release_frame,
+                                             metadata_codec=self.metadata_codec)
+        stages = [
+            ('create', self._create_batch),
+            ('render', self._render_batch),
+            ('annotate', partial(self._annotate_batch, annotate=annotate, store=store)),
+            ('write', partial(self._write_batch, stats=self.write_stats, async_writer=async_writer))
+        ]
+        try:
+            for results in StreamPipeline(stages, queue_size).run(batches):
+                yield from results
+        finally:
+            if async_writer is not None:
+                async_writer.close()
+            if store is not None:
+                store.flush()
+    
+    def _print_write_stats(self):
+        """打印各格式的编码耗时与写入字节数"""
+        stats = self.write_stats.as_dict()
+        for fmt, entry in sorted(stats['formats'].items()):
+            print(f"📦 {fmt}: {entry['files']} 个文件, {entry['bytes'] / 1e6:.2f} MB, "
+                  f"编码 {entry['encode_seconds']:.3f}s")
+        if stats['formats']:
+            print(f"💾 写盘耗时: {stats['write_seconds']:.3f}s")
+    
+    def save_metrics(self, output_dir=None):
+        """将最近一次运行的分阶段统计写为 metrics.json 和 Prometheus textfile metrics.prom"""
+        output_dir = output_dir or self.output_dir
+        json_path = os.path.join(output_dir, METRICS_JSON_FILE)
+        prom_path = os.path.join(output_dir, METRICS_PROM_FILE)
+        self.metrics.save_json(json_path)
+        self.metrics.save_prometheus(prom_path)
+        return json_path, prom_path
+    
+    def _collect_scene(self, writer, manifest, annotate, scene_data, image_path, files, digests):
+        """在主进程中接收一个已完成的场景，写入分片并记入清单
+
+        digests 为 None 表示由后台写入线程负责落盘（其回调会记入清单）。
+        """
+        if writer is not None and files is not None:
+            with self.metrics.timer('write.shard'):
+                writer.write_sample(scene_data['scene_id'], files)
+        if digests is not None:
+            self._record_scene(manifest, annotate, scene_data['scene_id'], digests=digests)
+        self.metrics.increment('scenes_generated')
+        print(f"✅ 场景 {scene_data['scene_id']} 生成完成: {image_path}")
+        return scene_data
+    
+    def _produce_batch(self, scene_ids, annotate=False):
+        """在单个进程内完成一批场景的全部阶段（进程池任务）"""
+        # 各进程以 r+ 方式映射同一组 .npy，直接写入各自的行
+        store = self._open_array_store(annotate)
+        stats = EncodeStats()
+        # 本任务的统计随结果返回主进程合并（标注器与流水线共用同一个 Metrics）
+        self.metrics.reset()
+        if self.tile_size:
+            results = self._write_tiled_batch(self._create_batch(scene_ids), stats=stats)
+        else:
+            rendered = self._render_batch(self._create_batch(scene_ids))
+            results = self._write_batch(self._annotate_batch(rendered, annotate, store), stats=stats)
+        if store is not None:
+            store.flush()
+        return results, stats.as_dict(), self.metrics.as_dict()
+    
+    def _open_array_store(self, annotate):
+        """标注且启用内存映射存储时，以可写方式打开当前划分"""
+        if annotate and self.array_split:
+            return ArrayStore.open(self.output_dir, self.array_split, mode='r+')
+        return None
+    
+    def _create_batch(self, scene_ids):
+        """阶段 create：创建一批场景字典"""
+        return [self._create_scene(scene_id) for scene_id in scene_ids]
+    
+    def _render_batch(self, batch):
+        """阶段 render：渲染一批场景，返回 [(scene_data, image)]
+
+        图像写入帧缓冲池中的缓冲，各场景编码完成后由 _release_frame 归还。
+        """
+        pool = frame_pool.shared_pool()
+        if len(batch) > 1:
+            shape = (len(batch), self.height, self.width, 3)
+            images = self.render_scenes_batch(batch, out=pool.acquire(shape, users=len(batch)))
+        else:
+            shape = (self.height, self.width, 3)
+            images = [self._render_scene(scene_data, out=pool.acquire(shape)) for scene_data in batch]
+        return list(zip(batch, images))
+    
+    def _release_frame(self, scene_id, files):
+        """样本编码完成后将其图像归还帧缓冲池"""
+        frame_pool.shared_pool().release(files[f"scene_{scene_id:03d}"])
+    
+    def _annotate_batch(self, rendered, annotate=False, store=None):
+        """阶段 annotate：基于内存中的图像生成标注，返回 [(scene_data, image, 未编码的标注文件)]"""
+        annotated = []
+        depths = None
+        if annotate and rendered:
+            # 整批场景一次性渲染深度
+            height, width = rendered[0][1].shape[:2]
+            with self.metrics.timer('annotate.depth_batch'):
+                depths = depth_renderer.render_depth_batch([scene_data for scene_data, _ in rendered], width, height)
+        for i, (scene_data, scene_image) in enumerate(rendered):
+            files = {}
+            if annotate:
+                scene_id = scene_data['scene_id']
+                image_file = f"scene_{scene_id:03d}{self.encoder.ext}"
+                annotations, mask, depth, instances = self.annotator.annotate_scene(
+                    scene_image, scene_data, image_file, f"scene_{scene_id:03d}{self.metadata_codec.ext}",
+                    depth_map=depths[i])
+                if store is not None:
+                    self.annotator.store_arrays(store, scene_id, scene_id, annotations, mask, depth, instances)
+                files = self.annotator.annotation_files(image_file, annotations, mask, depth,
+                                                        include_maps=store is None, instance_mask=instances,
+                                                        encoder=self.encoder)
+            annotated.append((scene_data, scene_image, files))
+        return annotated
+    
+    def _write_batch(self, annotated, stats=None, async_writer=None):
+        """阶段 write：编码并写出一批场景"""
+        return [self._write_scene(scene_data, scene_image, files, stats, async_writer)
+                for scene_data, scene_image, files in annotated]
+    
+    def _write_scene(self, scene_data, scene_image, annotation_files=None, stats=None, async_writer=None):
+        """编码场景图像、元数据并连同标注文件写出
+
+        有 async_writer 时交给后台线程池编码写盘；逐文件模式下直接写入输出目录；
+        分片模式下交给主进程写入。同步模式下同时返回输出哈希供主进程记入清单。
+        """
+        scene_id = scene_data['scene_id']
+        stem = f"scene_{scene_id:03d}"
+        location = f"{self.output_dir}/{stem}{self.encoder.ext}"
+        files = {stem: scene_image, f"{stem}.json": scene_data}
+        files.update(annotation_files or {})
+        
+        if async_writer is not None:
+            async_writer.submit(scene_id, files)
+            return scene_data, location, None, None
+        
+        encoded = encode_sample(files, self.encoder, stats, self.metadata_codec)
+        self._release_frame(scene_id, files)
+        files = encoded
+        if self.storage == 'shards':
+            return scene_data, f"{self.output_dir} (分片)", files, file_digests(files)
+        
+        start = time.perf_counter()
+        DirectoryWriter(self.output_dir).write_sample(scene_id, files)
+        if stats is not None:
+            stats.add_write(time.perf_counter() - start)
+        return scene_data, location, None, file_digests(files)
+    
+    def _write_tiled_batch(self, batch, stats=None):
+        """分块模式的 render + write 阶段，返回与 _write_batch 相同格式的结果"""
+        return [self._write_tiled_scene(scene_data, stats) for scene_data in batch]
+    
+    def _write_tiled_scene(self, scene_data, stats=None):
+        """按分块渲染一个场景并直接流式写盘，随后写出元数据"""
+        scene_id = scene_data['scene_id']
+        stem = f"scene_{scene_id:03d}"
+        with self.metrics.timer('render.tiled'):
+            if self.tile_layout == 'tiles':
+                tile_dir = f"{stem}_tiles"
+                location = f"{self.output_dir}/{tile_dir}/"
+                digests = {f"{tile_dir}/{name}": digest for name, digest in tiled_renderer.write_tiles(
+                    scene_data, os.path.join(self.output_dir, tile_dir), self.width, self.height,
+                    self.tile_size, self.encoder).items()}
+            else:
+                location = f"{self.output_dir}/{stem}.png"
+                compression = self.png_compression if self.png_compression is not None else 3
+                digests = {f"{stem}.png": tiled_renderer.write_streamed_png(
+                    scene_data, location, self.width, self.height, self.tile_size, compression)}
+        self.metrics.increment('scenes_rendered')
+        
+        files = encode_sample({f"{stem}.json": scene_data}, self.encoder, stats, self.metadata_codec)
+        DirectoryWriter(self.output_dir).write_sample(scene_id, files)
+        digests.update(file_digests(files))
+        return scene_data, location, None, digests
+    
+    def render_scenes_batch(self, scenes, out=None):
+        """批量渲染多个场景为 (N, H, W, 3) uint8 张量，与 _render_scene 像素一致"""
+        with self.metrics.timer('render.batch'):
+            images = batch_renderer.render_batch(scenes, width=self.width, height=self.height, out=out)
+        self.metrics.increment('scenes_rendered', len(scenes))
+        return images
+    
+    def _scene_seed(self, scene_id):
+        """场景的种子描述，写入元数据和清单：{'root_seed', 'spawn_key'}"""
+        return {'root_seed': self.seed, 'spawn_key': [scene_id]}
+    
+    def _scene_rng(self, scene_id, seed=None):
+        """每个场景独立的随机数流，等价于 SeedSequence(root_seed).spawn(n)[scene_id]
+
+        seed 为 _scene_seed 格式的字典，默认使用本流水线的根种子。
+        """
+        if seed is None:
+            seed = self._scene_seed(scene_id)
+        return np.random.default_rng(np.random.SeedSequence(seed['root_seed'], spawn_key=tuple(seed['spawn_key'])))
+    
+    def _create_scene(self, scene_id, rng=None, seed=None):
+        """创建场景数据
+
+        物体只从该场景自己的随机数流中抽取，所用种子记入元数据的 'seed' 字段。
+        """
+        scene_type = SCENE_TYPES[scene_id % len(SCENE_TYPES)]
+        if seed is None:
+            seed = self._scene_seed(scene_id)
+        if rng is None:
+            rng = self._scene_rng(scene_id, seed)
+        
+        start = time.perf_counter()
+        objects = self._generate_objects(scene_type, rng)
+        scene_data = {
             'scene_id': scene_id,
             'scene_type': scene_type,
+            'seed': seed,
             'timestamp': datetime.now().isoformat(),
             'camera_parameters': {
-                'position': [0, 0, 100 + scene_id * 50],  # 递增高度
+                'position': [0, 0, camera_altitude(scene_id, objects)],
                 'rotation': [-90, 0, 0],  # 向下看
                 'fov': 90,
-                'resolution': [640, 480]
+                'resolution': [self.width, self.height]
             },
-            'objects': self._generate_objects(scene_type),
+            'objects': objects,
             'lighting_conditions': 'daylight'
         }
+        self.metrics.add_time('create_scene', time.perf_counter() - start)
+        return scene_data
+    
+    def create_world(self, rows=4, cols=4, world_id=0):
+        """生成飞行序列使用的持久世界
+
+        rows x cols 个网格单元各随机选一种场景类型，按与单帧场景相同的规则生成物体并平移到单元中心。
+        """
+        seed = {'root_seed': self.seed, 'spawn_key': [WORLD_SPAWN_KEY, world_id]}
+        rng = self._scene_rng(None, seed)
+        cell_size = flight_sequence.WORLD_CELL_SIZE
+        cell_types = [[SCENE_TYPES[int(rng.integers(len(SCENE_TYPES)))] for _ in range(cols)] for _ in range(rows)]
+        parts = []
+        for row in range(rows):
+            for col in range(cols):
+                center = [(col + 0.5 - cols / 2) * cell_size, (row + 0.5 - rows / 2) * cell_size, 0.0]
+                parts.append(self._generate_objects(cell_types[row][col], rng).translated(center))
+        return flight_sequence.FlightWorld(cell_types, SceneObjects.concatenate(parts), cell_size, seed=seed)
     
-    def _generate_objects(self, scene_type):
-        """根据场景类型生成物体"""
-        objects = []
+    def generate_sequence(self, trajectory, world_size=(4, 4), output='video', name="sequence", queue_size=8):
+        """沿航迹 trajectory（flight_sequence.Trajectory）飞过同一个持久世界，生成时间连续的帧序列
+
+        世界只生成一次；每帧由地面纹理重投影加视野内物体的绘制得到。渲染与编码写出
+        在两个流水线阶段中重叠执行。output 为 'video'（{name}.mp4 + 逐帧跟踪标注
+        {name}_tracks.jsonl）或 'shards'（{name}_frames/ 下的 tar 分片，样本 ID 为帧号）；
+        另写出 {name}.json 记录世界、航迹与输出文件。返回该序列描述字典。
+        """
+        if output not in flight_sequence.SEQUENCE_OUTPUTS:
+            raise ValueError(f"不支持的序列输出: {output}")
+        if self.output_dir is None:
+            raise ValueError("生成飞行序列需要输出目录")
+        world = self.create_world(*world_size)
+        renderer = flight_sequence.SequenceRenderer(world, self.width, self.height, self.metrics)
+        if output == 'video':
+            writer = flight_sequence.VideoSequenceWriter(self.output_dir, name, trajectory.fps, self.width, self.height)
+        else:
+            writer = flight_sequence.ShardSequenceWriter(self.output_dir, name, self.encoder, self.samples_per_shard,
+                                                         self.write_stats, self.metadata_codec)
+        pool = frame_pool.shared_pool()
+        shape = (self.height, self.width, 3)
+        
+        def render(frame_id):
+            camera_parameters = trajectory.camera(frame_id, self.width, self.height)
+            return renderer.render(frame_id, camera_parameters, out=pool.acquire(shape))
+        
+        def write(frame):
+            image, frame_data = frame
+            with self.metrics.timer('sequence.write'):
+                writer.write(frame_data['frame_id'], image, frame_data)
+            pool.release(image)
+            return frame_data['frame_id']
+        
+        num_frames = trajectory.num_frames
+        print(f"🛩️ 生成飞行序列 {name}: {num_frames} 帧，世界 {world.rows}x{world.cols} 单元 / {len(world)} 个物体")
+        try:
+            for frame_id in StreamPipeline([('render', render), ('write', write)], queue_size).run(range(num_frames)):
+                if (frame_id + 1) % 100 == 0:
+                    print(f"   已完成 {frame_id + 1}/{num_frames} 帧")
+        finally:
+            files = writer.close()
+        
+        sequence = {
+            'name': name,
+            'num_frames': num_frames,
+            'resolution': [self.width, self.height],
+            'output': output,
+            'files': [os.path.relpath(path, self.output_dir) for path in files],
+            'trajectory': trajectory.as_dict(),
+            'world': world.as_dict()
+        }
+        write_json_atomic(os.path.join(self.output_dir, f"{name}.json"), sequence, indent=2)
+        print(f"✅ 飞行序列已保存: {', '.join(files)}")
+        return sequence
+    
+    def _generate_objects(self, scene_type, rng):
+        """根据场景类型从场景自己的随机数流 rng 中生成物体，返回 SceneObjects
+
+        每种场景类型的全部随机字段用一次 rng.integers 按 (物体数, 字段数) 抽取，
+        抽取顺序与逐物体逐字段抽取相同，同一种子得到的物体不变。
+        物体高度：建筑物按序号循环取 150 + (i % 5) * 50（150–350，物体数超过 5 个时不再增高），
+        树木 100–149，其余场景的障碍物 30–99；相机高度由 camera_altitude 取为不低于最高物体的
+        CAMERA_CLEARANCE 倍，物体总在相机下方。
+        """
+        count = self.objects_per_scene
         
         if scene_type == 'urban':
-            # 城市场景：建筑物
-            for i in range(5):
-                objects.append({
-                    'type': 'building',
-                    'position': [i * 200 - 400, 0, 0],
-                    'size': [100, 100, 150 + i * 50],
-                    'color': [100, 100, 100]
-                })
+            # 城市场景：一排建筑物
+            i = np.arange(5 if count is None else count)
+            zeros = np.zeros_like(i)
+            return SceneObjects.full('building',
+                                     np.column_stack([i * 200 - 400, zeros, zeros]),
+                                     np.column_stack([zeros + 100, zeros + 100, 150 + (i % 5) * 50]),
+                                     np.full((len(i), 3), 100))
         elif scene_type == 'forest':
-            # 森林场景：树木
-            for i in range(8):
-                objects.append({
-                    'type': 'tree',
-                    'position': [np.random.randint(-300, 300), np.random.randint(-300, 300), 0],
-                    'size': [40, 40, 100 + np.random.randint(0, 50)],
-                    'color': [0, 100 + np.random.randint(0, 50), 0]
-                })
+            # 森林场景：树木，每棵树抽取 [x, y, 高度增量, 绿色增量]
+            draws = rng.integers([-300, -300, 0, 0], [300, 300, 50, 50], size=(8 if count is None else count, 4))
+            zeros = np.zeros(len(draws), dtype=np.int64)
+            return SceneObjects.full('tree',
+                                     np.column_stack([draws[:, 0], draws[:, 1], zeros]),
+                                     np.column_stack([zeros + 40, zeros + 40, 100 + draws[:, 2]]),
+                                     np.column_stack([zeros, 100 + draws[:, 3], zeros]))
         else:
-            # 开阔地：少量随机物体
-            for i in range(3):
-                objects.append({
-                    'type': 'obstacle',
-                    'position': [np.random.randint(-200, 200), np.random.randint(-200, 200), 0],
-                    'size': [50, 50, 30 + np.random.randint(0, 70)],
-                    'color': [np.random.randint(50, 150) for _ in range(3)]
-                })
-        
-        return objects
-    
-    def _render_scene(self, scene_data):
-        """渲染场景为图像"""
-        height, width = 480, 640
-        img = np.ones((height, width, 3), dtype=np.uint8) * 200  # 灰色背景
-        
-        # 根据场景类型设置基础颜色
-        if scene_data['scene_type'] == 'forest':
-            img = np.ones((height, width, 3), dtype=np.uint8) * (0, 80, 0)
-        elif scene_data['scene_type'] == 'open_field':
-            img = np.ones((height, width, 3), dtype=np.uint8) * (100, 150, 100)
-        
-        # 渲染物体
-        for obj in scene_data['objects']:
-            self._draw_object(img, obj)
+            # 开阔地：少量随机物体，每个抽取 [x, y, 高度增量, B, G, R]
+            draws = rng.integers([-200, -200, 0, 50, 50, 50], [200, 200, 70, 150, 150, 150],
+                                 size=(3 if count is None else count, 6))
+            zeros = np.zeros(len(draws), dtype=np.int64)
+            return SceneObjects.full('obstacle',
+                                     np.column_stack([draws[:, 0], draws[:, 1], zeros]),
+                                     np.column_stack([zeros + 50, zeros + 50, 30 + draws[:, 2]]),
+                                     draws[:, 3:])
+    
+    def _render_scene(self, scene_data, out=None):
+        """渲染场景为图像
+
+        out 可传入预分配的 (H, W, 3) uint8 缓冲，渲染结果直接写入其中。
+        """
+        height, width = self.height, self.width
+        # 从缓存的场景背景模板复制底图（uint8，无需逐场景填充）
+        metrics = self.metrics
+        with metrics.timer('render.background'):
+            img = out if out is not None else np.empty((height, width, 3), dtype=np.uint8)
+            np.copyto(img, batch_renderer.background_template(scene_data['scene_type'], width, height))
+        
+        # 渲染物体：按相机参数一次性投影全部物体，再逐个绘制
+        objects = as_scene_objects(scene_data['objects'])
+        with metrics.timer('render.project'):
+            geometry = camera.project_objects(objects, scene_data['camera_parameters'], width, height)
+        with metrics.timer('render.objects'):
+            # 只遍历投影后可见的物体，画面外的物体不产生绘制调用
+            visible = np.flatnonzero(geometry[:, 0] != camera.SHAPE_NONE)
+            for color, obj_geometry in zip(objects.colors[visible].tolist(), geometry[visible]):
+                self._draw_object(img, color, obj_geometry)
+        metrics.increment('objects_culled', int((geometry[:, 0] == camera.SHAPE_NONE).sum()))
+        metrics.increment('objects_total', len(geometry))
         
         # 添加场景信息文本
-        text = f"Scene: {scene_data['scene_type']} - Alt: {scene_data['camera_parameters']['position'][2]}m"
-        cv2.putText(img, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        with metrics.timer('render.caption'):
+            batch_renderer.draw_caption(img, scene_data)
+        metrics.increment('scenes_rendered')
         
         return img
     
-    def _draw_object(self, img, obj):
-        """在图像上绘制物体"""
-        height, width = img.shape[:2]
-        center_x, center_y = width // 2, height // 2
-        
-        # 将物体位置转换为图像坐标
-        obj_x = int(center_x + obj['position'][0] / 10)
-        obj_y = int(center_y + obj['position'][1] / 10)
-        obj_size = int(obj['size'][2] / 5)  # 高度决定大小
-        
-        color = tuple(obj['color'])
-        
-        if obj['type'] == 'building':
-            # 绘制矩形建筑物
-            cv2.rectangle(img, 
-                         (obj_x - obj_size//2, obj_y - obj_size),
-                         (obj_x + obj_size//2, obj_y), 
-                         color, -1)
-        elif obj['type'] == 'tree':
+    def render_views(self, scene_data, cameras, index=None):
+        """从多个相机视角渲染同一场景（世界），逐个产出 (camera_parameters, image)
+
+        空间索引只建一次（也可传入已建好的 spatial_index.GridIndex），每个视角只投影和绘制
+        索引给出的视野内物体，结果与对完整物体列表调用 _render_scene 像素一致。
+        """
+        objects = as_scene_objects(scene_data['objects'])
+        if index is None:
+            with self.metrics.timer('render.index'):
+                index = spatial_index.GridIndex.from_objects(objects)
+        for camera_parameters in cameras:
+            with self.metrics.timer('render.cull'):
+                ids = index.visible(camera_parameters, self.width, self.height)
+            self.metrics.increment('objects_outside_view', len(objects) - len(ids))
+            view = dict(scene_data, camera_parameters=camera_parameters, objects=objects.subset(ids))
+            yield camera_parameters, self._render_scene(view)
+    
+    def _draw_object(self, img, color, geometry):
+        """在图像上以颜色 color 绘制物体，geometry 为 camera.project_scene 给出的像素几何"""
+        shape, x0, y0, x1, y1, radius = (int(v) for v in geometry)
+        color = tuple(color)
+        
+        if shape == camera.SHAPE_NONE:
+            # 位于相机后方或画面之外
+            return
+        
+        if shape == camera.SHAPE_CIRCLE:
             # 绘制圆形树木
-            cv2.circle(img, (obj_x, obj_y), obj_size, color, -1)
+            cv2.circle(img, (x0, y0), radius, color, -1)
         else:
-            # 绘制矩形障碍物
-            cv2.rectangle(img, 
-                         (obj_x - obj_size//2, obj_y - obj_size//2),
-                         (obj_x + obj_size//2, obj_y + obj_size//2), 
-                         color, -1)
+            # 绘制矩形建筑物 / 障碍物
+            cv2.rectangle(img, (x0, y0), (x1, y1), color, -1)
+
+def _parse_waypoint(text):
+    """解析形如 x,y,z 的航点"""
+    values = [float(v) for v in text.split(',')]
+    if len(values) != 3:
+        raise argparse.ArgumentTypeError(f"航点格式应为 x,y,z: {text}")
+    return values
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="UAV 合成数据流水线")
+    parser.add_argument('--num-scenes', type=int, default=5, help="生成场景数量")
+    parser.add_argument('--workers', type=int, default=1, help="并行进程数")
+    parser.add_argument('--seed', type=int, default=None, help="根随机种子")
+    parser.add_argument('--output-dir', default="generated_data", help="输出目录")
+    parser.add_argument('--annotate', action='store_true', help="渲染时同步生成标注")
+    parser.add_argument('--batch-size', type=int, default=1, help="批量渲染的场景数")
+    parser.add_argument('--storage', choices=['files', 'shards'], default='files', help="存储布局")
+    parser.add_argument('--samples-per-shard', type=int, default=1000, help="每个分片的场景数")
+    parser.add_argument('--image-format', choices=['png', 'webp', 'npy'], default='png', help="图像编码格式（均为无损）")
+    parser.add_argument('--png-compression', type=int, default=None, help="PNG 压缩级别 0-9")
+    parser.add_argument('--writer-threads', type=int, default=0, help="后台编码写盘线程数（0 为同步写入）")
+    parser.add_argument('--resume', action='store_true', help="跳过清单中已完成且参数未变的场景（未指定 --seed 时沿用清单中的根种子）")
+    parser.add_argument('--array-split', default=None, help="深度图/掩码写入内存映射 .npy 的划分名（如 train）")
+    parser.add_argument('--depth-format', choices=['uint16', 'float32'], default='uint16', help="标注深度图输出类型")
+    parser.add_argument('--resolution', type=int, nargs=2, default=[640, 480], metavar=('W', 'H'), help="输出分辨率")
+    parser.add_argument('--scene-ids', type=int, nargs='+', default=None,
+                        help="只（重新）生成指定的场景 ID（需与原运行使用相同的 --seed）")
+    parser.add_argument('--metadata-format', choices=list(METADATA_FORMATS), default='json',
+                        help="场景元数据与标注的格式（binary 为紧凑二进制，json 便于阅读与导出）")
+    parser.add_argument('--object-table', action='store_true',
+                        help="运行结束后由全部场景的元数据生成物体列式表 object_table/")
+    parser.add_argument('--objects-per-scene', type=int, default=None,
+                        help="每个场景的物体数（默认按场景类型：城市 5、森林 8、其他 3）")
+    parser.add_argument('--tile-size', type=int, default=None, help="分块渲染的分块边长（超高分辨率帧，内存与帧大小无关）")
+    parser.add_argument('--tile-layout', choices=['stream', 'tiles'], default='stream',
+                        help="分块输出：stream 逐行流式写成单个 PNG，tiles 每块一个文件")
+    parser.add_argument('--shared', action='store_true',
+                        help="与指向同一输出目录的其他进程 / 主机协同生成（租约文件分配场景块）")
+    parser.add_argument('--chunk-size', type=int, default=100, help="协同生成时每个租约块的场景数")
+    parser.add_argument('--lease-ttl', type=float, default=60.0, help="租约过期时间（秒），超时未心跳的块被回收")
+    parser.add_argument('--sequence', action='store_true', help="沿航迹在同一个持久世界上生成连续帧序列（代替独立场景）")
+    parser.add_argument('--waypoints', type=_parse_waypoint, nargs='+',
+                        default=[(-1500, -1500, 150), (1500, -1500, 200), (1500, 1500, 300)],
+                        metavar='X,Y,Z', help="飞行序列航点（z 为高度）")
+    parser.add_argument('--speed', type=float, default=100.0, help="飞行速度（世界单位/秒）")
+    parser.add_argument('--fps', type=float, default=10.0, help="序列帧率")
+    parser.add_argument('--heading', action='store_true', help="相机偏航跟随航向")
+    parser.add_argument('--world-size', type=int, nargs=2, default=[4, 4], metavar=('ROWS', 'COLS'),
+                        help="持久世界的网格单元行列数")
+    parser.add_argument('--sequence-output', choices=flight_sequence.SEQUENCE_OUTPUTS, default='video',
+                        help="序列输出：video 为 MP4 视频，shards 为逐帧 tar 分片")
+    parser.add_argument('--metrics', action='store_true', help="运行结束后在输出目录写出 metrics.json 与 metrics.prom")
+    parser.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                        help="用 cProfile 或 tracemalloc 剖析整次运行，结果写到输出目录")
+    args = parser.parse_args()
+    if args.object_table and (args.shared or args.sequence):
+        parser.error("--object-table 不能与 --shared / --sequence 同时使用；协同生成全部完成后请运行 "
+                     "python -m scripts.dataset_utils.object_table")
+    
     print("=" * 50)
     print("   UAV Synthetic Dataset - 数据流水线")
     print("=" * 50)
     
     # 创建流水线实例
-    pipeline = UAVDataPipeline()
+    try:
+        pipeline = UAVDataPipeline(args.output_dir, seed=args.seed, storage=args.storage,
+                                   samples_per_shard=args.samples_per_shard, array_split=args.array_split,
+                                   image_format=args.image_format, png_compression=args.png_compression,
+                                   writer_threads=args.writer_threads, resume=args.resume,
+                                   depth_format=args.depth_format, resolution=args.resolution,
+                                   tile_size=args.tile_size, tile_layout=args.tile_layout,
+                                   objects_per_scene=args.objects_per_scene, metadata_format=args.metadata_format)
+    except ValueError as e:
+        parser.error(str(e))
     
-    # 生成合成数据
-    scenes = pipeline.generate_synthetic_scenes(5)
+    # 流式生成合成数据，不在内存中保留场景列表
+    profiler = RunProfiler(args.profile, pipeline.output_dir) if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        if args.sequence:
+            trajectory = flight_sequence.Trajectory(args.waypoints, speed=args.speed, fps=args.fps,
+                                                    heading=args.heading)
+            scene_count = pipeline.generate_sequence(trajectory, world_size=args.world_size,
+                                                     output=args.sequence_output)['num_frames']
+        elif args.shared:
+            scene_count = pipeline.generate_shared(args.num_scenes, chunk_size=args.chunk_size,
+                                                   lease_ttl=args.lease_ttl, workers=args.workers,
+                                                   annotate=args.annotate, batch_size=args.batch_size)
+        else:
+            scene_count = sum(1 for _ in pipeline._stream_scenes(args.num_scenes, workers=args.workers,
+                                                                 annotate=args.annotate, batch_size=args.batch_size,
+                                                                 scene_ids=args.scene_ids))
+    finally:
+        if profiler is not None:
+            for path in profiler.stop():
+                print(f"🔬 剖析结果: {path}")
+    if args.object_table:
+        build_object_table(pipeline.output_dir)
+    if args.metrics or args.profile:
+        for path in pipeline.save_metrics():
+            print(f"📊 阶段统计: {path}")
     
     print(f"\n🎉 数据生成完成!")
-    print(f"生成了 {len(scenes)} 个场景")
+    if args.sequence:
+        print(f"生成了 {scene_count} 帧飞行序列")
+        print(f"数据保存在: {pipeline.output_dir}/")
+        return
+    print(f"生成了 {scene_count} 个场景")
     print(f"数据保存在: {pipeline.output_dir}/")
-    print(f"包含: PNG图像 + JSON元数据")
+    print(f"包含: {args.image_format.upper()}图像 + {args.metadata_format.upper()}元数据"
+          + (" + 标注" if args.annotate else ""))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
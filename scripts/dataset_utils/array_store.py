@@ -0,0 +1,171 @@
+"""
+内存映射数组存储模块
+每个数据划分 (split) 预分配 float32 深度图、uint16 掩码与 uint16 实例掩码的 .npy 文件，
+通过 np.memmap 随机读写，读取时返回视图而不做 PNG 解码或拷贝
+"""
+
+import os
+
+import numpy as np
+
+DEPTH_DTYPE = np.float32
+MASK_DTYPE = np.uint16
+
+
+def _store_paths(root, split):
+    """某个划分对应的深度、掩码和场景 ID 文件路径"""
+    return {
+        'depth': os.path.join(root, f"{split}_depth.npy"),
+        'mask': os.path.join(root, f"{split}_mask.npy"),
+        'instances': os.path.join(root, f"{split}_instances.npy"),
+        'ids': os.path.join(root, f"{split}_ids.npy")
+    }
+
+
+class ArrayStore:
+    """深度图 / 掩码的 .npy 内存映射存储
+
+    create() 预分配文件，open() 以 'r+'（写入）或 'r'（只读）方式映射已有文件。
+    多个进程可同时以 'r+' 打开并写入不同的行。
+    早期创建的存储没有实例掩码文件，此时 instances 为 None。
+    """
+
+    def __init__(self, root, split, mode='r'):
+        self.root = root
+        self.split = split
+        self.mode = mode
+        paths = _store_paths(root, split)
+        self.depth = np.lib.format.open_memmap(paths['depth'], mode=mode)
+        self.mask = np.lib.format.open_memmap(paths['mask'], mode=mode)
+        self.instances = None
+        if os.path.exists(paths['instances']):
+            self.instances = np.lib.format.open_memmap(paths['instances'], mode=mode)
+        self.ids = np.lib.format.open_memmap(paths['ids'], mode=mode)
+        self._rows = None
+
+    @classmethod
+    def create(cls, root, split, num_samples, height, width):
+        """预分配一个划分的存储文件并返回可写实例"""
+        os.makedirs(root, exist_ok=True)
+        paths = _store_paths(root, split)
+        np.lib.format.open_memmap(paths['depth'], mode='w+', dtype=DEPTH_DTYPE, shape=(num_samples, height, width))
+        np.lib.format.open_memmap(paths['mask'], mode='w+', dtype=MASK_DTYPE, shape=(num_samples, height, width))
+        np.lib.format.open_memmap(paths['instances'], mode='w+', dtype=MASK_DTYPE, shape=(num_samples, height, width))
+        ids = np.lib.format.open_memmap(paths['ids'], mode='w+', dtype=np.int64, shape=(num_samples,))
+        ids[:] = -1
+        ids.flush()
+        return cls(root, split, mode='r+')
+
+    @classmethod
+    def open_or_create(cls, root, split, num_samples, height, width):
+        """已有存储时以 r+ 打开并保留已写入的行，否则新建
+
+        已有存储的行数少于 num_samples 时扩容（见 grow），从不缩小；缺少实例掩码文件时只补建该文件；
+        帧尺寸与 (height, width) 不一致时抛出 ValueError，不删除已有数据。
+        """
+        if not cls.exists(root, split):
+            return cls.create(root, split, num_samples, height, width)
+        paths = _store_paths(root, split)
+        if not os.path.exists(paths['instances']):
+            # 早期创建的存储没有实例掩码：只补建实例掩码文件，深度图与掩码保持不变
+            depth = np.lib.format.open_memmap(paths['depth'], mode='r')
+            np.lib.format.open_memmap(paths['instances'], mode='w+', dtype=MASK_DTYPE, shape=depth.shape).flush()
+            del depth
+        store = cls(root, split, mode='r+')
+        if store.depth.shape[1:] != (height, width):
+            raise ValueError(f"已有的 {split} 数组存储帧尺寸为 {store.depth.shape[1:]}，与 {(height, width)} 不一致；"
+                             f"请使用相同分辨率或换一个划分名")
+        if len(store) < num_samples:
+            store = store.grow(num_samples)
+        return store
+
+    @classmethod
+    def open(cls, root, split, mode='r'):
+        return cls(root, split, mode=mode)
+
+    @staticmethod
+    def exists(root, split):
+        """存储是否存在（实例掩码文件可选，早期创建的存储没有该文件）"""
+        return all(os.path.exists(path) for name, path in _store_paths(root, split).items() if name != 'instances')
+
+    def __len__(self):
+        return self.depth.shape[0]
+
+    def grow(self, num_samples, chunk_rows=64):
+        """扩容到 num_samples 行，返回新的实例（本实例的映射随之失效）
+
+        各文件逐块拷贝到同尺寸帧的新文件后原子替换，已写入的行保持不变，新增行的场景 ID 为 -1。
+        """
+        self.flush()
+        for name, path in _store_paths(self.root, self.split).items():
+            if not os.path.exists(path):
+                continue
+            old = np.lib.format.open_memmap(path, mode='r')
+            tmp_path = f"{path}.tmp.{os.getpid()}"
+            new = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=old.dtype,
+                                            shape=(num_samples,) + old.shape[1:])
+            for start in range(0, len(old), chunk_rows):
+                stop = min(start + chunk_rows, len(old))
+                new[start:stop] = old[start:stop]
+            if name == 'ids':
+                new[len(old):] = -1
+            new.flush()
+            del new, old
+            os.replace(tmp_path, path)
+        return type(self)(self.root, self.split, mode=self.mode)
+
+    def has_row(self, row, scene_id):
+        """第 row 行是否已写入场景 scene_id"""
+        return 0 <= row < len(self) and int(self.ids[row]) == scene_id
+
+    def write(self, row, scene_id, depth, mask, instances=None):
+        """写入一行样本"""
+        self.depth[row] = depth
+        self.mask[row] = mask
+        if instances is not None and self.instances is not None:
+            self.instances[row] = instances
+        self.ids[row] = scene_id
+
+    def flush(self):
+        for array in (self.depth, self.mask, self.instances, self.ids):
+            if array is not None:
+                array.flush()
+
+    def row_of(self, scene_id):
+        """场景 ID 对应的行号"""
+        if self._rows is None:
+            self._rows = {int(sid): row for row, sid in enumerate(self.ids) if sid >= 0}
+        return self._rows[scene_id]
+
+
+class LazyArrayDataset:
+    """只读惰性访问器
+
+    按行或场景 ID 返回深度图 / 掩码的内存映射视图，不拷贝数据；
+    首次访问某页时才由操作系统从页缓存载入。
+    """
+
+    def __init__(self, root, split):
+        self.store = ArrayStore.open(root, split, mode='r')
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, row):
+        return self.store.depth[row], self.store.mask[row]
+
+    def depth(self, row):
+        return self.store.depth[row]
+
+    def mask(self, row):
+        return self.store.mask[row]
+
+    def instances(self, row):
+        """实例掩码视图，旧存储没有实例掩码时返回 None"""
+        if self.store.instances is None:
+            return None
+        return self.store.instances[row]
+
+    def by_scene_id(self, scene_id):
+        """按场景 ID 获取 (depth, mask) 视图"""
+        return self[self.store.row_of(scene_id)]
@@ -0,0 +1,104 @@
+"""
+异步写入模块
+渲染线程只负责把样本放入有界队列，由后台线程池完成图像编码和批量写盘
+"""
+
+import queue
+import threading
+import time
+
+from scripts.dataset_utils.storage import EncodeStats, encode_sample
+
+
+class AsyncSampleWriter:
+    """后台编码 / 写入线程池
+
+    sink 为 storage 模块中的写入器；非线程安全的写入器（如 ShardWriter）
+    会在写入时加锁。每个线程一次取出队列中已有的最多 max_batch 个样本，
+    编码完成后集中写入。on_encoded(scene_id, files) 在样本编码完成后以原始内容回调
+    （此后不再引用其中的数组，调用方可回收图像缓冲）；on_written(scene_id, files)
+    在样本落盘后回调，二者均在后台线程中执行。
+    metadata_codec 为元数据编解码器（见 storage.encode_sample），默认 JSON。
+    """
+
+    def __init__(self, sink, encoder, num_threads=4, queue_size=64, max_batch=16, stats=None, on_written=None,
+                 on_encoded=None, metadata_codec=None):
+        self.sink = sink
+        self.on_written = on_written
+        self.on_encoded = on_encoded
+        self.encoder = encoder
+        self.metadata_codec = metadata_codec
+        self.max_batch = max_batch
+        self.stats = stats if stats is not None else EncodeStats()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = None if getattr(sink, 'thread_safe', False) else threading.Lock()
+        self._errors = []
+        self._threads = [threading.Thread(target=self._run, name=f"async-writer-{i}", daemon=True)
+                         for i in range(num_threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, scene_id, files):
+        """提交一个样本；队列已满时阻塞（背压）"""
+        if self._errors:
+            raise self._errors[0]
+        self._queue.put((scene_id, files))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self._errors.append(e)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        """编码一批样本并集中写入"""
+        encoded = [(scene_id, encode_sample(files, self.encoder, self.stats, self.metadata_codec))
+                   for scene_id, files in batch]
+        if self.on_encoded is not None:
+            for scene_id, files in batch:
+                self.on_encoded(scene_id, files)
+        start = time.perf_counter()
+        if self._lock is not None:
+            with self._lock:
+                for scene_id, files in encoded:
+                    self.sink.write_sample(scene_id, files)
+        else:
+            for scene_id, files in encoded:
+                self.sink.write_sample(scene_id, files)
+        self.stats.add_write(time.perf_counter() - start)
+        if self.on_written is not None:
+            for scene_id, files in encoded:
+                self.on_written(scene_id, files)
+
+    def close(self):
+        """等待队列清空并停止所有线程，随后抛出后台出现的第一个错误"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
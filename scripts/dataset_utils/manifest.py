@@ -0,0 +1,186 @@
+"""
+生成清单模块
+记录每个场景的种子、参数哈希、输出文件哈希和状态，运行过程中逐条追加到日志、结束时原子压实，
+用于中断后续跑以及跳过输入未变化的场景
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+
+from scripts.dataset_utils.storage import write_json_atomic
+
+STATUS_DONE = 'done'
+# 追加日志的扩展名，见 Manifest
+JOURNAL_EXT = '.jsonl'
+
+
+def params_hash(params):
+    """参数字典的稳定哈希"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def bytes_hash(*chunks):
+    """若干字节串的 sha256"""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digests(files):
+    """{文件名: 字节} → {文件名: sha256}"""
+    return {name: bytes_hash(data) for name, data in files.items()}
+
+
+class Manifest:
+    """场景清单
+
+    scene_id → {seed, params_hash, outputs: {文件名: sha256}, status}。
+    每条记录以一行 [scene_id, 条目] 追加到日志 manifest.jsonl 并立即 flush，单条记录的开销与清单大小无关；
+    save() 把全部条目一次性压实为 manifest.json 并删除日志。读取时先读快照再重放日志，
+    进程中断最多丢失最后一行未写完的记录。
+    多个进程共用一个清单时各自指定 part：读取时合并主清单与全部 part 文件，
+    写入时只把本进程记录的场景写到自己的 manifest.<part>.json（及其日志），互不覆盖；
+    consolidate() 将各部分合并回主清单。
+    """
+
+    def __init__(self, path, part=None):
+        self.path = path
+        self.part_path = _part_path(path, part) if part is not None else None
+        self.journal_path = _journal_path(self.part_path or path)
+        self._lock = threading.Lock()
+        self._journal = None
+        self.entries = {}
+        for source in [path] + _part_paths(path):
+            self.entries.update(_load_entries(source))
+        # 本进程 part 中已有的条目继续保留在 part 中
+        self._recorded = set(_load_entries(self.part_path)) if self.part_path is not None else set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, scene_id):
+        return self.entries.get(str(scene_id))
+
+    def root_seeds(self):
+        """清单中记录的全部根种子（条目没有种子时含 None）"""
+        return {(entry.get('seed') or {}).get('root_seed') for entry in self.entries.values()}
+
+    def is_current(self, scene_id, input_hash, output_dir=None):
+        """场景是否已完成且输入哈希未变；给出 output_dir 时还要求输出文件仍然存在"""
+        entry = self.get(scene_id)
+        if entry is None or entry.get('status') != STATUS_DONE or entry.get('params_hash') != input_hash:
+            return False
+        if output_dir is not None:
+            return all(os.path.exists(os.path.join(output_dir, name)) for name in entry.get('outputs', {}))
+        return True
+
+    def record(self, scene_id, seed, input_hash, outputs, status=STATUS_DONE):
+        """记录一个场景的结果，outputs 为 {文件名: sha256}；同一场景多次记录时合并输出"""
+        with self._lock:
+            entry = self.entries.get(str(scene_id))
+            if entry is None or entry.get('params_hash') != input_hash:
+                entry = {'outputs': {}}
+            entry.update({'seed': seed, 'params_hash': input_hash, 'status': status})
+            entry['outputs'].update(outputs)
+            self.entries[str(scene_id)] = entry
+            self._recorded.add(str(scene_id))
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a')
+            self._journal.write(json.dumps([str(scene_id), entry]) + '\n')
+            self._journal.flush()
+
+    def save(self):
+        """压实：写出完整快照后删除日志"""
+        with self._lock:
+            if self.part_path is not None:
+                write_json_atomic(self.part_path, {'scenes': {key: self.entries[key] for key in self._recorded}})
+            else:
+                write_json_atomic(self.path, {'scenes': self.entries})
+            self._close_journal()
+            _unlink(self.journal_path)
+
+    def close(self):
+        """只关闭日志，不压实（已记录的条目仍可由日志重放）"""
+        with self._lock:
+            self._close_journal()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    @staticmethod
+    def consolidate(path):
+        """把全部 part 文件（含日志）合并进主清单并删除已合并的文件（读取后又被更新的保留）"""
+        entries = _load_entries(path)
+        merged = []
+        for part in _part_paths(path):
+            sources = [source for source in (part, _journal_path(part)) if os.path.exists(source)]
+            try:
+                mtimes = [os.stat(source).st_mtime for source in sources]
+            except FileNotFoundError:
+                continue
+            entries.update(_load_entries(part))
+            merged.extend(zip(sources, mtimes))
+        write_json_atomic(path, {'scenes': entries})
+        _unlink(_journal_path(path))
+        for source, mtime in merged:
+            try:
+                if os.stat(source).st_mtime == mtime:
+                    os.unlink(source)
+            except FileNotFoundError:
+                pass
+        return len(entries)
+
+
+def _part_path(path, part):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{part}{ext}"
+
+
+def _journal_path(path):
+    """清单文件对应的追加日志：manifest.json → manifest.jsonl"""
+    return os.path.splitext(path)[0] + JOURNAL_EXT
+
+
+def _part_paths(path):
+    """全部 part 清单的路径；只有日志、尚未压实的 part 也包括在内"""
+    stem, ext = os.path.splitext(path)
+    pattern = glob.escape(stem) + '.*'
+    snapshots = glob.glob(pattern + ext)
+    journals = [os.path.splitext(journal)[0] + ext for journal in glob.glob(pattern + JOURNAL_EXT)]
+    return sorted(set(snapshots + journals))
+
+
+def _load_entries(path):
+    """读取清单文件中的场景条目并重放其日志；文件不存在（如刚被合并删除）时为空
+
+    日志最后一行可能因进程中断而不完整，解析失败的行被忽略。
+    """
+    try:
+        with open(path, 'r') as f:
+            entries = json.load(f).get('scenes', {})
+    except FileNotFoundError:
+        entries = {}
+    try:
+        with open(_journal_path(path), 'r') as f:
+            for line in f:
+                try:
+                    scene_id, entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[scene_id] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
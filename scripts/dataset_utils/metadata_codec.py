@@ -0,0 +1,136 @@
+"""
+元数据编解码模块
+场景元数据与标注可编码为 JSON（indent=2，便于阅读与导出）或紧凑的二进制格式：
+固定文件头 + 紧凑 JSON 头部 + 物体结构数组的原始字节。二进制格式解码时物体数组
+直接以 np.frombuffer 映射为 SceneObjects，不逐个物体解析
+"""
+
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+from scripts.dataset_utils.scene_model import SceneObjects, dumps_json
+
+# 元数据格式 -> 扩展名
+METADATA_FORMATS = {
+    'json': '.json',
+    'binary': '.uavm'
+}
+
+BINARY_MAGIC = b'UAVM'
+BINARY_VERSION = 1
+# 文件头：魔数、版本、3 字节保留、头部 JSON 长度（小端）
+BINARY_PREAMBLE = struct.Struct('<4sB3xI')
+BINARY_ALIGNMENT = 8
+SCENE_OBJECT_COLUMNS = ('positions', 'sizes', 'colors', 'class_ids')
+
+
+def encode_binary(data):
+    """字典 → 二进制元数据
+
+    顶层值为 SceneObjects 的字段以原始数组字节存放（保留 dtype），其余字段写成紧凑 JSON 头部。
+    """
+    body = dict(data)
+    arrays = {}
+    blobs = []
+    offset = 0
+    for key, value in data.items():
+        if not isinstance(value, SceneObjects):
+            continue
+        columns = []
+        for name in SCENE_OBJECT_COLUMNS:
+            array = np.ascontiguousarray(getattr(value, name))
+            columns.append([name, array.dtype.str, list(array.shape), offset])
+            blobs.append(array.tobytes())
+            offset += array.nbytes
+            padding = -offset % BINARY_ALIGNMENT
+            blobs.append(b'\x00' * padding)
+            offset += padding
+        arrays[key] = {'classes': list(value.classes), 'columns': columns}
+        body[key] = None
+    header = json.dumps({'data': body, 'arrays': arrays}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(BINARY_PREAMBLE.size + len(header)) % BINARY_ALIGNMENT)
+    return b''.join([BINARY_PREAMBLE.pack(BINARY_MAGIC, BINARY_VERSION, len(header)), header] + blobs)
+
+
+def decode_binary(data):
+    """二进制元数据 → 字典，SceneObjects 字段为只读、与 data 共享内存的数组视图"""
+    if len(data) < BINARY_PREAMBLE.size:
+        raise ValueError("二进制元数据不完整")
+    magic, version, header_size = BINARY_PREAMBLE.unpack_from(data)
+    if magic != BINARY_MAGIC:
+        raise ValueError("不是二进制元数据（魔数不符）")
+    if version > BINARY_VERSION:
+        raise ValueError(f"不支持的二进制元数据版本: {version}")
+    start = BINARY_PREAMBLE.size + header_size
+    header = json.loads(bytes(data[BINARY_PREAMBLE.size:start]))
+    result = header['data']
+    for key, spec in header['arrays'].items():
+        # 数据被截断时 np.frombuffer 抛出 ValueError
+        columns = {name: np.frombuffer(data, dtype, math.prod(shape), start + offset).reshape(shape)
+                   for name, dtype, shape, offset in spec['columns']}
+        result[key] = SceneObjects(classes=spec['classes'], **columns)
+    return result
+
+
+class MetadataCodec:
+    """可配置的元数据编解码器
+
+    json 与原有输出逐字节相同（indent=2）；binary 为紧凑二进制格式，编码与解析都不经过
+    逐个物体的 JSON 处理。decode 接受字节，返回字典。
+    """
+
+    def __init__(self, metadata_format='json'):
+        if metadata_format not in METADATA_FORMATS:
+            raise ValueError(f"不支持的元数据格式: {metadata_format}")
+        self.format = metadata_format
+        self.ext = METADATA_FORMATS[metadata_format]
+
+    def encode(self, data):
+        if self.format == 'binary':
+            return encode_binary(data)
+        return dumps_json(data, indent=2).encode('utf-8')
+
+    def decode(self, data):
+        if self.format == 'binary':
+            return decode_binary(data)
+        return json.loads(data)
+
+    def file_name(self, name):
+        """将 .json 等元数据文件名换成本格式的扩展名"""
+        return metadata_stem(name) + self.ext
+
+
+def metadata_stem(name):
+    """去掉元数据扩展名后的文件名；不是元数据文件时原样返回"""
+    stem, ext = os.path.splitext(name)
+    return stem if ext in METADATA_FORMATS.values() else name
+
+
+def codec_for_name(name):
+    """按文件扩展名选择编解码器，不是元数据文件时返回 None"""
+    ext = os.path.splitext(name)[1]
+    for metadata_format, format_ext in METADATA_FORMATS.items():
+        if ext == format_ext:
+            return MetadataCodec(metadata_format)
+    return None
+
+
+def load_metadata(path):
+    """读取任意格式的元数据文件"""
+    codec = codec_for_name(path)
+    if codec is None:
+        raise ValueError(f"不是元数据文件: {path}")
+    with open(path, 'rb') as f:
+        return codec.decode(f.read())
+
+
+def find_metadata(stem_path):
+    """给定不含扩展名的路径，返回已存在的元数据文件（按 METADATA_FORMATS 顺序），都不存在时返回 None"""
+    for ext in METADATA_FORMATS.values():
+        if os.path.exists(stem_path + ext):
+            return stem_path + ext
+    return None
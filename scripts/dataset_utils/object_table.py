@@ -0,0 +1,258 @@
+"""
+物体列式表模块
+将数据集中全部场景的物体按列写成定长二进制列文件（与 SceneObjects 的数组一一对应），
+另有每个场景一行的场景列（场景 ID、物体偏移、场景类型、相机参数）；读取时以 np.memmap
+映射，按场景 ID 取物体或对整列做统计都不需要逐个解析元数据文件
+"""
+
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from scripts.dataset_utils.metadata_codec import METADATA_FORMATS, codec_for_name
+from scripts.dataset_utils.scene_model import OBJECT_CLASSES, SceneObjects, as_scene_objects
+from scripts.dataset_utils.storage import INDEX_FILE, ShardReader, write_json_atomic
+
+TABLE_DIR = "object_table"
+TABLE_INDEX_FILE = "table.json"
+TABLE_VERSION = 1
+
+# 每个物体一行：所属场景 ID 与 SceneObjects 的各数组
+OBJECT_COLUMNS = ('object_scene_ids', 'positions', 'sizes', 'colors', 'class_ids')
+# 每个场景一行；object_offsets 多一行，场景 k 的物体为 [object_offsets[k], object_offsets[k + 1])
+SCENE_COLUMNS = ('scene_ids', 'object_offsets', 'scene_type_ids', 'camera_positions', 'camera_rotations',
+                 'camera_fov')
+# 类型固定的列；positions / sizes 沿用元数据中的数值类型（见 ObjectTableWriter）
+COLUMN_DTYPES = {
+    'object_scene_ids': np.int64,
+    'colors': np.uint8,
+    'class_ids': np.uint8,
+    'scene_ids': np.int64,
+    'object_offsets': np.int64,
+    'scene_type_ids': np.uint8,
+    'camera_positions': np.float64,
+    'camera_rotations': np.float64,
+    'camera_fov': np.float64
+}
+DEFAULT_COORDINATE_DTYPE = np.int64
+VECTOR_COLUMNS = ('positions', 'sizes', 'colors', 'camera_positions', 'camera_rotations')
+METADATA_FILE_PATTERN = re.compile(
+    r'^scene_(\d+)(' + '|'.join(re.escape(ext) for ext in METADATA_FORMATS.values()) + r')$')
+
+
+class ObjectTableWriter:
+    """按场景顺序追加写入物体列式表
+
+    add() 的结果先缓存在内存中，每 flush_every 个场景追加写入各列文件，内存占用与场景总数无关。
+    close() 写出 table.json（各列的 dtype 与形状、类型名表）后表才可读取。
+    positions / sizes 列的 dtype 由第一个有物体的场景决定（保持生成时的整数类型），
+    之后的场景按 safe 规则转换，无法无损转换时抛出 ValueError。
+    """
+
+    def __init__(self, root, flush_every=4096):
+        self.root = root
+        self.flush_every = flush_every
+        self.classes = list(OBJECT_CLASSES)
+        self.scene_types = []
+        self.num_scenes = 0
+        self.num_objects = 0
+        self.dtypes = {column: np.dtype(dtype) for column, dtype in COLUMN_DTYPES.items()}
+        os.makedirs(root, exist_ok=True)
+        index_path = os.path.join(root, TABLE_INDEX_FILE)
+        if os.path.exists(index_path):
+            os.unlink(index_path)
+        self._files = {column: open(os.path.join(root, f"{column}.bin"), 'wb')
+                       for column in OBJECT_COLUMNS + SCENE_COLUMNS}
+        self._pending = {column: [] for column in OBJECT_COLUMNS + SCENE_COLUMNS}
+        self._pending['object_offsets'].append(np.zeros(1, dtype=np.int64))
+        self._pending_scenes = 0
+
+    def _code(self, names, name):
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def add(self, scene_data):
+        """追加一个场景（元数据字典）"""
+        objects = as_scene_objects(scene_data['objects'])
+        camera_parameters = scene_data['camera_parameters']
+        remap = np.array([self._code(self.classes, name) for name in objects.classes], dtype=np.uint8)
+        self.num_objects += len(objects)
+        self.num_scenes += 1
+        rows = {
+            'object_scene_ids': np.full(len(objects), scene_data['scene_id'], dtype=np.int64),
+            'positions': objects.positions,
+            'sizes': objects.sizes,
+            'colors': objects.colors,
+            'class_ids': remap[objects.class_ids] if len(remap) else objects.class_ids,
+            'scene_ids': np.array([scene_data['scene_id']], dtype=np.int64),
+            'object_offsets': np.array([self.num_objects], dtype=np.int64),
+            'scene_type_ids': np.array([self._code(self.scene_types, scene_data['scene_type'])], dtype=np.uint8),
+            'camera_positions': np.array([camera_parameters['position']], dtype=np.float64),
+            'camera_rotations': np.array([camera_parameters['rotation']], dtype=np.float64),
+            'camera_fov': np.array([camera_parameters['fov']], dtype=np.float64)
+        }
+        for column in ('positions', 'sizes'):
+            values = rows[column]
+            if not len(values):
+                continue
+            dtype = self.dtypes.setdefault(column, values.dtype)
+            if not np.can_cast(values.dtype, dtype, casting='safe'):
+                raise ValueError(f"场景 {scene_data['scene_id']} 的 {column} 类型 {values.dtype} 无法存入 {dtype} 列")
+        for column, values in rows.items():
+            self._pending[column].append(values)
+        self._pending_scenes += 1
+        if self._pending_scenes >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        for column, parts in self._pending.items():
+            if parts:
+                dtype = self.dtypes.get(column, DEFAULT_COORDINATE_DTYPE)
+                self._files[column].write(np.concatenate(parts).astype(dtype, copy=False).tobytes())
+                parts.clear()
+        self._pending_scenes = 0
+
+    def close(self):
+        """写出剩余数据与表索引，返回表目录"""
+        self.flush()
+        for handle in self._files.values():
+            handle.close()
+        lengths = {column: self.num_objects for column in OBJECT_COLUMNS}
+        lengths.update({column: self.num_scenes for column in SCENE_COLUMNS})
+        lengths['object_offsets'] = self.num_scenes + 1
+        columns = {}
+        for column in OBJECT_COLUMNS + SCENE_COLUMNS:
+            columns[column] = {
+                'dtype': np.dtype(self.dtypes.get(column, DEFAULT_COORDINATE_DTYPE)).str,
+                'shape': [lengths[column], 3] if column in VECTOR_COLUMNS else [lengths[column]]
+            }
+        write_json_atomic(os.path.join(self.root, TABLE_INDEX_FILE), {
+            'version': TABLE_VERSION,
+            'num_scenes': self.num_scenes,
+            'num_objects': self.num_objects,
+            'classes': self.classes,
+            'scene_types': self.scene_types,
+            'columns': columns
+        }, indent=2)
+        return self.root
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for handle in self._files.values():
+                handle.close()
+
+
+class ObjectTable:
+    """只读的物体列式表
+
+    columns 为 {列名: 只读数组}，以 np.memmap 映射列文件；objects 为整表的 SceneObjects 视图。
+    场景按场景 ID 升序排列。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, TABLE_INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        self.classes = self.index['classes']
+        self.scene_types = self.index['scene_types']
+        self.columns = {}
+        for column, spec in self.index['columns'].items():
+            shape = tuple(spec['shape'])
+            if shape[0] == 0:
+                self.columns[column] = np.zeros(shape, dtype=spec['dtype'])
+            else:
+                self.columns[column] = np.memmap(os.path.join(root, f"{column}.bin"), dtype=spec['dtype'],
+                                                 mode='r', shape=shape)
+
+    def __len__(self):
+        return self.index['num_objects']
+
+    @property
+    def num_scenes(self):
+        return self.index['num_scenes']
+
+    @property
+    def scene_ids(self):
+        return self.columns['scene_ids']
+
+    @property
+    def objects(self):
+        """全部物体（按场景顺序）"""
+        return self._objects(0, len(self))
+
+    def _objects(self, start, stop):
+        columns = self.columns
+        return SceneObjects(columns['positions'][start:stop], columns['sizes'][start:stop],
+                            columns['colors'][start:stop], columns['class_ids'][start:stop], self.classes)
+
+    def _row(self, scene_id):
+        row = int(np.searchsorted(self.scene_ids, scene_id))
+        if row >= self.num_scenes or self.scene_ids[row] != scene_id:
+            raise KeyError(f"物体表中没有场景 {scene_id}")
+        return row
+
+    def scene_objects(self, scene_id):
+        """某个场景的物体"""
+        row = self._row(scene_id)
+        offsets = self.columns['object_offsets']
+        return self._objects(int(offsets[row]), int(offsets[row + 1]))
+
+    def scene_type(self, scene_id):
+        return self.scene_types[self.columns['scene_type_ids'][self._row(scene_id)]]
+
+
+def iter_metadata(data_dir):
+    """按场景 ID 升序产出数据目录（逐文件或分片布局）中的场景元数据
+
+    同一场景存在多种格式的元数据时，逐文件布局取修改时间最新的文件，分片布局取最后写入的成员。
+    """
+    if os.path.exists(os.path.join(data_dir, INDEX_FILE)):
+        with ShardReader(data_dir) as reader:
+            for scene_id in reader.scene_ids():
+                names = [name for name in reader.members(scene_id) if METADATA_FILE_PATTERN.match(name)]
+                if names:
+                    yield codec_for_name(names[-1]).decode(reader.read(scene_id, names[-1]))
+        return
+    latest = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            match = METADATA_FILE_PATTERN.match(entry.name)
+            if match and entry.is_file():
+                scene_id, mtime = int(match.group(1)), entry.stat().st_mtime
+                if scene_id not in latest or mtime > latest[scene_id][0]:
+                    latest[scene_id] = (mtime, entry.path)
+    for scene_id in sorted(latest):
+        path = latest[scene_id][1]
+        with open(path, 'rb') as f:
+            yield codec_for_name(path).decode(f.read())
+
+
+def build_object_table(data_dir, root=None, flush_every=4096):
+    """扫描数据目录中全部场景的元数据，写出物体列式表（默认 data_dir/object_table/），返回表目录"""
+    root = root or os.path.join(data_dir, TABLE_DIR)
+    with ObjectTableWriter(root, flush_every) as writer:
+        for scene_data in iter_metadata(data_dir):
+            writer.add(scene_data)
+    print(f"🗃️ 物体列式表: {writer.num_scenes} 个场景 / {writer.num_objects} 个物体 → {root}")
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description="由数据集元数据生成物体列式表")
+    parser.add_argument('--data-dir', default="generated_data", help="数据目录（逐文件或分片布局）")
+    parser.add_argument('--output', default=None, help="表目录，默认 <data-dir>/object_table")
+    args = parser.parse_args()
+    build_object_table(args.data_dir, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+场景物体模型
+场景中的物体以结构数组（SoA）保存：positions (N, 3)、sizes (N, 3)、colors (N, 3) uint8、
+class_ids (N,) uint8，每个物体约 50 字节；与元数据 JSON 中的物体列表
+[{'type', 'position', 'size', 'color'}, ...] 双向转换，并可直接由数组生成 JSON 文本
+"""
+
+import json
+
+import numpy as np
+
+OBJECT_CLASSES = ('building', 'tree', 'obstacle')
+_PLACEHOLDER = "\x00scene-objects\x00"
+
+
+class SceneObjects:
+    """结构数组形式的物体集合
+
+    可像物体列表一样使用（len、下标、迭代均得到与 JSON 相同的物体字典），逐物体访问的代码无需修改；
+    渲染、标注等热点路径直接读取数组。classes 为 class_ids 对应的类型名，默认为 OBJECT_CLASSES。
+    positions / sizes 保留构造时的数值类型（整数或浮点），转换回 JSON 时数值不变。
+    """
+
+    def __init__(self, positions, sizes, colors, class_ids, classes=OBJECT_CLASSES):
+        self.positions = np.asarray(positions).reshape(-1, 3)
+        self.sizes = np.asarray(sizes).reshape(-1, 3)
+        self.colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        self.class_ids = np.asarray(class_ids, dtype=np.uint8).reshape(-1)
+        self.classes = tuple(classes)
+
+    @classmethod
+    def from_list(cls, objects):
+        """由 JSON 物体列表构建，未知类型追加到 classes"""
+        classes = list(OBJECT_CLASSES)
+        lookup = {name: i for i, name in enumerate(classes)}
+        class_ids = []
+        for obj in objects:
+            name = obj['type']
+            if name not in lookup:
+                lookup[name] = len(classes)
+                classes.append(name)
+            class_ids.append(lookup[name])
+        return cls(np.array([obj['position'] for obj in objects]).reshape(-1, 3),
+                   np.array([obj['size'] for obj in objects]).reshape(-1, 3),
+                   np.array([obj['color'] for obj in objects], dtype=np.uint8).reshape(-1, 3),
+                   class_ids, classes)
+
+    @classmethod
+    def full(cls, class_name, positions, sizes, colors):
+        """同一类型的一组物体"""
+        class_ids = np.full(len(positions), OBJECT_CLASSES.index(class_name), dtype=np.uint8)
+        return cls(positions, sizes, colors, class_ids)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """按顺序拼接多组物体（类型表不同时按名称重新编号）"""
+        parts = list(parts)
+        classes = list(OBJECT_CLASSES)
+        class_ids = []
+        for part in parts:
+            for name in part.classes:
+                if name not in classes:
+                    classes.append(name)
+            remap = np.array([classes.index(name) for name in part.classes], dtype=np.uint8)
+            class_ids.append(remap[part.class_ids] if len(remap) else part.class_ids)
+        if not parts:
+            return cls(np.zeros((0, 3), dtype=np.int64), np.zeros((0, 3), dtype=np.int64),
+                       np.zeros((0, 3), dtype=np.uint8), np.zeros(0, dtype=np.uint8))
+        return cls(np.concatenate([part.positions for part in parts]),
+                   np.concatenate([part.sizes for part in parts]),
+                   np.concatenate([part.colors for part in parts]),
+                   np.concatenate(class_ids), classes)
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            i = int(index)
+            return {
+                'type': self.classes[self.class_ids[i]],
+                'position': self.positions[i].tolist(),
+                'size': self.sizes[i].tolist(),
+                'color': self.colors[i].tolist()
+            }
+        return self.subset(np.arange(len(self))[index])
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __repr__(self):
+        return f"SceneObjects({len(self)} objects)"
+
+    @property
+    def types(self):
+        """各物体的类型名列表"""
+        return [self.classes[i] for i in self.class_ids.tolist()]
+
+    @property
+    def nbytes(self):
+        return self.positions.nbytes + self.sizes.nbytes + self.colors.nbytes + self.class_ids.nbytes
+
+    def subset(self, ids):
+        """按序号取出部分物体（保持给定顺序）"""
+        return SceneObjects(self.positions[ids], self.sizes[ids], self.colors[ids], self.class_ids[ids], self.classes)
+
+    def translated(self, offset):
+        """整体平移后的副本"""
+        return SceneObjects(self.positions + np.asarray(offset), self.sizes, self.colors, self.class_ids, self.classes)
+
+    def to_list(self):
+        """转换为 JSON 物体列表"""
+        return [{'type': name, 'position': position, 'size': size, 'color': color}
+                for name, position, size, color in zip(self.types, self.positions.tolist(),
+                                                       self.sizes.tolist(), self.colors.tolist())]
+
+    def to_json(self, indent=2, level=0):
+        """物体列表的 JSON 文本，与 json.dumps 在第 level 层嵌套处的输出逐字节相同"""
+        if not len(self):
+            return "[]"
+        outer = ' ' * (indent * level)
+        item = outer + ' ' * indent
+        field = item + ' ' * indent
+        value = field + ' ' * indent
+        vector = f",\n{value}".join(["%s"] * 3)
+        template = (f"{item}{{\n"
+                    f"{field}\"type\": %s,\n"
+                    f"{field}\"position\": [\n{value}{vector}\n{field}],\n"
+                    f"{field}\"size\": [\n{value}{vector}\n{field}],\n"
+                    f"{field}\"color\": [\n{value}{vector}\n{field}]\n"
+                    f"{item}}}")
+        names = [json.dumps(name) for name in self.classes]
+        rows = zip(self.class_ids.tolist(), _json_numbers(self.positions), _json_numbers(self.sizes),
+                   self.colors.tolist())
+        body = ",\n".join(template % (names[class_id], *position, *size, *color)
+                          for class_id, position, size, color in rows)
+        return f"[\n{body}\n{outer}]"
+
+
+def _json_numbers(values):
+    """数值数组 → 与 json.dumps 相同的数字文本"""
+    if np.issubdtype(values.dtype, np.floating):
+        return [[float.__repr__(v) for v in row] for row in values.tolist()]
+    return values.tolist()
+
+
+def as_scene_objects(objects):
+    """物体列表或 SceneObjects → SceneObjects（已是 SceneObjects 时原样返回）"""
+    return objects if isinstance(objects, SceneObjects) else SceneObjects.from_list(objects)
+
+
+def dumps_json(data, indent=2):
+    """与 json.dumps(data, indent=indent) 输出相同
+
+    data['objects'] 为 SceneObjects 时该部分由数组直接生成，不逐个物体走 Python JSON 编码器。
+    """
+    objects = data.get('objects') if isinstance(data, dict) else None
+    if not isinstance(objects, SceneObjects):
+        return json.dumps(data, indent=indent)
+    text = json.dumps(dict(data, objects=_PLACEHOLDER), indent=indent)
+    return text.replace(json.dumps(_PLACEHOLDER), objects.to_json(indent, level=1), 1)
+
+
+def with_object_list(data):
+    """对外返回的场景字典：data['objects'] 为 SceneObjects 时换成 JSON 物体列表（浅拷贝），其余原样返回
+
+    SceneObjects 只在流水线内部使用，公开接口返回的场景与写出的元数据一样可直接 json.dumps、按列表比较。
+    """
+    objects = data.get('objects')
+    return dict(data, objects=objects.to_list()) if isinstance(objects, SceneObjects) else data
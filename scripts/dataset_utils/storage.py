@@ -0,0 +1,309 @@
+"""
+数据集存储模块
+提供逐文件目录存储与基于 tar 的分片存储，以及按场景 ID 随机读取分片的读取器
+"""
+
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from scripts.dataset_utils.metadata_codec import MetadataCodec, codec_for_name
+from scripts.dataset_utils.scene_model import dumps_json
+
+INDEX_FILE = "index.json"
+
+# 支持的无损图像格式及扩展名
+IMAGE_FORMATS = {
+    'png': '.png',
+    'webp': '.webp',
+    'npy': '.npy'
+}
+
+# 各格式可无损保存的数组类型（npy 不受限制）
+FORMAT_DTYPES = {
+    'png': (np.uint8, np.uint16),
+    'webp': (np.uint8,)
+}
+
+
+def encode_image(image, ext='.png', params=None):
+    """将图像数组编码为字节"""
+    ok, buf = cv2.imencode(ext, image, params or [])
+    if not ok:
+        raise ValueError(f"图像编码失败: {ext}")
+    return buf.tobytes()
+
+
+def encode_json(data):
+    """将字典编码为 JSON 字节（场景物体为 SceneObjects 时直接由数组生成文本）"""
+    return dumps_json(data, indent=2).encode('utf-8')
+
+
+def decode_member(name, data):
+    """根据文件扩展名解码分片成员"""
+    codec = codec_for_name(name)
+    if codec is not None:
+        return codec.decode(data)
+    if name.endswith('.npy'):
+        return np.load(io.BytesIO(data), allow_pickle=False)
+    if name.endswith(('.png', '.webp', '.jpg')):
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    return data
+
+
+def write_json_atomic(path, data, indent=None):
+    """先写临时文件再原子替换，避免中断时留下半个文件"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+
+class ImageEncoder:
+    """可配置的无损图像编码器
+
+    png 可指定压缩级别 (0-9)，webp 使用无损模式，npy 直接保存原始数组。
+    """
+
+    def __init__(self, image_format='png', png_compression=None):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"不支持的图像格式: {image_format}")
+        self.format = image_format
+        self.ext = IMAGE_FORMATS[image_format]
+        self.params = []
+        if image_format == 'png' and png_compression is not None:
+            self.params = [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+        elif image_format == 'webp':
+            self.params = [cv2.IMWRITE_WEBP_QUALITY, 101]  # 质量 > 100 即无损
+
+    def supports(self, image):
+        """该格式能否无损保存此数组（如 float32 深度图无法写入 PNG）"""
+        return self.format not in FORMAT_DTYPES or image.dtype in FORMAT_DTYPES[self.format]
+    
+    def ext_for(self, image):
+        """编码此数组时使用的扩展名（无法无损保存时为 .npy，见 encode_sample）"""
+        return self.ext if self.supports(image) else IMAGE_FORMATS['npy']
+
+    def encode(self, image):
+        """将图像数组编码为字节"""
+        if self.format == 'npy':
+            buf = io.BytesIO()
+            np.save(buf, image, allow_pickle=False)
+            return buf.getvalue()
+        return encode_image(image, self.ext, self.params)
+
+
+class EncodeStats:
+    """按格式统计编码耗时、字节数和写入耗时（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.formats = {}
+        self.write_seconds = 0.0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add(self, fmt, seconds, nbytes):
+        with self._lock:
+            entry = self.formats.setdefault(fmt, {'files': 0, 'encode_seconds': 0.0, 'bytes': 0})
+            entry['files'] += 1
+            entry['encode_seconds'] += seconds
+            entry['bytes'] += nbytes
+
+    def add_write(self, seconds):
+        with self._lock:
+            self.write_seconds += seconds
+
+    def merge(self, other):
+        """合并另一份统计（如子进程返回的 as_dict() 结果）"""
+        with self._lock:
+            for fmt, values in other['formats'].items():
+                entry = self.formats.setdefault(fmt, {'files': 0, 'encode_seconds': 0.0, 'bytes': 0})
+                for key, value in values.items():
+                    entry[key] += value
+            self.write_seconds += other['write_seconds']
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'formats': {fmt: dict(values) for fmt, values in self.formats.items()},
+                'write_seconds': self.write_seconds
+            }
+
+
+def encode_sample(files, encoder, stats=None, metadata_codec=None):
+    """将一个样本的原始内容编码为 {文件名: 字节}
+
+    值为数组时按 encoder 编码并在文件名后追加扩展名（所选格式无法无损保存的数组
+    改存为 .npy）；值为字典时按 metadata_codec 编码（默认 JSON），文件名的 .json
+    扩展名换成所选元数据格式的扩展名；值为字节时原样保留。
+    """
+    metadata_codec = metadata_codec or MetadataCodec('json')
+    encoded = {}
+    for name, value in files.items():
+        start = time.perf_counter()
+        if isinstance(value, np.ndarray):
+            array_encoder = encoder if encoder.supports(value) else ImageEncoder('npy')
+            name, data, fmt = name + array_encoder.ext, array_encoder.encode(value), array_encoder.format
+        elif isinstance(value, dict):
+            name, data, fmt = metadata_codec.file_name(name), metadata_codec.encode(value), metadata_codec.format
+        else:
+            data, fmt = value, None
+        if stats is not None and fmt is not None:
+            stats.add(fmt, time.perf_counter() - start, len(data))
+        encoded[name] = data
+    return encoded
+
+
+class DirectoryWriter:
+    """逐文件写入目录（原有的平铺布局）"""
+
+    thread_safe = True
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def write_sample(self, scene_id, files):
+        """写入一个场景的若干文件，files 为 {文件名: 字节}
+
+        每个文件先写临时文件再原子替换，多个进程重复写同一场景时读者不会看到半个文件。
+        """
+        for name, data in files.items():
+            path = os.path.join(self.output_dir, name)
+            tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def close(self):
+        pass
+
+
+class ShardWriter:
+    """tar 分片写入器
+
+    每个分片最多包含 samples_per_shard 个场景，索引文件记录每个成员所在的
+    分片、数据偏移和长度，读取时可直接 seek 而无需扫描分片。
+    对已有分片目录会追加新分片并合并索引。
+    """
+
+    thread_safe = False
+
+    def __init__(self, output_dir, samples_per_shard=1000, prefix="shard"):
+        self.output_dir = output_dir
+        self.samples_per_shard = samples_per_shard
+        self.prefix = prefix
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.index_path = os.path.join(self.output_dir, INDEX_FILE)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        else:
+            self.index = {'samples_per_shard': samples_per_shard, 'shards': [], 'samples': {}}
+
+        self._tar = None
+        self._shard_samples = set()
+
+    def _open_shard(self):
+        """开启新的分片文件"""
+        name = f"{self.prefix}_{len(self.index['shards']):06d}.tar"
+        self.index['shards'].append(name)
+        self._tar = tarfile.open(os.path.join(self.output_dir, name), 'w', format=tarfile.USTAR_FORMAT)
+        self._shard_samples = set()
+
+    def _close_shard(self):
+        """关闭当前分片并落盘索引"""
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+            write_json_atomic(self.index_path, self.index)
+
+    def write_sample(self, scene_id, files):
+        """写入一个场景的若干文件，files 为 {文件名: 字节}"""
+        key = str(scene_id)
+        if self._tar is None or (key not in self._shard_samples
+                                 and len(self._shard_samples) >= self.samples_per_shard):
+            self._close_shard()
+            self._open_shard()
+        self._shard_samples.add(key)
+
+        shard_id = len(self.index['shards']) - 1
+        members = self.index['samples'].setdefault(key, {})
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            header = info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors)
+            offset = self._tar.offset + len(header)
+            self._tar.addfile(info, io.BytesIO(data))
+            members[name] = [shard_id, offset, len(data)]
+
+    def close(self):
+        self._close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ShardReader:
+    """分片读取器，按场景 ID 通过索引直接定位成员"""
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        self._handles = {}
+
+    def __len__(self):
+        return len(self.index['samples'])
+
+    def scene_ids(self):
+        """所有场景 ID（升序）"""
+        return sorted(int(k) for k in self.index['samples'])
+
+    def members(self, scene_id):
+        """场景包含的文件名列表"""
+        return list(self.index['samples'][str(scene_id)])
+
+    def read(self, scene_id, name):
+        """读取场景中某个文件的原始字节"""
+        shard_id, offset, size = self.index['samples'][str(scene_id)][name]
+        handle = self._handles.get(shard_id)
+        if handle is None:
+            handle = open(os.path.join(self.shard_dir, self.index['shards'][shard_id]), 'rb')
+            self._handles[shard_id] = handle
+        handle.seek(offset)
+        return handle.read(size)
+
+    def load_sample(self, scene_id):
+        """读取并解码场景的全部文件，返回 {文件名: 图像数组或字典}"""
+        return {name: decode_member(name, self.read(scene_id, name)) for name in self.members(scene_id)}
+
+    def close(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
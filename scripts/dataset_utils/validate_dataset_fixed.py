@@ -3,33 +3,476 @@
 验证生成的数据集完整性和质量
 """
 
+import argparse
+import io
+import math
 import os
+import random
+import re
 import json
-import cv2
+import struct
+import sys
+import zlib
 import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+if __package__ in (None, ''):
+    # 以 python scripts/dataset_utils/validate_dataset_fixed.py 直接运行时，将仓库根目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.dataset_utils.array_store import ArrayStore
+from scripts.dataset_utils.metadata_codec import METADATA_FORMATS, codec_for_name
+from scripts.dataset_utils.storage import IMAGE_FORMATS, INDEX_FILE, decode_member, write_json_atomic
+
+# scene_000.png / scene_000.json / scene_000_annotations.json / scene_000_mask.png / scene_000_depth.png
+# / scene_000_instances.png；元数据与标注也可为二进制格式（scene_000.uavm / scene_000_annotations.uavm）
+METADATA_EXTS = tuple(METADATA_FORMATS.values())
+_METADATA_EXT_PATTERN = '|'.join(re.escape(ext) for ext in METADATA_EXTS)
+SCENE_FILE_PATTERN = re.compile(rf'^(scene_\d+)(_annotations(?:{_METADATA_EXT_PATTERN})|_mask\.\w+|_depth\.\w+'
+                                rf'|_instances\.\w+|{_METADATA_EXT_PATTERN}|\.\w+)$')
+SCENE_ROLES = ('image', 'metadata', 'annotations', 'mask', 'depth', 'instances')
+# 与写入端一致的图像扩展名（.png / .webp / .npy）及按图像检查的角色
+IMAGE_EXTS = tuple(IMAGE_FORMATS.values())
+IMAGE_ROLES = ('image', 'mask', 'depth', 'instances')
+# --array-split 生成的掩码 / 深度图存于 ArrayStore：{划分名}_mask.npy / {划分名}_depth.npy 的一行
+ARRAY_STORE_PATTERN = re.compile(r'^(.+)_(?:mask|depth|instances)\.npy$')
+# 一致性检查中可由 ArrayStore 提供的角色 -> 标注中的引用字段
+ARRAY_STORE_FIELDS = {'mask': 'segmentation_mask', 'depth': 'depth_map'}
+
+VALIDATION_CACHE_FILE = ".validation_cache.json"
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+# PNG 颜色类型 -> 通道数
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+WEBP_HEADER_SIZE = 30
+NPY_HEADER_READ = 4096
+
+def read_range(location, start=0, length=None):
+    """读取文件或分片成员中的一段字节
+
+    location 为 (路径, 数据偏移, 大小)，逐文件布局偏移为 0；start 为负数时从末尾起算。
+    """
+    path, offset, size = location
+    start = max(start if start >= 0 else size + start, 0)
+    length = size - start if length is None else min(length, size - start)
+    with open(path, 'rb') as f:
+        f.seek(offset + start)
+        return f.read(length)
+
+def read_png_header(location):
+    """只读取 PNG 签名、IHDR 块和文件末尾的 IEND 块，不解码像素
+
+    返回 {'width', 'height', 'bit_depth', 'color_type', 'channels'}，结构损坏时抛出 ValueError。
+    """
+    head = read_range(location, 0, 33)
+    if len(head) < 33 or head[:8] != PNG_SIGNATURE:
+        raise ValueError('PNG 签名无效')
+    length, chunk_type = struct.unpack('>I4s', head[8:16])
+    if chunk_type != b'IHDR' or length != 13:
+        raise ValueError('缺少 IHDR 块')
+    if zlib.crc32(head[12:29]) != struct.unpack('>I', head[29:33])[0]:
+        raise ValueError('IHDR 校验和错误')
+    if read_range(location, -len(PNG_IEND)) != PNG_IEND:
+        raise ValueError('文件未以 IEND 块结尾（可能被截断）')
+    
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', head[16:26])
+    if color_type not in PNG_CHANNELS:
+        raise ValueError(f'未知颜色类型: {color_type}')
+    return {
+        'width': width,
+        'height': height,
+        'bit_depth': bit_depth,
+        'color_type': color_type,
+        'channels': PNG_CHANNELS[color_type]
+    }
+
+def read_webp_header(location):
+    """读取 WebP 的 RIFF 头与首个图像块（VP8L / VP8 / VP8X）中的尺寸，并核对 RIFF 长度"""
+    head = read_range(location, 0, WEBP_HEADER_SIZE)
+    if len(head) < WEBP_HEADER_SIZE or head[:4] != b'RIFF' or head[8:12] != b'WEBP':
+        raise ValueError('WebP 签名无效')
+    if struct.unpack('<I', head[4:8])[0] + 8 != location[2]:
+        raise ValueError('文件大小与 RIFF 头不符（可能被截断）')
+    chunk_type = head[12:16]
+    if chunk_type == b'VP8L':
+        if head[20] != 0x2f:
+            raise ValueError('VP8L 签名无效')
+        bits = struct.unpack('<I', head[21:25])[0]
+        width, height = (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        channels = 4 if bits >> 28 & 1 else 3
+    elif chunk_type == b'VP8 ':
+        if head[23:26] != b'\x9d\x01\x2a':
+            raise ValueError('VP8 签名无效')
+        width, height = (v & 0x3fff for v in struct.unpack('<HH', head[26:30]))
+        channels = 3
+    elif chunk_type == b'VP8X':
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+        channels = 4 if head[20] & 0x10 else 3
+    else:
+        raise ValueError(f'未知 WebP 块: {chunk_type!r}')
+    return {
+        'width': width,
+        'height': height,
+        'bit_depth': 8,
+        'channels': channels
+    }
+
+def read_npy_header(location):
+    """读取 .npy 头部的形状与 dtype，并按数据长度核对文件大小"""
+    head = io.BytesIO(read_range(location, 0, NPY_HEADER_READ))
+    version = np.lib.format.read_magic(head)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(head)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(head)
+    if len(shape) not in (2, 3):
+        raise ValueError(f'数组维度不是图像: {shape}')
+    if head.tell() + math.prod(shape) * dtype.itemsize != location[2]:
+        raise ValueError('文件大小与数组头不符（可能被截断）')
+    return {
+        'width': shape[1],
+        'height': shape[0],
+        'bit_depth': dtype.itemsize * 8,
+        'dtype': dtype.str,
+        'channels': shape[2] if len(shape) == 3 else 1
+    }
+
+# 图像扩展名 -> 文件头检查函数
+IMAGE_HEADER_READERS = {
+    IMAGE_FORMATS['png']: read_png_header,
+    IMAGE_FORMATS['webp']: read_webp_header,
+    IMAGE_FORMATS['npy']: read_npy_header
+}
+
+def check_image_file(location, img_file, deep=False):
+    """检查单个图像（PNG / WebP / .npy）：读取文件头；deep=True 时再完整解码并核对尺寸"""
+    try:
+        header = IMAGE_HEADER_READERS[os.path.splitext(img_file)[1]](location)
+        result = {
+            'file': img_file,
+            'status': '✅',
+            'size': [header['height'], header['width'], header['channels']],
+            'channels': header['channels'],
+            'bit_depth': header['bit_depth'],
+            'mode': 'header'
+        }
+        for key in ('color_type', 'dtype'):
+            if key in header:
+                result[key] = header[key]
+        if deep:
+            result['mode'] = 'deep'
+            img = decode_member(img_file, read_range(location))
+            if img is None:
+                result.update({'status': '❌', 'error': '无法读取图像'})
+            elif img.shape[:2] != (header['height'], header['width']):
+                result.update({'status': '❌', 'error': f'解码尺寸 {img.shape[:2]} 与文件头不一致'})
+        return result
+    except Exception as e:
+        return {
+            'file': img_file,
+            'status': '❌',
+            'error': str(e)
+        }
+
+def check_metadata_file(location, meta_file, deep=False):
+    """检查单个元数据文件的必需字段"""
+    try:
+        metadata = codec_for_name(meta_file).decode(read_range(location))
+        
+        # 检查必需字段
+        required_fields = ['scene_id', 'scene_type', 'camera_parameters', 'objects']
+        has_required = all(field in metadata for field in required_fields)
+        
+        return {
+            'file': meta_file,
+            'status': '✅' if has_required else '❌',
+            'scene_id': metadata.get('scene_id', '缺失'),
+            'scene_type': metadata.get('scene_type', '缺失'),
+            'object_count': len(metadata.get('objects', [])),
+            'missing_fields': [f for f in required_fields if f not in metadata]
+        }
+    except Exception as e:
+        return {
+            'file': meta_file,
+            'status': '❌',
+            'error': str(e)
+        }
+
+def check_annotation_file(location, ann_file, deep=False):
+    """检查单个标注文件的必需字段"""
+    try:
+        annotations = codec_for_name(ann_file).decode(read_range(location))
+        
+        # 检查必需字段
+        required_fields = ['image_file', 'bounding_boxes', 'camera_pose']
+        has_required = all(field in annotations for field in required_fields)
+        
+        return {
+            'file': ann_file,
+            'status': '✅' if has_required else '❌',
+            'image_file': annotations.get('image_file', '缺失'),
+            'bbox_count': len(annotations.get('bounding_boxes', [])),
+            'missing_fields': [f for f in required_fields if f not in annotations]
+        }
+    except Exception as e:
+        return {
+            'file': ann_file,
+            'status': '❌',
+            'error': str(e)
+        }
+
+# 检查类型 -> 单文件检查函数（模块级函数，可提交到进程池）
+FILE_CHECKS = {
+    'image': check_image_file,
+    'metadata': check_metadata_file,
+    'annotation': check_annotation_file
+}
+
+def _check_chunk(kind, items):
+    """子进程中检查一组文件，items 为 [(文件名, 位置, deep)]"""
+    check = FILE_CHECKS[kind]
+    return [check(location, name, deep) for name, location, deep in items]
+
+class ValidationCache:
+    """持久化的单文件验证结果缓存
+
+    键为 (检查类型, 文件名)，文件大小或修改时间变化即视为失效；
+    图像的文件头检查结果不能代替完整解码结果，反之可以。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f).get('files', {})
+            except (OSError, ValueError):
+                self.entries = {}
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(kind, name):
+        return f"{kind}:{name}"
+    
+    def get(self, kind, name, stat, deep=False):
+        """命中时返回缓存的结果，否则返回 None"""
+        entry = self.entries.get(self._key(kind, name))
+        if entry is None or entry['size'] != stat[0] or entry['mtime'] != stat[1]:
+            return None
+        if deep and not entry['deep']:
+            return None
+        return entry['result']
+    
+    def put(self, kind, name, stat, deep, result):
+        self.entries[self._key(kind, name)] = {
+            'size': stat[0],
+            'mtime': stat[1],
+            'deep': deep or result.get('mode') == 'deep',
+            'result': result
+        }
+    
+    def prune(self, index):
+        """删除已不存在的文件的缓存项"""
+        self.entries = {key: entry for key, entry in self.entries.items()
+                        if key.split(':', 1)[1] in index}
+    
+    def save(self):
+        if self.path is not None:
+            write_json_atomic(self.path, {'files': self.entries})
+
+def _scene_role(suffix):
+    """根据场景文件名后缀判断文件角色"""
+    if suffix.startswith('_annotations'):
+        return 'annotations'
+    if suffix.startswith('_mask.'):
+        return 'mask'
+    if suffix.startswith('_depth.'):
+        return 'depth'
+    if suffix.startswith('_instances.'):
+        return 'instances'
+    if suffix in METADATA_EXTS:
+        return 'metadata'
+    return 'image'
+
+class DirectoryIndex:
+    """目录索引：一次 os.scandir 得到所有文件的大小、修改时间，并按场景 ID 分组
+
+    含 index.json 的分片目录按分片索引列出各成员，成员的位置为 (分片路径, 数据偏移, 大小)，
+    缓存用的修改时间取 "分片修改时间:偏移"，检查时直接 seek 读取，不解包分片。
+    """
+    
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.files = {}                     # 文件名 -> (size, mtime)
+        self.locations = {}                 # 文件名 -> (路径, 数据偏移, 大小)
+        self.roles = {}                     # 场景文件名 -> 角色
+        self.scenes = defaultdict(dict)     # 场景 ID (如 scene_000) -> {角色: 文件名}
+        self.legacy = {}                    # 旧命名 mask_xxx.png / depth_xxx.png
+        self.layout = 'shards' if os.path.exists(os.path.join(data_dir, INDEX_FILE)) else 'files'
+        
+        if self.layout == 'shards':
+            self._scan_shards()
+            return
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                self._add(entry.name, (stat.st_size, stat.st_mtime), (entry.path, 0, stat.st_size))
+    
+    def _scan_shards(self):
+        with open(os.path.join(self.data_dir, INDEX_FILE), 'r') as f:
+            shard_index = json.load(f)
+        shard_paths = [os.path.join(self.data_dir, name) for name in shard_index['shards']]
+        shard_mtimes = [os.stat(path).st_mtime if os.path.exists(path) else None for path in shard_paths]
+        for members in shard_index['samples'].values():
+            for name, (shard_id, offset, size) in members.items():
+                self._add(name, (size, f"{shard_mtimes[shard_id]}:{offset}"), (shard_paths[shard_id], offset, size))
+    
+    def _add(self, name, stat, location):
+        self.files[name] = stat
+        self.locations[name] = location
+        if name.startswith(('mask_', 'depth_')):
+            self.legacy[name] = name.split('_', 1)[0]
+            return
+        match = SCENE_FILE_PATTERN.match(name)
+        if match:
+            role = _scene_role(match.group(2))
+            self.roles[name] = role
+            self.scenes[match.group(1)][role] = name
+    
+    def __contains__(self, name):
+        return name in self.files
+    
+    def names(self):
+        return self.files.keys()
+    
+    def scene_files(self, role):
+        """某一角色的全部场景文件名（按场景 ID 排序）"""
+        return [files[role] for _, files in sorted(self.scenes.items()) if role in files]
+    
+    def image_files(self):
+        """按图像检查的场景文件（场景图像、掩码、深度图、实例掩码，扩展名为写入端支持的图像格式）"""
+        return [name for name in self.names() if name.endswith(IMAGE_EXTS) and self.roles.get(name) in IMAGE_ROLES]
 
 class DatasetValidator:
-    """数据集验证器"""
+    """数据集验证器
+
+    支持逐文件目录与 tar 分片目录（含 index.json）；图像可为 PNG / WebP / .npy。
+    图像默认只做文件头检查（PNG 签名、IHDR、IEND，WebP RIFF 头，.npy 数组头与文件大小），
+    deep=True 时完整解码全部图像，否则按 sample_rate 随机抽样完整解码。
+    单文件检查结果按 (文件名, 大小, 修改时间) 缓存在数据目录中，
+    再次验证时只重新检查新增或变化的文件；workers > 1 时用进程池并行检查。
+    以 --array-split 生成的数据集，掩码与深度图按标注中的 array_row 在 ArrayStore 中核对。
+    """
     
-    def __init__(self, data_dir="generated_data"):
+    def __init__(self, data_dir="generated_data", deep=False, sample_rate=0.0, seed=None,
+                 workers=1, use_cache=True, chunk_size=256):
         self.data_dir = data_dir
+        self.deep = deep
+        self.sample_rate = sample_rate
+        self._rng = random.Random(seed)
+        self.workers = workers
+        self.use_cache = use_cache
+        self.chunk_size = chunk_size
         self.validation_results = {}
+        self._index = None
+        self._cache = None
+        self._executor = None
+    
+    @property
+    def index(self):
+        """目录索引，首次访问时扫描一次目录，之后所有检查共用"""
+        if self._index is None:
+            self._index = DirectoryIndex(self.data_dir)
+        return self._index
+    
+    def refresh_index(self):
+        """目录内容变化后重新扫描"""
+        self._index = None
+        return self.index
     
     def validate_all(self):
         """验证整个数据集"""
         print("🔍 开始验证数据集...")
         
-        results = {
-            'directory_structure': self.validate_directory_structure(),
-            'image_files': self.validate_image_files(),
-            'metadata_files': self.validate_metadata_files(),
-            'annotation_files': self.validate_annotation_files(),
-            'data_consistency': self.validate_data_consistency()
-        }
+        if os.path.exists(self.data_dir):
+            self.refresh_index()
+            self._cache = self._open_cache()
+        
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            results = {
+                'directory_structure': self.validate_directory_structure(),
+                'image_files': self.validate_image_files(),
+                'metadata_files': self.validate_metadata_files(),
+                'annotation_files': self.validate_annotation_files(),
+                'data_consistency': self.validate_data_consistency()
+            }
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        
+        if self._cache is not None:
+            results['validation_cache'] = self._cache_summary()
+            self._cache.prune(self.index)
+            self._cache.save()
+            self._cache = None
         
         self.print_validation_summary(results)
         return results
     
+    def _open_cache(self):
+        path = os.path.join(self.data_dir, VALIDATION_CACHE_FILE) if self.use_cache else None
+        return ValidationCache(path)
+    
+    def _cache_summary(self):
+        cache = self._cache
+        return {
+            'status': True,
+            'summary': f'缓存命中 {cache.hits} 个，重新检查 {cache.misses} 个',
+            'cached': cache.hits,
+            'recomputed': cache.misses
+        }
+    
+    def _check_files(self, kind, names, deep_flags=None):
+        """对一组文件执行单文件检查，命中缓存的直接复用，其余按块并行检查"""
+        cache = self._cache if self._cache is not None else self._open_cache()
+        if deep_flags is None:
+            deep_flags = [False] * len(names)
+        
+        results = [None] * len(names)
+        pending = []
+        for i, (name, deep) in enumerate(zip(names, deep_flags)):
+            cached = cache.get(kind, name, self.index.files[name], deep)
+            if cached is not None:
+                results[i] = cached
+                cache.hits += 1
+            else:
+                pending.append(i)
+        cache.misses += len(pending)
+        
+        chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+        locations = self.index.locations
+        items = [[(names[i], locations[names[i]], deep_flags[i]) for i in chunk] for chunk in chunks]
+        if self._executor is not None and len(chunks) > 1:
+            checked = self._executor.map(_check_chunk, [kind] * len(chunks), items)
+        else:
+            checked = (_check_chunk(kind, chunk_items) for chunk_items in items)
+        
+        for chunk, chunk_results in zip(chunks, checked):
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+                cache.put(kind, names[i], self.index.files[names[i]], deep_flags[i], result)
+        return results
+    
     def validate_directory_structure(self):
         """验证目录结构"""
         print("📁 验证目录结构...")
@@ -40,16 +483,19 @@ class DatasetValidator:
                 'summary': '数据目录不存在'
             }
         
-        required_files = []
-        for file in os.listdir(self.data_dir):
-            if file.endswith('.png') or file.endswith('.json'):
-                required_files.append(file)
+        index = self.index
+        required_files = [f for f in index.names() if f.endswith(IMAGE_EXTS + METADATA_EXTS)]
+        
+        scene_roles = set()
+        for files in index.scenes.values():
+            scene_roles.update(files)
+        legacy_kinds = set(index.legacy.values())
         
-        has_scene_images = any(f.startswith('scene_') and f.endswith('.png') and not f.startswith(('mask_', 'depth_')) for f in required_files)
-        has_metadata = any(f.startswith('scene_') and f.endswith('.json') and 'annotations' not in f for f in required_files)
-        has_annotations = any('annotations' in f for f in required_files)
-        has_masks = any(f.startswith('mask_') for f in required_files)
-        has_depth = any(f.startswith('depth_') for f in required_files)
+        has_scene_images = 'image' in scene_roles
+        has_metadata = 'metadata' in scene_roles
+        has_annotations = 'annotations' in scene_roles
+        has_masks = 'mask' in scene_roles or 'mask' in legacy_kinds
+        has_depth = 'depth' in scene_roles or 'depth' in legacy_kinds
         
         status = has_scene_images and has_metadata and has_annotations
         summary = f"目录结构: {len(required_files)} 个文件"
@@ -63,6 +509,7 @@ class DatasetValidator:
                 'annotations': has_annotations,
                 'masks': has_masks,
                 'depth_maps': has_depth,
+                'layout': index.layout,
                 'total_files': len(required_files)
             }
         }
@@ -77,8 +524,7 @@ class DatasetValidator:
                 'summary': '数据目录不存在'
             }
         
-        image_files = [f for f in os.listdir(self.data_dir) 
-                      if f.endswith('.png') and not f.startswith(('mask_', 'depth_'))]
+        image_files = self.index.image_files()
         
         if not image_files:
             return {
@@ -86,34 +532,14 @@ class DatasetValidator:
                 'summary': '没有找到图像文件'
             }
         
-        results = []
-        for img_file in image_files:
-            try:
-                img_path = os.path.join(self.data_dir, img_file)
-                img = cv2.imread(img_path)
-                if img is not None:
-                    results.append({
-                        'file': img_file,
-                        'status': '✅',
-                        'size': img.shape,
-                        'channels': img.shape[2] if len(img.shape) > 2 else 1
-                    })
-                else:
-                    results.append({
-                        'file': img_file,
-                        'status': '❌',
-                        'error': '无法读取图像'
-                    })
-            except Exception as e:
-                results.append({
-                    'file': img_file,
-                    'status': '❌',
-                    'error': str(e)
-                })
+        deep_flags = [self.deep or (self.sample_rate > 0 and self._rng.random() < self.sample_rate)
+                      for _ in image_files]
+        results = self._check_files('image', image_files, deep_flags)
         
         valid_count = len([r for r in results if r['status'] == '✅'])
+        decoded_count = len([r for r in results if r.get('mode') == 'deep'])
         status = valid_count == len(image_files)
-        summary = f'{valid_count}/{len(image_files)} 个图像文件有效'
+        summary = f'{valid_count}/{len(image_files)} 个图像文件有效（完整解码 {decoded_count} 个）'
         
         return {
             'status': status,
@@ -131,8 +557,7 @@ class DatasetValidator:
                 'summary': '数据目录不存在'
             }
         
-        metadata_files = [f for f in os.listdir(self.data_dir) 
-                         if f.endswith('.json') and 'annotations' not in f]
+        metadata_files = self.index.scene_files('metadata')
         
         if not metadata_files:
             return {
@@ -140,31 +565,7 @@ class DatasetValidator:
                 'summary': '没有找到元数据文件'
             }
         
-        results = []
-        for meta_file in metadata_files:
-            try:
-                meta_path = os.path.join(self.data_dir, meta_file)
-                with open(meta_path, 'r') as f:
-                    metadata = json.load(f)
-                
-                # 检查必需字段
-                required_fields = ['scene_id', 'scene_type', 'camera_parameters', 'objects']
-                has_required = all(field in metadata for field in required_fields)
-                
-                results.append({
-                    'file': meta_file,
-                    'status': '✅' if has_required else '❌',
-                    'scene_id': metadata.get('scene_id', '缺失'),
-                    'scene_type': metadata.get('scene_type', '缺失'),
-                    'object_count': len(metadata.get('objects', [])),
-                    'missing_fields': [f for f in required_fields if f not in metadata]
-                })
-            except Exception as e:
-                results.append({
-                    'file': meta_file,
-                    'status': '❌',
-                    'error': str(e)
-                })
+        results = self._check_files('metadata', metadata_files)
         
         valid_count = len([r for r in results if r['status'] == '✅'])
         status = valid_count == len(metadata_files)
@@ -186,7 +587,7 @@ class DatasetValidator:
                 'summary': '数据目录不存在'
             }
         
-        annotation_files = [f for f in os.listdir(self.data_dir) if 'annotations' in f and f.endswith('.json')]
+        annotation_files = self.index.scene_files('annotations')
         
         if not annotation_files:
             return {
@@ -194,30 +595,7 @@ class DatasetValidator:
                 'summary': '没有找到标注文件'
             }
         
-        results = []
-        for ann_file in annotation_files:
-            try:
-                ann_path = os.path.join(self.data_dir, ann_file)
-                with open(ann_path, 'r') as f:
-                    annotations = json.load(f)
-                
-                # 检查必需字段
-                required_fields = ['image_file', 'bounding_boxes', 'camera_pose']
-                has_required = all(field in annotations for field in required_fields)
-                
-                results.append({
-                    'file': ann_file,
-                    'status': '✅' if has_required else '❌',
-                    'image_file': annotations.get('image_file', '缺失'),
-                    'bbox_count': len(annotations.get('bounding_boxes', [])),
-                    'missing_fields': [f for f in required_fields if f not in annotations]
-                })
-            except Exception as e:
-                results.append({
-                    'file': ann_file,
-                    'status': '❌',
-                    'error': str(e)
-                })
+        results = self._check_files('annotation', annotation_files)
         
         valid_count = len([r for r in results if r['status'] == '✅'])
         status = valid_count == len(annotation_files)
@@ -239,30 +617,32 @@ class DatasetValidator:
                 'summary': '数据目录不存在'
             }
         
-        # 检查图像和元数据的对应关系
-        scene_images = [f for f in os.listdir(self.data_dir) 
-                       if f.startswith('scene_') and f.endswith('.png') and not f.startswith(('mask_', 'depth_'))]
-        metadata_files = [f for f in os.listdir(self.data_dir) 
-                         if f.startswith('scene_') and f.endswith('.json') and 'annotations' not in f]
-        
+        # 按场景 ID 分组检查图像、元数据、标注、掩码和深度图的对应关系（线性一遍）
+        index = self.index
         consistency_issues = []
+        stores = {}
         
-        for img_file in scene_images:
-            base_name = img_file.replace('.png', '')
-            corresponding_meta = base_name + '.json'
-            corresponding_ann = base_name + '_annotations.json'
-            corresponding_mask = 'mask_' + img_file
-            corresponding_depth = 'depth_' + img_file
+        for scene_key, files in sorted(index.scenes.items()):
+            if 'image' not in files:
+                continue
+            img_file = files['image']
             
             missing_files = []
-            if corresponding_meta not in metadata_files:
-                missing_files.append(corresponding_meta)
-            if corresponding_ann not in os.listdir(self.data_dir):
-                missing_files.append(corresponding_ann)
-            if corresponding_mask not in os.listdir(self.data_dir):
-                missing_files.append(corresponding_mask)
-            if corresponding_depth not in os.listdir(self.data_dir):
-                missing_files.append(corresponding_depth)
+            if 'metadata' not in files:
+                missing_files.append(scene_key + '.json')
+            if 'annotations' not in files:
+                missing_files.append(scene_key + '_annotations.json')
+            # 掩码 / 深度图也接受旧命名 mask_scene_xxx.png / depth_scene_xxx.png，
+            # 或标注指向的 ArrayStore 行（--array-split）
+            stored = {}
+            if ('mask' not in files or 'depth' not in files) and 'annotations' in files:
+                stored = self._array_store_refs(scene_key, files['annotations'], stores)
+            for role in ('mask', 'depth'):
+                if role in files or f"{role}_{img_file}" in index:
+                    continue
+                reference, found = stored.get(role, (f"{scene_key}_{role}.png", False))
+                if not found:
+                    missing_files.append(reference)
             
             if missing_files:
                 consistency_issues.append({
@@ -279,6 +659,30 @@ class DatasetValidator:
             'details': consistency_issues
         }
     
+    def _array_store_refs(self, scene_key, ann_file, stores):
+        """标注中指向 ArrayStore 的掩码 / 深度图：{角色: (引用, 是否有效)}
+
+        以 --array-split 生成时，标注的 segmentation_mask / depth_map 为 {划分名}_mask.npy 等，
+        array_row 为行号；该行的场景 ID 与本场景一致时视为有效。stores 缓存已打开的划分。
+        """
+        try:
+            annotations = codec_for_name(ann_file).decode(read_range(self.index.locations[ann_file]))
+            row = int(annotations['array_row'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+        scene_id = int(scene_key.split('_')[1])
+        refs = {}
+        for role, field in ARRAY_STORE_FIELDS.items():
+            match = ARRAY_STORE_PATTERN.match(str(annotations.get(field, '')))
+            if match is None:
+                continue
+            split = match.group(1)
+            if split not in stores:
+                stores[split] = ArrayStore.open(self.data_dir, split) if ArrayStore.exists(self.data_dir, split) else None
+            found = stores[split] is not None and stores[split].has_row(row, scene_id)
+            refs[role] = (f"{annotations[field]}[{row}]", found)
+        return refs
+    
     def print_validation_summary(self, results):
         """打印验证总结"""
         print("\n" + "="*60)
@@ -303,14 +707,24 @@ class DatasetValidator:
 
 def main():
     """主验证函数"""
+    parser = argparse.ArgumentParser(description="UAV 数据集验证")
+    parser.add_argument('--data-dir', default="generated_data", help="数据目录")
+    parser.add_argument('--deep', action='store_true', help="完整解码所有图像")
+    parser.add_argument('--sample-rate', type=float, default=0.0, help="非 deep 模式下随机完整解码的比例 (0-1)")
+    parser.add_argument('--seed', type=int, default=None, help="抽样随机种子")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="并行检查的进程数")
+    parser.add_argument('--no-cache', action='store_true', help="忽略并不写入验证缓存")
+    args = parser.parse_args()
+    
     print("🚀 UAV Synthetic Dataset - 数据验证")
     print("="*60)
     
-    validator = DatasetValidator()
+    validator = DatasetValidator(args.data_dir, deep=args.deep, sample_rate=args.sample_rate, seed=args.seed,
+                                 workers=args.workers, use_cache=not args.no_cache)
     results = validator.validate_all()
     
     # 保存验证报告
-    report_path = "generated_data/validation_report.json"
+    report_path = os.path.join(args.data_dir, "validation_report.json")
     with open(report_path, 'w') as f:
         # 确保所有结果都可序列化
         serializable_results = {}
@@ -0,0 +1,138 @@
+"""
+虚拟数据集模块
+不落盘的按需数据集：每次访问时由根种子重建场景并渲染（可选同时生成标注），
+最近访问的样本保存在按字节数限定大小的 LRU 缓存中，内存占用固定
+"""
+
+import threading
+from collections import OrderedDict
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.image_processing.annotation_generator import AnnotationGenerator
+
+
+def _sample_bytes(sample):
+    """样本中全部数组的字节数"""
+    return sum(value.nbytes for value in sample.values() if hasattr(value, 'nbytes'))
+
+
+class SampleCache:
+    """按条目数和总字节数限定大小的 LRU 缓存（线程安全）
+
+    超出任一上限时淘汰最久未访问的条目；max_bytes 为 None 时只按条目数限制。
+    """
+
+    def __init__(self, max_items=64, max_bytes=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # 传给 DataLoader 等子进程时只复制配置，不复制缓存内容
+        return {'max_items': self.max_items, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """命中时返回条目并标记为最近使用，否则返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=0):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if self.max_items <= 0 or (self.max_bytes is not None and nbytes > self.max_bytes):
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while len(self._entries) > self.max_items or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'items': len(self._entries),
+                'bytes': self.nbytes,
+                'max_items': self.max_items,
+                'max_bytes': self.max_bytes
+            }
+
+
+class VirtualUAVDataset:
+    """按需渲染的虚拟 UAV 数据集
+
+    dataset[i] 与以同一 seed 运行 UAVDataPipeline 生成的第 i 个场景像素一致，
+    但不读写任何文件。样本为字典：image (H, W, 3) uint8 BGR、metadata；
+    annotate=True 时另有 annotations、segmentation_mask、instance_mask 和 float32 depth。
+    返回的数组与缓存共享且为只读，需要就地修改（如数据增强）时请先拷贝。
+    """
+
+    def __init__(self, num_scenes, seed=0, annotate=True, resolution=(640, 480), cache_size=64,
+                 cache_bytes=None):
+        self.num_scenes = num_scenes
+        self.annotate = annotate
+        self.pipeline = UAVDataPipeline(None, seed=seed, resolution=resolution)
+        self.annotator = AnnotationGenerator(depth_format='float32', metrics=self.pipeline.metrics) if annotate else None
+        self.cache = SampleCache(cache_size, cache_bytes)
+
+    @property
+    def seed(self):
+        return self.pipeline.seed
+
+    def __len__(self):
+        return self.num_scenes
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.num_scenes
+        if not 0 <= index < self.num_scenes:
+            raise IndexError(f"场景索引超出范围: {index}")
+        sample = self.cache.get(index)
+        if sample is None:
+            sample = self.render_sample(index)
+            self.cache.put(index, sample, _sample_bytes(sample))
+        return sample
+
+    def render_sample(self, scene_id):
+        """从种子重建并渲染一个样本（不经过缓存）"""
+        scene_data, image = self.pipeline.regenerate_scene(scene_id)
+        sample = {'scene_id': scene_id, 'image': image, 'metadata': scene_data}
+        if self.annotator is not None:
+            annotations, mask, depth, instances = self.annotator.annotate_scene(
+                image, scene_data, f"scene_{scene_id:03d}.png")
+            sample.update({
+                'annotations': annotations,
+                'segmentation_mask': mask,
+                'instance_mask': instances,
+                'depth': depth
+            })
+        for value in sample.values():
+            if hasattr(value, 'setflags'):
+                value.setflags(write=False)
+        return sample
+
+    def cache_info(self):
+        """缓存命中 / 未命中次数与当前占用"""
+        return self.cache.info()
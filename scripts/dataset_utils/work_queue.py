@@ -0,0 +1,217 @@
+"""
+租约工作队列模块
+无需协调者的多进程 / 多主机任务分配：场景 ID 按块划分，各进程在输出目录的
+.leases/ 下用原子创建的租约文件认领数据块，持有期间定期心跳；进程退出或
+崩溃后租约过期，其他进程可回收该块。完成的块写入 .done 标记，整个数据集只生成一次。
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from scripts.dataset_utils.storage import write_json_atomic
+
+LEASE_DIR = ".leases"
+RUN_FILE = "run.json"
+
+
+def default_worker_id():
+    """主机名 + 进程号 + 随机后缀，保证同一主机上重启的进程也不重名"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class LeaseQueue:
+    """基于租约文件的工作队列
+
+    num_items 个任务按 chunk_size 分块。claim() 认领一个未完成且未被有效持有的块；
+    hold(chunk) 在后台线程中每 ttl/3 秒心跳一次；complete(chunk) 写完成标记并释放租约。
+    租约以 os.link 原子创建（NFS 上同样可靠），过期判断使用文件系统（NFS 服务器）
+    的时间戳，不依赖各主机时钟同步。
+    """
+
+    def __init__(self, output_dir, num_items, chunk_size=100, ttl=60.0, worker_id=None):
+        self.lease_dir = os.path.join(output_dir, LEASE_DIR)
+        self.num_items = num_items
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.worker_id = worker_id or default_worker_id()
+        self.num_chunks = (num_items + chunk_size - 1) // chunk_size
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+    def chunk_range(self, chunk):
+        """块对应的任务 ID 范围"""
+        return range(chunk * self.chunk_size, min((chunk + 1) * self.chunk_size, self.num_items))
+
+    @staticmethod
+    def chunk_name(chunk):
+        return f"chunk_{chunk:06d}"
+
+    def _path(self, name, suffix):
+        return os.path.join(self.lease_dir, f"{name}.{suffix}")
+
+    def _now(self):
+        """文件系统当前时间：更新本进程的探针文件并读取其修改时间"""
+        probe = self._path(f"clock-{self.worker_id}", "probe")
+        with open(probe, 'a'):
+            pass
+        os.utime(probe)
+        return os.stat(probe).st_mtime
+
+    def is_done(self, name):
+        return os.path.exists(self._path(name, "done"))
+
+    def all_done(self):
+        return all(self.is_done(self.chunk_name(chunk)) for chunk in range(self.num_chunks))
+
+    def pending(self):
+        """尚未完成的块"""
+        return [chunk for chunk in range(self.num_chunks) if not self.is_done(self.chunk_name(chunk))]
+
+    def owner(self, name):
+        """当前租约持有者的 worker_id，无租约时为 None"""
+        try:
+            with open(self._path(name, "lease"), 'r') as f:
+                return json.load(f).get('worker')
+        except (OSError, ValueError):
+            return None
+
+    def _try_create(self, name):
+        """原子创建租约：先写私有临时文件再硬链接到租约路径，已存在时失败"""
+        lease_path = self._path(name, "lease")
+        tmp_path = self._path(f"{name}.{self.worker_id}", "tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'worker': self.worker_id, 'host': socket.gethostname(), 'pid': os.getpid(),
+                       'claimed_at': time.time()}, f)
+        try:
+            os.link(tmp_path, lease_path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+
+    def _expired(self, name):
+        try:
+            mtime = os.stat(self._path(name, "lease")).st_mtime
+        except FileNotFoundError:
+            return True
+        return self._now() - mtime > self.ttl
+
+    def _steal(self, name):
+        """将过期租约原子改名后删除；多个进程同时回收时只有一个成功"""
+        lease_path = self._path(name, "lease")
+        stale_path = self._path(f"{name}.{self.worker_id}", "stale")
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        try:
+            if self._now() - os.stat(stale_path).st_mtime <= self.ttl:
+                # 判断过期之后已被别人重新认领：放回原处（若期间又有新租约则保留新租约）
+                try:
+                    os.link(stale_path, lease_path)
+                except FileExistsError:
+                    pass
+                return False
+            return True
+        finally:
+            os.unlink(stale_path)
+
+    def _acquire(self, name):
+        """认领 name：无租约时直接创建，租约过期时回收后创建"""
+        if self._try_create(name) or (self._expired(name) and self._steal(name) and self._try_create(name)):
+            if self.is_done(name):
+                # 检查之后别人恰好完成了该块
+                self.release(name)
+                return False
+            return True
+        return False
+
+    def claim(self):
+        """认领一个可处理的块，没有时返回 None"""
+        for chunk in range(self.num_chunks):
+            name = self.chunk_name(chunk)
+            if not self.is_done(name) and self._acquire(name):
+                return chunk
+        return None
+
+    def heartbeat(self, name):
+        """刷新租约时间戳；租约已被回收（不再属于本进程）时返回 False"""
+        if self.owner(name) != self.worker_id:
+            return False
+        try:
+            os.utime(self._path(name, "lease"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, name):
+        """释放本进程持有的租约，其他进程可立即认领"""
+        if self.owner(name) == self.worker_id:
+            try:
+                os.unlink(self._path(name, "lease"))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, name):
+        """写入完成标记（原子替换）并释放租约"""
+        done_path = self._path(name, "done")
+        tmp_path = f"{done_path}.tmp.{self.worker_id}"
+        with open(tmp_path, 'w') as f:
+            json.dump({'worker': self.worker_id, 'completed_at': time.time()}, f)
+        os.replace(tmp_path, done_path)
+        self.release(name)
+
+    @contextmanager
+    def hold(self, name):
+        """持有租约期间在后台线程中定期心跳；块内出错时释放租约交给其他进程"""
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            while not stop.wait(self.ttl / 3):
+                if not self.heartbeat(name):
+                    lost.set()
+                    return
+
+        thread = threading.Thread(target=beat, name=f"lease-heartbeat-{name}", daemon=True)
+        thread.start()
+        try:
+            yield lost
+        except BaseException:
+            stop.set()
+            thread.join()
+            self.release(name)
+            raise
+        stop.set()
+        thread.join()
+
+    def close(self):
+        """删除本进程的时钟探针文件"""
+        try:
+            os.unlink(self._path(f"clock-{self.worker_id}", "probe"))
+        except FileNotFoundError:
+            pass
+
+    def join(self, config):
+        """加入运行：第一个进程写入运行配置，之后加入的进程读取同一份配置并返回"""
+        path = os.path.join(self.lease_dir, RUN_FILE)
+        self.setup_once('run', lambda: write_json_atomic(path, config))
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def setup_once(self, name, fn, poll_interval=None):
+        """所有进程中只执行一次 fn（如预分配共享文件），其他进程等待其完成"""
+        poll_interval = poll_interval or min(1.0, self.ttl / 3)
+        while not self.is_done(name):
+            if self._acquire(name):
+                with self.hold(name):
+                    fn()
+                self.complete(name)
+                return True
+            time.sleep(poll_interval)
+        return False
@@ -3,139 +3,348 @@
 使用 OpenCV 生成合成数据的标注
 """
 
-import cv2
 import numpy as np
-import json
 import os
+import sys
+
+if __package__ in (None, ''):
+    # 以 python scripts/image_processing/annotation_generator.py 直接运行时，将仓库根目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.dataset_utils.manifest import Manifest, bytes_hash, file_digests
+from scripts.dataset_utils.metadata_codec import MetadataCodec, codec_for_name, find_metadata, load_metadata
+from scripts.dataset_utils.scene_model import as_scene_objects
+from scripts.dataset_utils.storage import IMAGE_FORMATS, ImageEncoder, ShardWriter, decode_member, encode_sample
+from scripts.image_processing import batch_renderer, camera, depth_renderer
+from scripts.instrumentation import Metrics
+
+# 标注算法版本，参与增量处理的输入哈希；标注逻辑变化时递增
+ANNOTATION_VERSION = 5
+ANNOTATION_MANIFEST_FILE = "annotator_manifest.json"
+# 离线标注时识别的场景图像扩展名，与写入端的图像格式一致（.png / .webp / .npy）
+IMAGE_EXTS = tuple(IMAGE_FORMATS.values())
+
+# 物体类型 -> 分割掩码中的类别值
+CLASS_VALUES = {
+    'building': 1,
+    'tree': 2,
+    'obstacle': 3
+}
+
+# 实例掩码为 uint16：0 为背景，物体 i 的实例 ID 为 i + 1
+MAX_INSTANCES = np.iinfo(np.uint16).max
 
 class AnnotationGenerator:
-    """标注生成器"""
+    """标注生成器
+
+    depth_format 为输出深度图的类型：'uint16'（像素值 = 深度 * depth_scale，
+    depth_scale 为 None 时按场景自动选取）或 'float32'（按所选图像格式无法保存时存为 .npy）。
+    metrics 为 instrumentation.Metrics，记录各标注步骤的耗时；未指定时新建一份。
+    metadata_format 为标注文件的格式（见 metadata_codec.METADATA_FORMATS），输入元数据按扩展名识别。
+    """
     
-    def __init__(self):
+    def __init__(self, depth_format='uint16', depth_scale=None, metrics=None, metadata_format='json'):
+        if depth_format not in depth_renderer.DEPTH_FORMATS:
+            raise ValueError(f"不支持的深度格式: {depth_format}")
+        self.depth_format = depth_format
+        self.depth_scale = depth_scale
+        self.metadata_codec = MetadataCodec(metadata_format)
+        self.metrics = metrics if metrics is not None else Metrics()
         print("🖊️ 标注生成器初始化")
     
-    def generate_annotations(self, image_path, metadata_path):
+    def generate_annotations(self, image_path, metadata_path, writer=None):
         """为图像生成标注"""
         # 读取图像和元数据
-        image = cv2.imread(image_path)
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
+        with self.metrics.timer('annotate.read'):
+            with open(image_path, 'rb') as f:
+                image = decode_member(image_path, f.read())
+            metadata = load_metadata(metadata_path)
         
-        # 生成分割掩码
-        segmentation_mask = self._create_segmentation_mask(image, metadata)
+        annotations, segmentation_mask, depth_map, instance_mask = self.annotate_scene(
+            image, metadata, os.path.basename(image_path), os.path.basename(metadata_path))
+        self.save_annotations(image_path, annotations, segmentation_mask, depth_map,
+                              writer=writer, scene_id=metadata['scene_id'], instance_mask=instance_mask)
+        return annotations
+    
+    def annotate_scene(self, image, metadata, image_file, metadata_file=None, depth_map=None):
+        """直接基于内存中的图像数组和元数据字典生成标注
+
+        返回 (annotations, segmentation_mask, depth_map, instance_mask)，不做任何磁盘读写。
+        segmentation_mask 为 uint8 类别值，instance_mask 为 uint16 实例 ID（物体序号 + 1）。
+        depth_map 为 float32 深度（沿相机光轴的距离），输出时才按 depth_format 转换；
+        可传入 depth_renderer.render_depth_batch 批量算好的深度图。
+        """
+        if metadata_file is None:
+            metadata_file = os.path.splitext(image_file)[0] + '.json'
+        # 物体统一转换为结构数组，后续各步骤直接读取数组
+        metadata = dict(metadata, objects=as_scene_objects(metadata['objects']))
         
-        # 生成边界框
-        bounding_boxes = self._create_bounding_boxes(metadata)
+        # 按相机参数一次性投影全部物体，并用与渲染器相同的光栅化得到每个像素最上层的物体
+        height, width = image.shape[:2]
+        metrics = self.metrics
+        with metrics.timer('annotate.rasterize'):
+            geometry = camera.project_scene(metadata, width, height)
+            labels = batch_renderer.rasterize_scene_labels(geometry, height, width)
         
-        # 生成深度图（模拟）
-        depth_map = self._create_depth_map(image.shape, metadata)
+        # 生成分割掩码与实例掩码
+        with metrics.timer('annotate.segmentation'):
+            segmentation_mask = self._create_segmentation_mask(image, metadata, labels)
+        with metrics.timer('annotate.instances'):
+            instance_mask = self._create_instance_mask(labels, len(metadata['objects']))
         
+        # 生成边界框（投影得到完整框，实例掩码统计得到可见框、面积和质心）
+        with metrics.timer('annotate.bounding_boxes'):
+            bounding_boxes = self._create_bounding_boxes(metadata, width, height, geometry, instance_mask)
+        
+        # 生成深度图
+        if depth_map is None:
+            with metrics.timer('annotate.depth'):
+                depth_map = self._create_depth_map(image.shape, metadata, geometry)
+        metrics.increment('annotate.scenes')
+        
+        # 掩码 / 深度图文件名与写出时一致：{stem}_mask{ext} 等；实际写出格式由 annotation_files 确定
+        stem, ext = os.path.splitext(image_file)
         annotations = {
-            'image_file': os.path.basename(image_path),
-            'metadata_file': os.path.basename(metadata_path),
+            'image_file': image_file,
+            'metadata_file': metadata_file,
             'image_size': [image.shape[1], image.shape[0]],  # [width, height]
-            'segmentation_mask': 'mask_' + os.path.basename(image_path),
+            'segmentation_mask': f"{stem}_mask{ext}",
+            'instance_mask': f"{stem}_instances{ext}",
             'bounding_boxes': bounding_boxes,
-            'depth_map': 'depth_' + os.path.basename(image_path),
+            'depth_map': f"{stem}_depth{ext}",
             'camera_pose': metadata['camera_parameters']
         }
         
-        # 保存标注文件
-        annotation_path = image_path.replace('.png', '_annotations.json')
-        with open(annotation_path, 'w') as f:
-            json.dump(annotations, f, indent=2)
+        return annotations, segmentation_mask, depth_map, instance_mask
+    
+    def save_annotations(self, image_path, annotations, segmentation_mask, depth_map, writer=None, scene_id=None,
+                         instance_mask=None):
+        """保存标注文件、分割掩码、实例掩码和深度图
+
+        writer 为 storage 模块中的写入器（如 ShardWriter）时按 scene_id 写入该容器，
+        否则写到图像所在目录。返回写出的 {文件名: 字节}。
+        """
+        with self.metrics.timer('annotate.encode'):
+            files = self.encode_annotations(os.path.basename(image_path), annotations, segmentation_mask, depth_map,
+                                            instance_mask=instance_mask)
+        annotation_path = os.path.splitext(image_path)[0] + '_annotations' + self.metadata_codec.ext
         
-        # 保存分割掩码和深度图
-        mask_path = image_path.replace('.png', '_mask.png')
-        depth_path = image_path.replace('.png', '_depth.png')
-        cv2.imwrite(mask_path, segmentation_mask)
-        cv2.imwrite(depth_path, depth_map)
+        with self.metrics.timer('annotate.write'):
+            if writer is not None:
+                writer.write_sample(scene_id, files)
+            else:
+                for name, data in files.items():
+                    with open(os.path.join(os.path.dirname(image_path), name), 'wb') as f:
+                        f.write(data)
         
         print(f"✅ 标注生成完成: {annotation_path}")
+        return files
+    
+    def encode_annotations(self, image_file, annotations, segmentation_mask, depth_map, include_maps=True,
+                           instance_mask=None):
+        """将标注、掩码和深度图编码为 {文件名: 字节}（掩码与深度图为 PNG，float32 深度图为 .npy）"""
+        encoder = ImageEncoder('png')
+        files = self.annotation_files(image_file, annotations, segmentation_mask, depth_map, include_maps,
+                                      instance_mask, encoder)
+        return encode_sample(files, encoder, metadata_codec=self.metadata_codec)
+    
+    def annotation_files(self, image_file, annotations, segmentation_mask, depth_map, include_maps=True,
+                         instance_mask=None, encoder=None):
+        """未编码的标注输出：{文件名: 字典} 与 {不含扩展名的文件名: 数组}
+
+        交给 storage.encode_sample 按 encoder（默认 PNG）与元数据格式编码；
+        标注中的掩码 / 深度图文件名按 encoder 实际使用的扩展名更新。
+        include_maps=False 时只输出标注 JSON（掩码和深度图另存于 ArrayStore）。
+        """
+        encoder = encoder or ImageEncoder('png')
+        stem = os.path.splitext(image_file)[0]
+        files = {f"{stem}_annotations.json": annotations}
+        if include_maps:
+            files[f"{stem}_mask"] = segmentation_mask
+            if instance_mask is not None:
+                files[f"{stem}_instances"] = instance_mask
+            with self.metrics.timer('annotate.depth_format'):
+                files[f"{stem}_depth"], annotations['depth_scale'] = depth_renderer.encode_depth(
+                    depth_map, self.depth_format, self.depth_scale)
+            for key, name in (('segmentation_mask', 'mask'), ('instance_mask', 'instances'), ('depth_map', 'depth')):
+                array = files.get(f"{stem}_{name}")
+                if array is not None:
+                    annotations[key] = f"{stem}_{name}{encoder.ext_for(array)}"
+        return files
+    
+    def store_arrays(self, store, row, scene_id, annotations, segmentation_mask, depth_map, instance_mask=None):
+        """将 float32 深度图、uint16 掩码和实例掩码写入 ArrayStore 的一行，并在标注中记录位置"""
+        store.write(row, scene_id, depth_map, segmentation_mask, instance_mask)
+        annotations['segmentation_mask'] = f"{store.split}_mask.npy"
+        annotations['depth_map'] = f"{store.split}_depth.npy"
+        if instance_mask is not None:
+            annotations['instance_mask'] = f"{store.split}_instances.npy"
+        annotations['array_row'] = row
         return annotations
     
-    def _create_segmentation_mask(self, image, metadata):
-        """创建分割掩码"""
+    def _create_segmentation_mask(self, image, metadata, labels=None):
+        """创建分割掩码
+
+        labels 为 rasterize_scene_labels 给出的物体索引图（背景 -1），查表映射为类别值。
+        """
         height, width = image.shape[:2]
-        mask = np.zeros((height, width), dtype=np.uint8)
+        if labels is None:
+            labels = batch_renderer.rasterize_scene_labels(camera.project_scene(metadata, width, height),
+                                                           height, width)
         
-        # 根据元数据在掩码上标记不同物体类型
-        for i, obj in enumerate(metadata['objects']):
-            obj_type = obj['type']
-            obj_value = self._get_object_class_value(obj_type)
-            
-            # 简化：在图像中心区域绘制标记
-            center_x, center_y = width // 2, height // 2
-            obj_x = center_x + (i - len(metadata['objects'])//2) * 80
-            obj_y = center_y
-            
-            if obj_type == 'building':
-                cv2.rectangle(mask, (obj_x-30, obj_y-50), (obj_x+30, obj_y), obj_value, -1)
-            elif obj_type == 'tree':
-                cv2.circle(mask, (obj_x, obj_y), 25, obj_value, -1)
-            else:
-                cv2.rectangle(mask, (obj_x-20, obj_y-20), (obj_x+20, obj_y+20), obj_value, -1)
+        # 物体索引 -1（背景）对应查找表第 0 项
+        objects = as_scene_objects(metadata['objects'])
+        class_values = np.array([self._get_object_class_value(name) for name in objects.classes], dtype=np.uint8)
+        class_lut = np.zeros(len(objects) + 1, dtype=np.uint8)
+        class_lut[1:] = class_values[objects.class_ids]
+        return class_lut[labels + 1]
+    
+    def _create_instance_mask(self, labels, num_objects):
+        """由物体索引图创建 uint16 实例掩码，背景为 0，物体 i 为 i + 1"""
+        if num_objects >= MAX_INSTANCES:
+            raise ValueError(f"物体数量 {num_objects} 超出 uint16 实例掩码上限")
+        return (labels + 1).astype(np.uint16)
+    
+    def _instance_statistics(self, instance_mask, num_objects):
+        """一次遍历实例掩码得到所有实例的可见像素统计
+
+        返回 (areas, centroids, boxes)：areas 为 (M,) 可见像素数，centroids 为 (M, 2) [x, y]，
+        boxes 为 (M, 4) [x0, y0, x1, y1]（右、下为开区间）；不可见实例面积为 0。
+        面积与质心用 np.bincount，框用 np.minimum.at / np.maximum.at，均不按物体循环。
+        """
+        width = instance_mask.shape[1]
+        flat = instance_mask.ravel()
+        foreground = np.flatnonzero(flat)
+        ids = flat[foreground].astype(np.intp) - 1
+        ys, xs = np.divmod(foreground, width)
         
-        return mask
+        areas = np.bincount(ids, minlength=num_objects)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroids = np.stack([np.bincount(ids, weights=xs, minlength=num_objects),
+                                  np.bincount(ids, weights=ys, minlength=num_objects)], axis=1) / areas[:, None]
+        
+        boxes = np.empty((num_objects, 4), dtype=np.int64)
+        boxes[:, :2] = np.iinfo(np.int64).max
+        boxes[:, 2:] = -1
+        np.minimum.at(boxes[:, 0], ids, xs)
+        np.minimum.at(boxes[:, 1], ids, ys)
+        np.maximum.at(boxes[:, 2], ids, xs + 1)
+        np.maximum.at(boxes[:, 3], ids, ys + 1)
+        return areas, centroids, boxes
     
     def _get_object_class_value(self, obj_type):
         """获取物体类型的分类值"""
-        class_map = {
-            'building': 1,
-            'tree': 2,
-            'obstacle': 3
-        }
-        return class_map.get(obj_type, 0)
+        return CLASS_VALUES.get(obj_type, 0)
     
-    def _create_bounding_boxes(self, metadata):
-        """创建边界框标注"""
-        bboxes = []
+    def _create_bounding_boxes(self, metadata, width=None, height=None, geometry=None, instance_mask=None):
+        """创建边界框标注
+
+        bbox 为物体包围盒经相机投影得到的完整（amodal）框，与渲染像素范围一致并裁剪到图像内；
+        位于相机后方或画面之外的物体不输出。
+        给出 instance_mask 时同时输出可见框 visible_bbox、可见面积 area、质心 centroid
+        和可见比例 visible_fraction，完全被遮挡的物体可见框与质心为 None。
+        """
+        if width is None or height is None:
+            width, height = metadata['camera_parameters']['resolution']
+        if geometry is None:
+            geometry = camera.project_scene(metadata, width, height)
+        
+        boxes, visible = camera.pixel_boxes(geometry, width, height)
+        object_ids = np.flatnonzero(visible)
+        boxes = boxes[object_ids]
         
-        for i, obj in enumerate(metadata['objects']):
-            bbox = {
-                'object_id': i,
-                'class': obj['type'],
-                'bbox': [  # [x, y, width, height] 归一化坐标
-                    0.3 + (i * 0.1), 0.4, 0.1, 0.2
-                ],
-                'position': obj['position']
-            }
-            bboxes.append(bbox)
+        objects = as_scene_objects(metadata['objects'])
+        visible_objects = objects.subset(object_ids)
+        bboxes = [{
+            'object_id': object_id,
+            'instance_id': object_id + 1,
+            'class': class_name,
+            'bbox': bbox,
+            'bbox_pixels': pixels,  # [x0, y0, x1, y1]，右、下为开区间
+            'position': position
+        } for object_id, class_name, position, bbox, pixels in zip(
+            object_ids.tolist(), visible_objects.types, visible_objects.positions.tolist(),
+            self._normalize_boxes(boxes, width, height).tolist(), boxes.tolist())]
         
+        if instance_mask is not None and len(object_ids):
+            areas, centroids, visible_boxes = self._instance_statistics(instance_mask, len(objects))
+            # 完整覆盖像素数：各物体光栅化行区间长度之和
+            labels, _, left, right = batch_renderer.scene_spans(geometry, height, width)
+            full_areas = np.bincount(labels, weights=right - left + 1, minlength=len(objects))
+            
+            areas, centroids, visible_boxes = areas[object_ids], centroids[object_ids], visible_boxes[object_ids]
+            fractions = areas / np.maximum(full_areas[object_ids], 1)
+            normalized = self._normalize_boxes(visible_boxes, width, height)
+            for entry, area, fraction, centroid, box, pixels in zip(
+                    bboxes, areas.tolist(), fractions.tolist(), centroids.tolist(),
+                    normalized.tolist(), visible_boxes.tolist()):
+                entry.update({
+                    'visible_bbox': box if area else None,
+                    'visible_bbox_pixels': pixels if area else None,
+                    'area': area,
+                    'centroid': centroid if area else None,
+                    'visible_fraction': fraction
+                })
         return bboxes
     
-    def _create_depth_map(self, image_shape, metadata):
-        """创建深度图（模拟）"""
+    def _normalize_boxes(self, boxes, width, height):
+        """像素框 [x0, y0, x1, y1] → 归一化 [x, y, width, height]"""
+        return np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]]) / [width, height, width, height]
+    
+    def _create_depth_map(self, image_shape, metadata, geometry=None):
+        """创建深度图：按相机参数对物体顶面做 z-buffer，背景为地面深度"""
         height, width = image_shape[:2]
-        depth_map = np.ones((height, width), dtype=np.uint8) * 128
-        
-        # 根据物体位置添加深度变化
-        for i, obj in enumerate(metadata['objects']):
-            center_x, center_y = width // 2, height // 2
-            obj_x = center_x + (i - len(metadata['objects'])//2) * 80
-            
-            # 深度值与高度相关
-            depth_value = max(50, min(200, 150 - i * 20))
-            cv2.circle(depth_map, (obj_x, center_y), 40, depth_value, -1)
-        
-        return depth_map
+        return depth_renderer.render_depth(metadata, width, height, geometry)
 
-def process_all_scenes():
-    """处理所有生成的场景"""
-    data_dir = "generated_data"
-    generator = AnnotationGenerator()
+def process_all_scenes(data_dir="generated_data", shard_dir=None, incremental=True, metadata_format='json'):
+    """处理所有生成的场景
+
+    指定 shard_dir 时标注写入该目录下的 tar 分片，而不是散落在 data_dir 中。
+    incremental=True 时按 (图像字节, 元数据字节, 标注版本) 的哈希跳过未变化的场景，
+    结果记录在 data_dir 下的 annotator_manifest.json。
+    场景图像可为任意支持的图像格式（见 storage.IMAGE_FORMATS），元数据可为任意支持的格式，
+    标注按 metadata_format 写出。
+    """
+    generator = AnnotationGenerator(metadata_format=metadata_format)
+    writer = ShardWriter(shard_dir) if shard_dir else None
+    manifest = Manifest(os.path.join(data_dir, ANNOTATION_MANIFEST_FILE))
+    output_dir = None if shard_dir else data_dir
     
     processed_count = 0
-    for file in os.listdir(data_dir):
-        if file.endswith('.png') and not file.startswith(('mask_', 'depth_')):
-            image_path = os.path.join(data_dir, file)
-            metadata_path = image_path.replace('.png', '.json')
-            
-            if os.path.exists(metadata_path):
-                generator.generate_annotations(image_path, metadata_path)
-                processed_count += 1
+    skipped_count = 0
+    try:
+        for file in os.listdir(data_dir):
+            if file.endswith(IMAGE_EXTS) and not file.startswith(('mask_', 'depth_')):
+                image_path = os.path.join(data_dir, file)
+                metadata_path = find_metadata(os.path.splitext(image_path)[0])
+                
+                if metadata_path is not None:
+                    with open(image_path, 'rb') as f:
+                        image_bytes = f.read()
+                    with open(metadata_path, 'rb') as f:
+                        metadata_bytes = f.read()
+                    metadata = codec_for_name(metadata_path).decode(metadata_bytes)
+                    scene_id = metadata['scene_id']
+                    input_hash = bytes_hash(image_bytes, metadata_bytes, str(ANNOTATION_VERSION).encode())
+                    
+                    if incremental and manifest.is_current(scene_id, input_hash, output_dir):
+                        skipped_count += 1
+                        continue
+                    
+                    # 直接解码已读入的字节，不再重复读盘
+                    image = decode_member(file, image_bytes)
+                    annotations, segmentation_mask, depth_map, instance_mask = generator.annotate_scene(
+                        image, metadata, file, os.path.basename(metadata_path))
+                    files = generator.save_annotations(image_path, annotations, segmentation_mask, depth_map,
+                                                       writer=writer, scene_id=scene_id, instance_mask=instance_mask)
+                    manifest.record(scene_id, metadata.get('seed'), input_hash, file_digests(files))
+                    processed_count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+        manifest.save()
     
-    print(f"\n🎉 标注处理完成! 处理了 {processed_count} 个场景")
+    print(f"\n🎉 标注处理完成! 处理了 {processed_count} 个场景, 跳过 {skipped_count} 个未变化的场景")
 
 if __name__ == "__main__":
     process_all_scenes()
\ No newline at end of file
@@ -0,0 +1,344 @@
+"""
+批量向量化渲染模块
+使用 NumPy 广播将多个场景一次性光栅化为 (N, H, W, 3) uint8 张量，
+像素结果与 UAVDataPipeline 中逐物体调用 cv2 的绘制路径完全一致
+"""
+
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from scripts.dataset_utils.scene_model import as_scene_objects
+from scripts.image_processing.camera import SHAPE_CIRCLE, SHAPE_NONE, geometry_extents, project_objects
+
+# 区间展开路径相对稠密比较路径的单位像素开销（经验值），用于选择光栅化方式
+SPAN_COST_RATIO = 4
+
+# 场景背景颜色 (BGR)
+DEFAULT_BACKGROUND = (200, 200, 200)
+BACKGROUND_COLORS = {
+    'forest': (0, 80, 0),
+    'open_field': (100, 150, 100)
+}
+
+
+def scene_background(scene_type):
+    """获取场景类型对应的背景颜色"""
+    return BACKGROUND_COLORS.get(scene_type, DEFAULT_BACKGROUND)
+
+
+@lru_cache(maxsize=32)
+def background_template(scene_type, width, height):
+    """场景类型与分辨率对应的只读背景图 (H, W, 3) uint8
+
+    渲染时用 np.copyto 复制到帧缓冲，避免每个场景重新分配并填充背景。
+    """
+    template = np.empty((height, width, 3), dtype=np.uint8)
+    template[:] = scene_background(scene_type)
+    template.setflags(write=False)
+    return template
+
+
+def scene_caption(scene_data):
+    """场景信息文本"""
+    return f"Scene: {scene_data['scene_type']} - Alt: {scene_data['camera_parameters']['position'][2]}m"
+
+
+def draw_caption(img, scene_data, offset=(0, 0)):
+    """在图像左上角绘制场景信息文本；img 为整帧中左上角位于 offset (x, y) 的分块时平移绘制"""
+    origin = (10 - offset[0], 30 - offset[1])
+    cv2.putText(img, scene_caption(scene_data), origin, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+
+@lru_cache(maxsize=1024)
+def circle_half_widths(radius):
+    """复现 cv2.circle(thickness=-1, LINE_8) 的中点圆算法
+
+    返回长度为 radius + 1 的数组，第 d 项为距圆心 d 行处的水平半宽。
+    """
+    half = np.full(radius + 1, -1, dtype=np.int32)
+    err, dx, dy, plus, minus = 0, radius, 0, 1, (radius << 1) - 1
+    while dx >= dy:
+        half[dy] = max(half[dy], dx)
+        half[dx] = max(half[dx], dy)
+        dy += 1
+        err += plus
+        plus += 2
+        mask = (err <= 0) - 1
+        err -= minus & mask
+        dx += mask
+        minus -= mask & 2
+    half.setflags(write=False)
+    return half
+
+
+def _half_width_table(radii, max_dy):
+    """升序去重的半径 radii 在 0..max_dy 行处的半宽查找表，超出半径处为 -1
+
+    只为批次中实际出现的半径建表，列数受图像高度限制，大半径不会导致表过大。
+    """
+    table = np.full((len(radii), max_dy + 1), -1, dtype=np.int32)
+    for k, r in enumerate(radii):
+        half = circle_half_widths(int(r))[:max_dy + 1]
+        table[k, :len(half)] = half
+    return table
+
+
+def pack_scenes(scenes, width, height):
+    """将场景列表打包为 (N, M) 的物体几何数组，空槽位 shape 为 SHAPE_NONE"""
+    n = len(scenes)
+    m = max((len(s['objects']) for s in scenes), default=0)
+
+    geometry = np.zeros((n, m, 6), dtype=np.int32)
+    geometry[:, :, 0] = SHAPE_NONE
+    colors = np.zeros((n, m, 3), dtype=np.uint8)
+    backgrounds = np.zeros((n, 3), dtype=np.uint8)
+
+    for i, scene_data in enumerate(scenes):
+        backgrounds[i] = scene_background(scene_data['scene_type'])
+        objects = as_scene_objects(scene_data['objects'])
+        k = len(objects)
+        if k:
+            geometry[i, :k] = project_objects(objects, scene_data['camera_parameters'], width, height)
+            colors[i, :k] = objects.colors
+
+    return {
+        'geometry': geometry,
+        'shape': geometry[:, :, 0],
+        'x0': geometry[:, :, 1],
+        'y0': geometry[:, :, 2],
+        'x1': geometry[:, :, 3],
+        'y1': geometry[:, :, 4],
+        'radius': geometry[:, :, 5],
+        'colors': colors,
+        'backgrounds': backgrounds
+    }
+
+
+def _slot_extent(packed, slot, height, width):
+    """第 slot 个物体在整批场景中的外接行列范围（已裁剪到图像内）"""
+    shape = packed['shape'][:, slot]
+    valid = shape != SHAPE_NONE
+    if not valid.any():
+        return None
+    is_circle = shape == SHAPE_CIRCLE
+    radius = np.where(is_circle, packed['radius'][:, slot], 0)
+    left = np.where(is_circle, packed['x0'][:, slot] - radius, packed['x0'][:, slot])[valid]
+    right = np.where(is_circle, packed['x0'][:, slot] + radius, packed['x1'][:, slot])[valid]
+    top = np.where(is_circle, packed['y0'][:, slot] - radius, packed['y0'][:, slot])[valid]
+    bottom = np.where(is_circle, packed['y0'][:, slot] + radius, packed['y1'][:, slot])[valid]
+
+    r0, r1 = max(int(top.min()), 0), min(int(bottom.max()) + 1, height)
+    c0, c1 = max(int(left.min()), 0), min(int(right.max()) + 1, width)
+    if r0 >= r1 or c0 >= c1:
+        return None
+    return r0, r1, c0, c1
+
+
+def _row_spans(packed, slot, rows, radii, table, width):
+    """计算所有场景中第 slot 个物体在每一行上的覆盖区间 [left, right]，形状 (N, len(rows))"""
+    shape = packed['shape'][:, slot, None]
+    x0, y0 = packed['x0'][:, slot, None], packed['y0'][:, slot, None]
+    x1, y1 = packed['x1'][:, slot, None], packed['y1'][:, slot, None]
+    radius = packed['radius'][:, slot, None]
+
+    # 矩形：行范围内区间恒定
+    in_rows = (rows >= y0) & (rows <= y1)
+    left = np.where(in_rows, x0, width)
+    right = np.where(in_rows, x1, -1)
+
+    # 圆形：查表得到每行半宽，超出半径为 -1（空区间）
+    dy = np.abs(rows - y0)
+    radius_index = np.minimum(np.searchsorted(radii, radius), len(radii) - 1)
+    half = table[radius_index, np.minimum(dy, table.shape[1] - 1)]
+    half = np.where(dy <= radius, half, -1)
+    is_circle = shape == SHAPE_CIRCLE
+    left = np.where(is_circle, x0 - half, left)
+    right = np.where(is_circle, x0 + half, right)
+
+    # 空槽位
+    empty = shape == SHAPE_NONE
+    left = np.where(empty, width, left)
+    right = np.where(empty, -1, right)
+    return left, right
+
+
+def iter_coverage(packed, height, width):
+    """按绘制顺序逐槽位生成覆盖掩码
+
+    每次产出 (slot, (r0, r1, c0, c1), covered)，covered 为 (N, r1-r0, c1-c0) 布尔数组，
+    只覆盖该槽位在整批场景中的外接区域，避免对整幅图像做比较。
+    """
+    m = packed['shape'].shape[1]
+    if m == 0:
+        return
+    circles = packed['shape'] == SHAPE_CIRCLE
+    radii = np.unique(np.append(packed['radius'][circles], 0))
+    # 图像内任意一行到圆心的最大距离，更远的行不需要查表
+    max_dy = int(np.abs(np.append(packed['y0'][circles], 0)).max()) + height
+    table = _half_width_table(radii, min(int(radii[-1]), max_dy))
+
+    for slot in range(m):
+        extent = _slot_extent(packed, slot, height, width)
+        if extent is None:
+            continue
+        r0, r1, c0, c1 = extent
+        rows = np.arange(r0, r1, dtype=np.int32)
+        cols = np.arange(c0, c1, dtype=np.int32)
+        left, right = _row_spans(packed, slot, rows, radii, table, width)
+        covered = (cols >= left[:, :, None]) & (cols <= right[:, :, None])
+        yield slot, extent, covered
+
+
+def dense_is_cheaper(packed, height, width):
+    """估计两种光栅化方式的开销，稠密路径更省时返回 True
+
+    稠密路径（iter_coverage）的开销与每个槽位在整批中的外接区域 × 场景数成正比，
+    物体小而集中时最快；区间展开路径的开销与物体实际覆盖的像素数成正比，
+    物体很大或散布在整幅图像上时更快。
+    """
+    geometry = packed['geometry']
+    n, m = geometry.shape[:2]
+    if n * m == 0:
+        return True
+    valid = geometry[:, :, 0] != SHAPE_NONE
+    left, top, right, bottom = (np.clip(edge.reshape(n, m), -1, limit)
+                                for edge, limit in zip(geometry_extents(geometry.reshape(-1, 6)),
+                                                       (width, height, width, height)))
+    left, top = np.maximum(left, 0), np.maximum(top, 0)
+    right, bottom = np.minimum(right, width - 1), np.minimum(bottom, height - 1)
+
+    areas = np.maximum(right - left + 1, 0) * np.maximum(bottom - top + 1, 0)
+    span_cost = SPAN_COST_RATIO * int(areas[valid].sum())
+
+    union_w = np.where(valid, right, -1).max(axis=0) - np.where(valid, left, width).min(axis=0) + 1
+    union_h = np.where(valid, bottom, -1).max(axis=0) - np.where(valid, top, height).min(axis=0) + 1
+    dense_cost = n * int((np.maximum(union_w, 0) * np.maximum(union_h, 0)).sum())
+    return dense_cost <= span_cost
+
+
+def rasterize_labels(packed, height, width):
+    """光栅化物体索引图 (N, H, W) int16，按绘制顺序后绘制者覆盖，背景为 -1"""
+    n = packed['shape'].shape[0]
+    if not dense_is_cheaper(packed, height, width):
+        return _span_labels(packed['geometry'], height, width).reshape(n, height, width).astype(np.int16)
+    labels = np.full((n, height, width), -1, dtype=np.int16)
+    for slot, (r0, r1, c0, c1), covered in iter_coverage(packed, height, width):
+        np.copyto(labels[:, r0:r1, c0:c1], slot, where=covered)
+    return labels
+
+
+def scene_spans(geometry, height, width):
+    """一次性计算单个场景所有物体的逐行覆盖区间
+
+    geometry 为 (M, 6) 几何数组。返回 (labels, rows, left, right)，
+    每一项对应物体 labels 在第 rows 行上的闭区间 [left, right]，已裁剪到图像内。
+    """
+    shape, x0, y0, x1, y1, radius = (column.astype(np.int64) for column in geometry.T)
+    is_circle = shape == SHAPE_CIRCLE
+    r0 = np.clip(np.where(is_circle, y0 - radius, y0), 0, height)
+    r1 = np.clip(np.where(is_circle, y0 + radius, y1) + 1, 0, height)
+    counts = np.where(shape != SHAPE_NONE, np.maximum(r1 - r0, 0), 0)
+
+    # 展开为逐行记录
+    labels = np.repeat(np.arange(len(geometry)), counts)
+    starts = np.cumsum(counts) - counts
+    rows = r0[labels] + np.arange(len(labels)) - starts[labels]
+    left = x0[labels]
+    right = x1[labels]
+
+    circle_rows = is_circle[labels]
+    if circle_rows.any():
+        circle_labels = labels[circle_rows]
+        radii = np.unique(radius[is_circle])
+        dy = np.abs(rows[circle_rows] - y0[circle_labels])
+        table = _half_width_table(radii, int(dy.max()))
+        half = table[np.searchsorted(radii, radius[circle_labels]), dy]
+        left[circle_rows] = x0[circle_labels] - half
+        right[circle_rows] = x0[circle_labels] + half
+
+    left = np.maximum(left, 0)
+    right = np.minimum(right, width - 1)
+    keep = right >= left
+    return labels[keep], rows[keep], left[keep], right[keep]
+
+
+def rasterize_scene_labels(geometry, height, width, max_pixels=1 << 22):
+    """光栅化单个场景的物体索引图 (H, W) int32，背景为 -1
+
+    与 rasterize_labels 结果一致，但不按物体逐个循环：所有行区间展开为像素后
+    用 np.maximum.at 一次写入（后绘制者索引更大，取最大值即绘制顺序覆盖）。
+    每次最多展开 max_pixels 个像素以限制内存。
+    """
+    return _span_labels([geometry], height, width, max_pixels).reshape(height, width)
+
+
+def _span_labels(geometries, height, width, max_pixels=1 << 22):
+    """区间展开路径：整批场景的扁平物体索引 (N * H * W,) int32，背景为 -1"""
+    flat = np.full(len(geometries) * height * width, -1, dtype=np.int32)
+    starts, lengths, values = [], [], []
+    for i, geometry in enumerate(geometries):
+        labels, rows, left, right = scene_spans(geometry, height, width)
+        starts.append(i * height * width + rows * width + left)
+        lengths.append(right - left + 1)
+        values.append(labels.astype(np.int32))
+    if len(geometries):
+        for pixels, pixel_values in iter_span_pixels(np.concatenate(starts), np.concatenate(lengths),
+                                                     np.concatenate(values), max_pixels):
+            np.maximum.at(flat, pixels, pixel_values)
+    return flat
+
+
+def iter_span_pixels(starts, lengths, values, max_pixels=1 << 22):
+    """将行区间展开为扁平像素索引
+
+    starts 为每个区间首像素的扁平索引，lengths 为区间长度，values 为区间对应的值。
+    分块产出 (pixels, pixel_values)，每块最多约 max_pixels 个像素以限制内存。
+    """
+    ends = np.cumsum(lengths)
+    start = 0
+    while start < len(lengths):
+        # 本块包含的区间：累计像素数不超过 max_pixels（至少一个区间）
+        stop = max(int(np.searchsorted(ends, ends[start] - lengths[start] + max_pixels, side='right')), start + 1)
+        chunk_lengths = lengths[start:stop]
+        offsets = np.cumsum(chunk_lengths) - chunk_lengths
+        pixels = np.repeat(starts[start:stop] - offsets, chunk_lengths) + np.arange(int(chunk_lengths.sum()))
+        yield pixels, np.repeat(values[start:stop], chunk_lengths)
+        start = stop
+
+
+def render_batch(scenes, width=640, height=480, out=None, draw_text=True):
+    """批量渲染场景为 (N, H, W, 3) uint8 张量
+
+    out 可传入预分配的张量以避免重复分配。
+    """
+    n = len(scenes)
+    if out is None:
+        out = np.empty((n, height, width, 3), dtype=np.uint8)
+
+    packed = pack_scenes(scenes, width, height)
+
+    # 背景：从缓存的背景模板整帧复制
+    for i, scene_data in enumerate(scenes):
+        np.copyto(out[i], background_template(scene_data['scene_type'], width, height))
+
+    # 按绘制顺序覆盖物体颜色
+    if dense_is_cheaper(packed, height, width):
+        for slot, (r0, r1, c0, c1), covered in iter_coverage(packed, height, width):
+            region = out[:, r0:r1, c0:c1]
+            color_rows = np.empty((n, c1 - c0, 3), dtype=np.uint8)
+            color_rows[:] = packed['colors'][:, slot, None, :]
+            np.copyto(region, color_rows[:, None], where=covered[..., None])
+    else:
+        # 物体大或分散：只处理实际覆盖的像素
+        labels = _span_labels(packed['geometry'], height, width)
+        covered = np.flatnonzero(labels >= 0)
+        out.reshape(-1, 3)[covered] = packed['colors'][covered // (height * width), labels[covered]]
+
+    # 文本叠加（每个场景一次调用）
+    if draw_text:
+        for i, scene_data in enumerate(scenes):
+            draw_caption(out[i], scene_data)
+
+    return out
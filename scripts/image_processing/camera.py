@@ -0,0 +1,181 @@
+"""
+相机投影模块
+根据场景元数据中的 camera_parameters（位置、旋转、视场角、分辨率），
+用一次矩阵运算将场景中所有物体的三维包围盒投影为像素几何；
+渲染器与标注生成器共用这套几何，保证边界框、掩码与渲染像素严格对齐
+"""
+
+import numpy as np
+
+from scripts.dataset_utils.scene_model import as_scene_objects
+
+# 物体形状编码
+SHAPE_NONE = -1
+SHAPE_RECT = 0
+SHAPE_CIRCLE = 1
+
+OBJECT_SHAPES = {
+    'building': SHAPE_RECT,
+    'tree': SHAPE_CIRCLE,
+    'obstacle': SHAPE_RECT
+}
+
+NEAR_CLIP = 1.0         # 近裁剪面（世界单位），更近的点按近裁剪面处投影
+COORD_LIMIT = 1 << 15   # 像素坐标与半径的上限，避免 cv2 绘制时溢出
+
+# 单位包围盒的 8 个角点：x、y 以物体位置为中心，z 从底面到顶面
+BOX_CORNERS = np.array([[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (0.0, 1.0)])
+
+
+def intrinsics(camera, width=None, height=None):
+    """相机内参 (f, cx, cy)；fov 为水平视场角（度），width/height 默认取 resolution"""
+    if width is None or height is None:
+        width, height = camera['resolution']
+    focal = (width / 2) / np.tan(np.radians(camera['fov']) / 2)
+    return focal, width / 2, height / 2
+
+
+def rotation_matrix(rotation):
+    """世界坐标 → 相机坐标的旋转矩阵
+
+    rotation 为 [pitch, yaw, roll]（度）。相机坐标系 x 向右、y 向下、z 向前；
+    全零时相机水平朝向世界 +y，pitch=-90 时竖直向下，此时世界 +x 向右、+y 向上。
+    """
+    pitch, yaw, roll = np.radians(rotation)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cr, sr = np.cos(roll), np.sin(roll)
+
+    base = np.array([[1.0, 0.0, 0.0],
+                     [0.0, 0.0, 1.0],
+                     [0.0, -1.0, 0.0]])  # 列为相机 x、y、z 轴在世界中的方向
+    yaw_m = np.array([[cy, -sy, 0.0], [sy, cy, 0.0], [0.0, 0.0, 1.0]])
+    pitch_m = np.array([[1.0, 0.0, 0.0], [0.0, cp, -sp], [0.0, sp, cp]])
+    roll_m = np.array([[cr, -sr, 0.0], [sr, cr, 0.0], [0.0, 0.0, 1.0]])
+    camera_to_world = yaw_m @ pitch_m @ base @ roll_m
+    return camera_to_world.T
+
+
+def project_points(points, camera, width=None, height=None):
+    """将 (..., 3) 世界坐标投影为 (..., 2) 像素坐标和 (...) 深度
+
+    深度小于 NEAR_CLIP 的点按近裁剪面处投影，调用方根据返回的深度判断可见性。
+    """
+    focal, cx, cy = intrinsics(camera, width, height)
+    rotation = rotation_matrix(camera['rotation'])
+    cam = (np.asarray(points, dtype=np.float64) - np.asarray(camera['position'], dtype=np.float64)) @ rotation.T
+    depth = cam[..., 2]
+    z = np.maximum(depth, NEAR_CLIP)
+    uv = np.stack([cx + focal * cam[..., 0] / z, cy + focal * cam[..., 1] / z], axis=-1)
+    return uv, depth
+
+
+def corner_rays(camera, width=None, height=None):
+    """画面四角视线在世界坐标中的方向 (4, 3)"""
+    focal, cx, cy = intrinsics(camera, width, height)
+    if width is None or height is None:
+        width, height = camera['resolution']
+    corners = np.array([[0, 0], [width, 0], [0, height], [width, height]], dtype=np.float64)
+    return np.column_stack([(corners - [cx, cy]) / focal, np.ones(4)]) @ rotation_matrix(camera['rotation'])
+
+
+def ground_footprint(camera, width=None, height=None):
+    """相机以下视锥的水平外接矩形 (x0, y0, x1, y1)
+
+    视锥在地面 z = 0 与相机高度之间的部分位于相机位置与四角视线落地点的凸包内，
+    返回这些点的外接矩形。相机不在地面以上或画面中出现地平线时返回 None。
+    """
+    position = np.asarray(camera['position'], dtype=np.float64)
+    rays = corner_rays(camera, width, height)
+    if position[2] <= 0 or (rays[:, 2] >= 0).any():
+        return None
+    hits = position[:2] - rays[:, :2] * (position[2] / rays[:, 2])[:, None]
+    points = np.vstack([hits, position[:2]])
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    return float(x0), float(y0), float(x1), float(y1)
+
+
+def _to_pixels(values):
+    return np.rint(np.clip(values, -COORD_LIMIT, COORD_LIMIT)).astype(np.int32)
+
+
+def project_objects(objects, camera, width=None, height=None):
+    """投影一组物体，返回 (N, 6) int32 几何数组 [shape, x0, y0, x1, y1, radius]
+
+    矩形（建筑物、障碍物）为包围盒 8 个角点投影的外接矩形，闭区间 [x0, x1] x [y0, y1]；
+    圆形（树木）以树冠顶部中心 (x0, y0) 为圆心，半径为冠幅在该深度处的投影。
+    完全位于相机后方或图像之外的物体 shape 为 SHAPE_NONE。
+    """
+    objects = as_scene_objects(objects)
+    return project_arrays(objects.positions, objects.sizes, object_shapes(objects), camera, width, height)
+
+
+def object_shapes(objects):
+    """物体（列表或 SceneObjects）的形状编码数组 (N,) int32"""
+    objects = as_scene_objects(objects)
+    lookup = np.array([OBJECT_SHAPES.get(name, SHAPE_RECT) for name in objects.classes], dtype=np.int32)
+    return lookup[objects.class_ids]
+
+
+def project_arrays(positions, sizes, shapes, camera, width=None, height=None):
+    """project_objects 的数组版本：positions、sizes 为 (N, 3)，shapes 为 (N,) 形状编码"""
+    if width is None or height is None:
+        width, height = camera['resolution']
+    n = len(positions)
+    geometry = np.zeros((n, 6), dtype=np.int32)
+    geometry[:, 0] = SHAPE_NONE
+    if n == 0:
+        return geometry
+    positions = np.asarray(positions, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+
+    # 所有物体的 8 个角点加树冠顶部中心，一次矩阵运算完成投影
+    corners = positions[:, None, :] + BOX_CORNERS[None] * sizes[:, None, :]
+    tops = positions + sizes * [0.0, 0.0, 1.0]
+    uv, depth = project_points(np.concatenate([corners, tops[:, None, :]], axis=1), camera, width, height)
+    focal = intrinsics(camera, width, height)[0]
+
+    is_circle = shapes == SHAPE_CIRCLE
+    center = _to_pixels(uv[:, 8])
+    radius = _to_pixels(focal * sizes[:, 0] / 2 / np.maximum(depth[:, 8], NEAR_CLIP))
+    x0 = np.where(is_circle, center[:, 0], _to_pixels(uv[:, :8, 0].min(axis=1)))
+    y0 = np.where(is_circle, center[:, 1], _to_pixels(uv[:, :8, 1].min(axis=1)))
+    x1 = np.where(is_circle, center[:, 0], np.maximum(_to_pixels(uv[:, :8, 0].max(axis=1)), x0))
+    y1 = np.where(is_circle, center[:, 1], np.maximum(_to_pixels(uv[:, :8, 1].max(axis=1)), y0))
+    radius = np.where(is_circle, radius, 0)
+
+    geometry[:, 1:] = np.stack([x0, y0, x1, y1, radius], axis=1)
+    left, top, right, bottom = geometry_extents(geometry)
+    visible = ((depth[:, :8].max(axis=1) > NEAR_CLIP)
+               & (right >= 0) & (left < width) & (bottom >= 0) & (top < height))
+    geometry[:, 0] = np.where(visible, shapes, SHAPE_NONE)
+    return geometry
+
+
+def project_scene(scene_data, width=None, height=None):
+    """投影场景中的全部物体，见 project_objects"""
+    return project_objects(scene_data['objects'], scene_data['camera_parameters'], width, height)
+
+
+def geometry_extents(geometry):
+    """几何数组的外接范围（闭区间）left, top, right, bottom"""
+    shape, x0, y0, x1, y1, radius = geometry.T
+    is_circle = shape == SHAPE_CIRCLE
+    left = np.where(is_circle, x0 - radius, x0)
+    top = np.where(is_circle, y0 - radius, y0)
+    right = np.where(is_circle, x0 + radius, x1)
+    bottom = np.where(is_circle, y0 + radius, y1)
+    return left, top, right, bottom
+
+
+def pixel_boxes(geometry, width, height):
+    """几何数组 → 裁剪到图像内的像素包围框 (N, 4) [left, top, right, bottom]（右、下为开区间）
+
+    同时返回可见标志 (N,)；框与渲染器绘制的像素范围完全一致。
+    """
+    left, top, right, bottom = geometry_extents(geometry)
+    boxes = np.stack([np.clip(left, 0, width), np.clip(top, 0, height),
+                      np.clip(right + 1, 0, width), np.clip(bottom + 1, 0, height)], axis=1)
+    visible = ((geometry[:, 0] != SHAPE_NONE)
+               & (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1]))
+    return boxes, visible
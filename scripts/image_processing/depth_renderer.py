@@ -0,0 +1,105 @@
+"""
+深度渲染模块
+基于 NumPy 的 z-buffer：按 camera_parameters 将每个物体顶面覆盖的像素及其到相机的
+真实深度一次性写入深度缓冲，可处理单个场景或整批场景，输出 float32 或 uint16 深度图
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from scripts.dataset_utils.scene_model import as_scene_objects
+from scripts.image_processing.batch_renderer import iter_span_pixels, scene_spans
+from scripts.image_processing.camera import NEAR_CLIP, intrinsics, project_scene, rotation_matrix
+
+GROUND_HEIGHT = 0.0     # 地面高度（世界单位）
+NO_DEPTH = 0.0          # 射线不与地面相交（朝向天空）处的深度值
+DEPTH_FORMATS = ('uint16', 'float32')
+UINT16_MAX = 65535
+
+
+@lru_cache(maxsize=64)
+def _inverse_ray_z(rotation, fov, width, height):
+    """每个像素射线（相机坐标 z 分量为 1）在世界 z 方向分量的倒数 (H, W)
+
+    平面 z = h 在该像素处的深度为 (h - 相机高度) * 倒数；射线不向下时为 0。
+    只与相机朝向、视场角和分辨率有关，批量中相同相机朝向的场景共用一份。
+    """
+    focal, cx, cy = intrinsics({'fov': fov, 'resolution': [width, height]}, width, height)
+    rotation = rotation_matrix(rotation)
+    u = (np.arange(width) - cx) / focal
+    v = (np.arange(height) - cy) / focal
+    # 相机坐标 → 世界坐标的 z 分量为 R[:, 2] · (u, v, 1)
+    ray_z = rotation[0, 2] * u[None, :] + rotation[1, 2] * v[:, None] + rotation[2, 2]
+    inverse = np.zeros((height, width), dtype=np.float32)
+    np.divide(1.0, ray_z, out=inverse, where=ray_z < -1e-9)
+    inverse.setflags(write=False)
+    return inverse
+
+
+def _camera_key(camera):
+    return tuple(float(a) for a in camera['rotation']), float(camera['fov'])
+
+
+def object_tops(scene_data):
+    """各物体顶面高度 (M,)，不高于相机近裁剪面"""
+    objects = as_scene_objects(scene_data['objects'])
+    tops = (objects.positions[:, 2] + objects.sizes[:, 2]).astype(np.float32)
+    return np.minimum(tops, scene_data['camera_parameters']['position'][2] - NEAR_CLIP)
+
+
+def render_depth_batch(scenes, width=640, height=480, geometries=None, out=None, max_pixels=1 << 22):
+    """批量渲染深度图 (N, H, W) float32
+
+    每个物体的覆盖像素与 RGB 渲染完全一致（共用光栅化区间），深度为物体顶面沿相机
+    光轴到相机的距离；各场景所有物体的像素展开后用一次 np.maximum.at 写入高度缓冲
+    （射线向下时顶面越高越近，取最大高度即 z-buffer 最近者），再统一换算为深度。
+    geometries 可传入已计算好的 (M, 6) 几何数组列表以避免重复投影。
+    """
+    n = len(scenes)
+    if out is None:
+        out = np.empty((n, height, width), dtype=np.float32)
+    heights = np.full(n * height * width, GROUND_HEIGHT, dtype=np.float32)
+
+    starts, lengths, values = [], [], []
+    for i, scene_data in enumerate(scenes):
+        geometry = geometries[i] if geometries is not None else project_scene(scene_data, width, height)
+        labels, rows, left, right = scene_spans(geometry, height, width)
+        starts.append(i * height * width + rows * width + left)
+        lengths.append(right - left + 1)
+        values.append(object_tops(scene_data)[labels])
+
+    if n:
+        for pixels, pixel_values in iter_span_pixels(np.concatenate(starts), np.concatenate(lengths),
+                                                     np.concatenate(values), max_pixels):
+            np.maximum.at(heights, pixels, pixel_values)
+    heights = heights.reshape(n, height, width)
+
+    for i, scene_data in enumerate(scenes):
+        camera = scene_data['camera_parameters']
+        inverse = _inverse_ray_z(*_camera_key(camera), width, height)
+        np.multiply(heights[i] - np.float32(camera['position'][2]), inverse, out=out[i])
+    return out
+
+
+def render_depth(scene_data, width=640, height=480, geometry=None):
+    """渲染单个场景的深度图 (H, W) float32"""
+    geometries = None if geometry is None else [geometry]
+    return render_depth_batch([scene_data], width, height, geometries)[0]
+
+
+def encode_depth(depth, depth_format='uint16', depth_scale=None):
+    """将 float32 深度图转换为输出格式，返回 (数组, depth_scale)
+
+    uint16 的像素值为 depth * depth_scale；depth_scale 为 None 时按场景最大深度
+    自动选取以占满 16 位范围。float32 原样返回，depth_scale 为 1.0。
+    """
+    if depth_format not in DEPTH_FORMATS:
+        raise ValueError(f"不支持的深度格式: {depth_format}")
+    if depth_format == 'float32':
+        return depth.astype(np.float32, copy=False), 1.0
+    if depth_scale is None:
+        max_depth = float(depth.max(initial=0.0))
+        depth_scale = UINT16_MAX / max_depth if max_depth > 0 else 1.0
+    encoded = np.rint(np.clip(depth * depth_scale, 0, UINT16_MAX)).astype(np.uint16)
+    return encoded, depth_scale
@@ -0,0 +1,264 @@
+"""
+飞行序列模块
+相机沿航迹（航点、速度、高度剖面）飞过同一个持久世界，生成时间连续的帧序列。
+世界只生成一次并缓存为地面纹理、物体数组和网格空间索引：每帧将地面纹理按相机
+单应重投影到画面，只投影和绘制视野内的物体，单帧开销与世界大小无关
+"""
+
+import json
+import os
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+from scripts.dataset_utils.scene_model import as_scene_objects
+from scripts.dataset_utils.storage import ShardWriter, encode_sample
+from scripts.image_processing.batch_renderer import DEFAULT_BACKGROUND, draw_caption, scene_background
+from scripts.image_processing.camera import (SHAPE_CIRCLE, SHAPE_NONE, ground_footprint, intrinsics, object_shapes,
+                                             pixel_boxes, project_arrays, rotation_matrix)
+from scripts.image_processing.spatial_index import GridIndex
+
+SEQUENCE_OUTPUTS = ('video', 'shards')
+WORLD_CELL_SIZE = 1000  # 世界网格单元边长（世界单位），每个单元一种场景类型
+VIDEO_FOURCC = 'mp4v'
+
+
+class Trajectory:
+    """匀速飞行的航迹
+
+    waypoints 为 [[x, y, z], ...]，相邻航点之间直线飞行，高度 z 随之线性变化（高度剖面）；
+    speed 为沿航迹的速度（世界单位/秒），fps 为帧率。heading=True 时相机偏航角跟随
+    水平航向（画面上方为飞行方向），否则保持世界 +y 朝上。pitch、fov 为相机俯仰角与水平视场角（度）。
+    """
+
+    def __init__(self, waypoints, speed=10.0, fps=10, pitch=-90, fov=90, heading=False):
+        self.waypoints = np.asarray(waypoints, dtype=np.float64)
+        if self.waypoints.ndim != 2 or self.waypoints.shape[1] != 3 or len(self.waypoints) < 2:
+            raise ValueError("航迹至少需要两个 [x, y, z] 航点")
+        if speed <= 0 or fps <= 0:
+            raise ValueError("速度和帧率必须为正数")
+        self.speed = speed
+        self.fps = fps
+        self.pitch = pitch
+        self.fov = fov
+        self.heading = heading
+        self._segments = np.diff(self.waypoints, axis=0)
+        self._lengths = np.linalg.norm(self._segments, axis=1)
+        self._cumulative = np.concatenate([[0.0], np.cumsum(self._lengths)])
+
+    @property
+    def length(self):
+        """航迹总长度（世界单位）"""
+        return float(self._cumulative[-1])
+
+    @property
+    def num_frames(self):
+        return int(self.length / self.speed * self.fps) + 1
+
+    def camera(self, frame, width, height):
+        """第 frame 帧的相机参数，格式与场景元数据的 camera_parameters 相同"""
+        distance = min(frame * self.speed / self.fps, self.length)
+        segment = min(int(np.searchsorted(self._cumulative, distance, side='right')) - 1, len(self._lengths) - 1)
+        length = self._lengths[segment]
+        t = (distance - self._cumulative[segment]) / length if length > 0 else 0.0
+        position = self.waypoints[segment] + t * self._segments[segment]
+
+        yaw = 0.0
+        dx, dy = self._segments[segment][:2]
+        if self.heading and (dx or dy):
+            # 偏航 yaw 时画面上方对应世界方向 (-sin yaw, cos yaw)
+            yaw = round(float(np.degrees(np.arctan2(-dx, dy))), 6)
+        return {
+            'position': [round(float(v), 3) for v in position],
+            'rotation': [self.pitch, yaw, 0],
+            'fov': self.fov,
+            'resolution': [width, height]
+        }
+
+    def as_dict(self):
+        return {
+            'waypoints': self.waypoints.tolist(),
+            'speed': self.speed,
+            'fps': self.fps,
+            'pitch': self.pitch,
+            'fov': self.fov,
+            'heading': self.heading
+        }
+
+
+class FlightWorld:
+    """持久世界
+
+    地面为 rows x cols 个网格单元，每个单元为一种场景类型（背景色），整个地面缓存为
+    (rows, cols, 3) 的纹理；物体以数组形式缓存，并以单元边长建立 GridIndex 空间索引。
+    世界以原点为中心。
+    """
+
+    def __init__(self, cell_types, objects, cell_size=WORLD_CELL_SIZE, seed=None):
+        self.cell_types = cell_types
+        self.rows, self.cols = len(cell_types), len(cell_types[0])
+        self.cell_size = cell_size
+        self.origin = (-self.cols * cell_size / 2, -self.rows * cell_size / 2)
+        self.objects = as_scene_objects(objects)
+        self.seed = seed
+
+        self.positions = self.objects.positions.astype(np.float64)
+        self.sizes = self.objects.sizes.astype(np.float64)
+        self.shapes = object_shapes(self.objects)
+        self.colors = [tuple(color) for color in self.objects.colors.tolist()]
+        self.types = self.objects.types
+        self.ground = np.array([[scene_background(t) for t in row] for row in cell_types], dtype=np.uint8)
+        self.ground.setflags(write=False)
+
+        self.index = GridIndex(self.positions, self.sizes, cell_size)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def _cell_of(self, x, y):
+        """世界坐标所在的网格单元 (col, row)，世界之外的坐标归入边缘单元"""
+        col = np.clip(np.floor((np.asarray(x) - self.origin[0]) / self.cell_size), 0, self.cols - 1).astype(np.int64)
+        row = np.clip(np.floor((np.asarray(y) - self.origin[1]) / self.cell_size), 0, self.rows - 1).astype(np.int64)
+        return col, row
+
+    def cell_type_at(self, x, y):
+        col, row = self._cell_of(x, y)
+        return self.cell_types[int(row)][int(col)]
+
+    def ground_homography(self, camera, width, height):
+        """画面像素 → 地面纹理坐标的单应矩阵（用于 cv2.warpPerspective 的 WARP_INVERSE_MAP）"""
+        px, py, pz = camera['position']
+        focal, cx, cy = intrinsics(camera, width, height)
+        inverse_k = np.array([[1 / focal, 0, -cx / focal], [0, 1 / focal, -cy / focal], [0, 0, 1]])
+        rays = rotation_matrix(camera['rotation']).T @ inverse_k
+        # 视线 d 与地面 z = 0 的交点：(p_xy * d_z - p_z * d_xy) / d_z
+        to_world = np.vstack([px * rays[2] - pz * rays[0], py * rays[2] - pz * rays[1], rays[2]])
+        # 世界坐标 → 纹理坐标：单元 k 覆盖 [k, k + 1)，cv2 以像素中心为整数坐标，故再移半个像素
+        to_texture = np.array([[1 / self.cell_size, 0, -self.origin[0] / self.cell_size - 0.5],
+                               [0, 1 / self.cell_size, -self.origin[1] / self.cell_size - 0.5],
+                               [0, 0, 1]])
+        return to_texture @ to_world
+
+    def as_dict(self):
+        return {
+            'seed': self.seed,
+            'rows': self.rows,
+            'cols': self.cols,
+            'cell_size': self.cell_size,
+            'cell_types': self.cell_types,
+            'objects': self.objects.to_list()
+        }
+
+
+class SequenceRenderer:
+    """按相机参数渲染持久世界中的一帧
+
+    metrics 为 instrumentation.Metrics（可选），记录 sequence.* 各步骤耗时。
+    """
+
+    def __init__(self, world, width, height, metrics=None):
+        self.world = world
+        self.width = width
+        self.height = height
+        self.metrics = metrics
+
+    def _timer(self, name):
+        return self.metrics.timer(name) if self.metrics is not None else nullcontext()
+
+    def render(self, frame_id, camera, out=None):
+        """渲染一帧，返回 (image, frame_data)
+
+        frame_data 与场景元数据格式相近（camera_parameters、scene_type 为相机下方单元的类型），
+        另含 tracks：画面内每个物体的 track_id（世界中的物体序号）与边界框。
+        """
+        world, width, height = self.world, self.width, self.height
+        if out is None:
+            out = np.empty((height, width, 3), dtype=np.uint8)
+
+        with self._timer('sequence.ground'):
+            if ground_footprint(camera, width, height) is None:
+                raise ValueError("飞行序列的相机必须位于地面以上，且画面中不能出现地平线")
+            cv2.warpPerspective(world.ground, world.ground_homography(camera, width, height), (width, height),
+                                dst=out, flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=DEFAULT_BACKGROUND)
+        with self._timer('sequence.cull'):
+            ids = world.index.visible(camera, width, height)
+        with self._timer('sequence.project'):
+            geometry = project_arrays(world.positions[ids], world.sizes[ids], world.shapes[ids], camera, width, height)
+        with self._timer('sequence.objects'):
+            for i, (shape, x0, y0, x1, y1, radius) in zip(ids.tolist(), geometry.tolist()):
+                if shape == SHAPE_NONE:
+                    continue
+                if shape == SHAPE_CIRCLE:
+                    cv2.circle(out, (x0, y0), radius, world.colors[i], -1)
+                else:
+                    cv2.rectangle(out, (x0, y0), (x1, y1), world.colors[i], -1)
+
+        frame_data = {
+            'frame_id': frame_id,
+            'scene_type': world.cell_type_at(*camera['position'][:2]),
+            'camera_parameters': camera,
+            'tracks': self.tracks(ids, geometry)
+        }
+        draw_caption(out, frame_data)
+        if self.metrics is not None:
+            self.metrics.increment('sequence.frames')
+            self.metrics.increment('sequence.objects_projected', len(ids))
+        return out, frame_data
+
+    def tracks(self, ids, geometry):
+        """画面内物体的跟踪标注：track_id、类别、归一化框 [x, y, w, h] 与像素框 [x0, y0, x1, y1]"""
+        boxes, visible = pixel_boxes(geometry, self.width, self.height)
+        scale = np.array([self.width, self.height, self.width, self.height], dtype=np.float64)
+        return [{
+            'track_id': track_id,
+            'class': self.world.types[track_id],
+            'bbox': (np.concatenate([box[:2], box[2:] - box[:2]]) / scale).tolist(),
+            'bbox_pixels': box.tolist()
+        } for track_id, box in zip(ids[visible].tolist(), boxes[visible])]
+
+
+class VideoSequenceWriter:
+    """将帧写入视频容器（cv2.VideoWriter），跟踪标注逐帧追加到 JSON Lines 文件"""
+
+    def __init__(self, output_dir, name, fps, width, height):
+        self.video_path = os.path.join(output_dir, f"{name}.mp4")
+        self.tracks_path = os.path.join(output_dir, f"{name}_tracks.jsonl")
+        self._video = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC), fps, (width, height))
+        if not self._video.isOpened():
+            raise RuntimeError(f"无法打开视频写入器: {self.video_path}")
+        self._tracks = open(self.tracks_path, 'w')
+
+    def write(self, frame_id, image, frame_data):
+        self._video.write(image)
+        self._tracks.write(json.dumps(frame_data) + '\n')
+
+    def close(self):
+        """关闭输出，返回写出的文件路径"""
+        self._video.release()
+        self._tracks.close()
+        return [self.video_path, self.tracks_path]
+
+
+class ShardSequenceWriter:
+    """将每帧的图像与元数据（含跟踪标注）作为一个样本写入 tar 分片，样本 ID 为帧号
+
+    metadata_codec 为帧元数据的编解码器（默认 JSON）。
+    """
+
+    def __init__(self, output_dir, name, encoder, samples_per_shard=1000, stats=None, metadata_codec=None):
+        self.shard_dir = os.path.join(output_dir, f"{name}_frames")
+        self.encoder = encoder
+        self.stats = stats
+        self.metadata_codec = metadata_codec
+        self._writer = ShardWriter(self.shard_dir, samples_per_shard, prefix="frames")
+
+    def write(self, frame_id, image, frame_data):
+        stem = f"frame_{frame_id:06d}"
+        self._writer.write_sample(frame_id, encode_sample({stem: image, f"{stem}.json": frame_data},
+                                                          self.encoder, self.stats, self.metadata_codec))
+
+    def close(self):
+        self._writer.close()
+        return [self.shard_dir]
@@ -0,0 +1,104 @@
+"""
+帧缓冲池模块
+复用预分配的 uint8 帧缓冲：渲染时从池中取出，样本编码完成后归还，
+稳态下渲染不再为每个场景分配新的图像内存
+"""
+
+import os
+import threading
+
+import numpy as np
+
+
+class FrameBufferPool:
+    """按形状分组的帧缓冲池（线程安全）
+
+    acquire(shape, users) 取出一块缓冲，users 为共用该缓冲的样本数（批量渲染时
+    一块 (N, H, W, 3) 缓冲由 N 个场景共用）；每个样本用完后以其图像（缓冲本身或
+    其视图）调用一次 release，全部归还后缓冲回到空闲列表供下次 acquire 复用。
+    池中缓冲总数等于同时在途的最大缓冲数，由流水线的有界队列限制。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = {}
+        self._leases = {}   # id(缓冲) → [缓冲, 未归还的样本数]
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape, users=1, dtype=np.uint8):
+        """取出一块形状为 shape 的缓冲，空闲列表为空时才新分配"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            buffer = free.pop() if free else None
+            if buffer is None:
+                self.allocated += 1
+            else:
+                self.reused += 1
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype)
+        with self._lock:
+            self._leases[id(buffer)] = [buffer, users]
+        return buffer
+
+    def release(self, array):
+        """归还 array 所在的缓冲一次；array 不属于本池时返回 False"""
+        with self._lock:
+            lease = self._lease_of(array)
+            if lease is None:
+                return False
+            lease[1] -= 1
+            if lease[1] <= 0:
+                buffer = lease[0]
+                del self._leases[id(buffer)]
+                self._free.setdefault((buffer.shape, buffer.dtype.str), []).append(buffer)
+        return True
+
+    def _lease_of(self, array):
+        # 视图沿 base 链回溯到池中的缓冲
+        while isinstance(array, np.ndarray):
+            lease = self._leases.get(id(array))
+            if lease is not None and lease[0] is array:
+                return lease
+            array = array.base
+        return None
+
+    def clear(self):
+        """丢弃全部空闲缓冲"""
+        with self._lock:
+            self._free.clear()
+
+    def stats(self):
+        """分配 / 复用次数及当前在途、空闲缓冲数"""
+        with self._lock:
+            return {
+                'allocated': self.allocated,
+                'reused': self.reused,
+                'leased': len(self._leases),
+                'free': sum(len(buffers) for buffers in self._free.values())
+            }
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool():
+    """当前进程共用的帧缓冲池（进程池中每个 worker 各自一份，跨任务复用）"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = FrameBufferPool()
+        return _shared_pool
+
+
+def _reset_after_fork():
+    # fork 出的子进程不继承父进程的缓冲与锁状态
+    global _shared_pool, _shared_lock
+    _shared_pool = None
+    _shared_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
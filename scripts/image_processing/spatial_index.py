@@ -0,0 +1,96 @@
+"""
+空间索引模块
+按物体中心建立均匀网格索引（每个世界只建一次），每个相机视角只查询与视锥地面投影
+相交的网格单元，渲染开销随可见物体数而非世界中的物体总数增长
+"""
+
+import numpy as np
+
+from scripts.dataset_utils.scene_model import as_scene_objects
+from scripts.image_processing.camera import NEAR_CLIP, ground_footprint, intrinsics
+
+OBJECTS_PER_CELL = 8    # 自动选择单元边长时每个单元的目标物体数
+MIN_CELL_SIZE = 1.0
+
+
+class GridIndex:
+    """物体中心的均匀网格空间索引
+
+    positions、sizes 为 (N, 3) 数组（与场景元数据中物体的 position / size 相同）。
+    单元内的物体按序号排列，查询结果升序返回，即保持场景的绘制顺序。
+    cell_size 为 None 时按物体密度自动选择。
+    """
+
+    def __init__(self, positions, sizes, cell_size=None):
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 3)
+        n = len(self.positions)
+        xy = self.positions[:, :2]
+        self.origin = xy.min(axis=0) if n else np.zeros(2)
+        span = np.maximum(xy.max(axis=0) - self.origin, 0) if n else np.zeros(2)
+        if cell_size is None:
+            cell_size = np.sqrt(max(span[0] * span[1], 1.0) * OBJECTS_PER_CELL / max(n, 1))
+        self.cell_size = max(float(cell_size), MIN_CELL_SIZE)
+        self.cols, self.rows = (np.floor(span / self.cell_size).astype(np.int64) + 1).tolist()
+
+        # 物体包围盒的最大对角线长度，查询矩形按其外扩（见 visible）
+        self.reach = float(np.linalg.norm(self.sizes, axis=1).max()) if n else 0.0
+        # 顶面高度升序：高于相机的物体不受地面视野约束，单独取出
+        tops = self.positions[:, 2] + self.sizes[:, 2]
+        self._by_top = np.argsort(tops, kind='stable')
+        self._sorted_tops = tops[self._by_top]
+
+        # CSR：单元 k 内的物体为 _cell_objects[_cell_starts[k]:_cell_starts[k + 1]]
+        col, row = self._cells(xy[:, 0], xy[:, 1])
+        cells = row * self.cols + col
+        self._cell_objects = np.argsort(cells, kind='stable')
+        self._cell_starts = np.searchsorted(cells[self._cell_objects], np.arange(self.rows * self.cols + 1))
+
+    @classmethod
+    def from_objects(cls, objects, cell_size=None):
+        """由场景元数据中的物体（列表或 SceneObjects）建立索引"""
+        objects = as_scene_objects(objects)
+        return cls(objects.positions, objects.sizes, cell_size)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cells(self, x, y):
+        """坐标所在单元 (col, row)，不做裁剪"""
+        col = np.floor((np.asarray(x) - self.origin[0]) / self.cell_size).astype(np.int64)
+        row = np.floor((np.asarray(y) - self.origin[1]) / self.cell_size).astype(np.int64)
+        return col, row
+
+    def query(self, x0, y0, x1, y1):
+        """中心可能位于矩形 [x0, x1] x [y0, y1] 内的物体序号（升序）
+
+        返回与矩形相交的全部单元中的物体，是精确结果的超集。
+        """
+        c0, r0 = self._cells(x0, y0)
+        c1, r1 = self._cells(x1, y1)
+        c0, r0 = max(int(c0), 0), max(int(r0), 0)
+        c1, r1 = min(int(c1), self.cols - 1), min(int(r1), self.rows - 1)
+        if c0 > c1 or r0 > r1 or not len(self):
+            return np.zeros(0, dtype=np.int64)
+        starts = self._cell_starts
+        parts = [self._cell_objects[starts[r * self.cols + c0]:starts[r * self.cols + c1 + 1]]
+                 for r in range(r0, r1 + 1)]
+        return np.sort(np.concatenate(parts))
+
+    def visible(self, camera, width=None, height=None):
+        """可能出现在该相机画面中的物体序号（升序），保守地包含所有可见物体
+
+        渲染器绘制的是包围盒角点投影的外接矩形，物体本身略在视锥之外时该矩形仍可能进入画面，
+        但此时物体必有一点距视锥不超过其对角线长度。因此查询视锥地面外接矩形外扩两倍最大
+        对角线（再加两个地面像素）覆盖的单元；顶面接近或高于相机的物体始终保留。
+        画面中出现地平线时无法用地面范围约束，返回全部物体。
+        """
+        footprint = ground_footprint(camera, width, height)
+        if footprint is None:
+            return np.arange(len(self))
+        altitude = float(camera['position'][2])
+        pad = 2 * self.reach + 2 * altitude / intrinsics(camera, width, height)[0]
+        x0, y0, x1, y1 = footprint
+        ids = self.query(x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+        tall = self._by_top[np.searchsorted(self._sorted_tops, altitude - NEAR_CLIP):]
+        return np.union1d(ids, tall) if len(tall) else ids
@@ -0,0 +1,195 @@
+"""
+分块渲染模块
+超高分辨率（8K 及以上）帧按分块逐块光栅化：每块只绘制与之相交的物体，
+结果逐行流式写入单个 PNG，或写成分块图像目录；峰值内存只与分块大小有关，与整帧大小无关
+"""
+
+import hashlib
+import json
+import os
+import struct
+import zlib
+
+import cv2
+import numpy as np
+
+from scripts.dataset_utils.scene_model import as_scene_objects
+from scripts.dataset_utils.storage import DirectoryWriter, ImageEncoder, encode_json
+from scripts.image_processing.batch_renderer import background_template, draw_caption
+from scripts.image_processing.camera import SHAPE_CIRCLE, SHAPE_NONE, geometry_extents, project_scene
+
+TILE_LAYOUTS = ('stream', 'tiles')
+TILE_INDEX_FILE = "index.json"
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def iter_tiles(width, height, tile_width, tile_height):
+    """按行优先顺序产出分块 (row, col, x, y, w, h)"""
+    for row, y in enumerate(range(0, height, tile_height)):
+        for col, x in enumerate(range(0, width, tile_width)):
+            yield row, col, x, y, min(tile_width, width - x), min(tile_height, height - y)
+
+
+class TileRenderer:
+    """单个场景的分块渲染器
+
+    整帧几何只投影一次；render(x, y, w, h) 将整帧中 [x, x+w) x [y, y+h) 区域绘制到
+    分块缓冲，像素与整帧 _render_scene 的对应区域完全一致（cv2 光栅化对整数平移不变）。
+    """
+
+    def __init__(self, scene_data, width, height):
+        self.scene_data = scene_data
+        self.width = width
+        self.height = height
+        self.geometry = project_scene(scene_data, width, height)
+        self.colors = [tuple(color) for color in as_scene_objects(scene_data['objects']).colors.tolist()]
+        self.extents = np.stack(geometry_extents(self.geometry), axis=1)
+        self._buffers = {}
+
+    def _buffer(self, w, h):
+        # 同一尺寸的分块复用缓冲（边缘分块尺寸不同，最多几种）
+        buffer = self._buffers.get((h, w))
+        if buffer is None:
+            buffer = self._buffers[(h, w)] = np.empty((h, w, 3), dtype=np.uint8)
+        return buffer
+
+    def objects_in(self, x, y, w, h):
+        """与分块相交的物体序号（保持绘制顺序）"""
+        left, top, right, bottom = self.extents.T
+        hit = (self.geometry[:, 0] != SHAPE_NONE) & (right >= x) & (left < x + w) & (bottom >= y) & (top < y + h)
+        return np.flatnonzero(hit)
+
+    def render(self, x, y, w, h, draw_text=True):
+        """渲染一个分块，返回 (h, w, 3) uint8 视图（下次渲染同尺寸分块时会被覆盖）"""
+        tile = self._buffer(w, h)
+        np.copyto(tile, background_template(self.scene_data['scene_type'], w, h))
+        for i in self.objects_in(x, y, w, h):
+            shape, x0, y0, x1, y1, radius = (int(v) for v in self.geometry[i])
+            if shape == SHAPE_CIRCLE:
+                cv2.circle(tile, (x0 - x, y0 - y), radius, self.colors[i], -1)
+            else:
+                cv2.rectangle(tile, (x0 - x, y0 - y), (x1 - x, y1 - y), self.colors[i], -1)
+        if draw_text:
+            draw_caption(tile, self.scene_data, offset=(x, y))
+        return tile
+
+    def iter_strips(self, strip_height):
+        """逐条渲染整行宽度的条带，产出 (y, strip)"""
+        for y in range(0, self.height, strip_height):
+            h = min(strip_height, self.height - y)
+            yield y, self.render(0, y, self.width, h)
+
+
+class PNGStreamWriter:
+    """逐行流式写出 8 位 RGB PNG
+
+    行数据经 Up 滤波后送入增量 zlib 压缩，每得到一段压缩数据就写一个 IDAT 块，
+    内存占用只与一次写入的行数有关。先写临时文件，close() 时原子替换并给出 sha256。
+    """
+
+    def __init__(self, path, width, height, compression=3):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.sha256 = hashlib.sha256()
+        self._tmp_path = f"{path}.tmp.{os.getpid()}"
+        self._file = open(self._tmp_path, 'wb')
+        self._compressor = zlib.compressobj(compression)
+        self._previous = np.zeros((1, width * 3), dtype=np.uint8)
+        self._write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _write(self, data):
+        self._file.write(data)
+        self.sha256.update(data)
+
+    def _chunk(self, kind, data):
+        self._write(struct.pack('>I', len(data)) + kind + data
+                    + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def write_rows(self, rows):
+        """写入 (n, width, 3) uint8 BGR 行（与 cv2 图像相同的通道顺序）"""
+        if rows.shape[1:] != (self.width, 3) or self.rows_written + len(rows) > self.height:
+            raise ValueError(f"行数据形状不符: {rows.shape}")
+        rgb = rows[:, :, ::-1].reshape(len(rows), -1)
+        filtered = np.empty((len(rows), 1 + self.width * 3), dtype=np.uint8)
+        filtered[:, 0] = 2  # Up 滤波：与上一行逐字节相减（模 256）
+        np.subtract(rgb[:1], self._previous, out=filtered[:1, 1:])
+        np.subtract(rgb[1:], rgb[:-1], out=filtered[1:, 1:])
+        self._previous = rgb[-1:].copy()
+        self.rows_written += len(rows)
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def close(self):
+        """结束压缩流并写入 IEND，返回文件的 sha256"""
+        if self.rows_written != self.height:
+            self.abort()
+            raise ValueError(f"PNG 行数不完整: {self.rows_written}/{self.height}")
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.sha256.hexdigest()
+
+    def abort(self):
+        """放弃写出并删除临时文件"""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+def write_streamed_png(scene_data, path, width, height, strip_height=256, compression=3):
+    """按条带渲染场景并流式写成单个 PNG，返回文件的 sha256"""
+    renderer = TileRenderer(scene_data, width, height)
+    writer = PNGStreamWriter(path, width, height, compression)
+    try:
+        for _, strip in renderer.iter_strips(strip_height):
+            writer.write_rows(strip)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def write_tiles(scene_data, tile_dir, width, height, tile_size=1024, encoder=None):
+    """按分块渲染场景，每块编码为一个文件写入 tile_dir，并写出分块索引
+
+    encoder 为 storage.ImageEncoder（默认 PNG）。返回 {相对 tile_dir 的文件名: sha256}，供清单记录。
+    """
+    encoder = encoder or ImageEncoder('png')
+    writer = DirectoryWriter(tile_dir)
+    renderer = TileRenderer(scene_data, width, height)
+    digests = {}
+    tiles = []
+    for row, col, x, y, w, h in iter_tiles(width, height, tile_size, tile_size):
+        name = f"r{row:03d}_c{col:03d}{encoder.ext}"
+        data = encoder.encode(renderer.render(x, y, w, h))
+        writer.write_sample(scene_data['scene_id'], {name: data})
+        digests[name] = hashlib.sha256(data).hexdigest()
+        tiles.append({'file': name, 'row': row, 'col': col, 'x': x, 'y': y, 'width': w, 'height': h})
+    index = encode_json({'scene_id': scene_data['scene_id'], 'width': width, 'height': height,
+                         'tile_size': tile_size, 'tiles': tiles})
+    writer.write_sample(scene_data['scene_id'], {TILE_INDEX_FILE: index})
+    digests[TILE_INDEX_FILE] = hashlib.sha256(index).hexdigest()
+    return digests
+
+
+def read_tiles(tile_dir, region=None):
+    """从分块目录拼回图像；region=(x, y, w, h) 时只读取与之相交的分块"""
+    with open(os.path.join(tile_dir, TILE_INDEX_FILE), 'r') as f:
+        index = json.load(f)
+    x0, y0, w0, h0 = region if region is not None else (0, 0, index['width'], index['height'])
+    image = np.empty((h0, w0, 3), dtype=np.uint8)
+    for tile in index['tiles']:
+        left, top = max(tile['x'], x0), max(tile['y'], y0)
+        right, bottom = min(tile['x'] + tile['width'], x0 + w0), min(tile['y'] + tile['height'], y0 + h0)
+        if left >= right or top >= bottom:
+            continue
+        path = os.path.join(tile_dir, tile['file'])
+        data = np.load(path) if path.endswith('.npy') else cv2.imread(path, cv2.IMREAD_COLOR)
+        image[top - y0:bottom - y0, left - x0:right - x0] = \
+            data[top - tile['y']:bottom - tile['y'], left - tile['x']:right - tile['x']]
+    return image
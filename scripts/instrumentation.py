@@ -0,0 +1,202 @@
+"""
+性能埋点模块
+提供线程安全的分阶段计时器与计数器（可导出为 JSON 和 Prometheus textfile），
+以及用 cProfile 或 tracemalloc 包裹整次运行的 --profile 模式
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+
+class Metrics:
+    """分阶段计时器与计数器（线程安全）
+
+    timer(name) 累计某阶段的调用次数、总耗时和单次最大耗时；increment(name) 累加计数。
+    可跨进程传递：子进程返回 as_dict()，主进程用 merge() 合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, name):
+        """为 with 块计时并记入阶段 name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, count=1):
+        with self._lock:
+            entry = self.timers.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            entry['count'] += count
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds / count if count else seconds)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        """清空全部计时与计数（保留对象本身，共享它的组件仍然有效）"""
+        with self._lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def merge(self, other):
+        """合并另一份统计（如子进程返回的 as_dict() 结果）"""
+        with self._lock:
+            for name, values in other['timers'].items():
+                entry = self.timers.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+                entry['count'] += values['count']
+                entry['seconds'] += values['seconds']
+                entry['max_seconds'] = max(entry['max_seconds'], values['max_seconds'])
+            for name, value in other['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge_encode_stats(self, stats):
+        """并入 storage.EncodeStats.as_dict() 的编码与写盘统计"""
+        for fmt, entry in stats['formats'].items():
+            self.add_time(f"encode.{fmt}", entry['encode_seconds'], entry['files'])
+            self.increment(f"bytes.{fmt}", entry['bytes'])
+        if stats['write_seconds']:
+            self.add_time('write', stats['write_seconds'])
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'timers': {name: dict(values) for name, values in self.timers.items()},
+                'counters': dict(self.counters)
+            }
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def save_prometheus(self, path, prefix='uav_pipeline'):
+        """写出 Prometheus node_exporter textfile 格式（先写临时文件再替换，避免被读到半个文件）"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(prometheus_text(self.as_dict(), prefix))
+        os.replace(tmp_path, path)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(metrics, prefix='uav_pipeline'):
+    """将 Metrics.as_dict() 转换为 Prometheus 文本格式"""
+    timers = sorted(metrics['timers'].items())
+    counters = sorted(metrics['counters'].items())
+    lines = []
+    for metric, kind, help_text, key in (
+            ('stage_seconds_total', 'counter', '各阶段累计耗时（秒）', 'seconds'),
+            ('stage_calls_total', 'counter', '各阶段调用次数', 'count'),
+            ('stage_max_seconds', 'gauge', '各阶段单次最大耗时（秒）', 'max_seconds')):
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        lines.extend(f'{prefix}_{metric}{{stage="{_label(name)}"}} {values[key]}' for name, values in timers)
+    lines.append(f"# HELP {prefix}_events_total 计数器")
+    lines.append(f"# TYPE {prefix}_events_total counter")
+    lines.extend(f'{prefix}_events_total{{name="{_label(name)}"}} {value}' for name, value in counters)
+    return '\n'.join(lines) + '\n'
+
+
+class RunProfiler:
+    """--profile 模式：用 cProfile 或 tracemalloc 包裹一次运行并把结果写到 output_dir
+
+    cprofile：为运行期间新建的每个线程（流水线各阶段、后台写入线程）各挂一个
+    cProfile，结束时与主线程合并，输出 profile.pstats 与按累计耗时排序的 profile.txt。
+    进程池 worker 中的调用不在统计范围内，完整剖析请使用 workers=1。
+    tracemalloc：输出 tracemalloc.snapshot 与按分配位置排序的 tracemalloc.txt（含峰值内存）。
+    """
+
+    def __init__(self, mode, output_dir, top=40):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的剖析模式: {mode}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.top = top
+        self._profiles = []
+        self._lock = threading.Lock()
+        self.paths = []
+
+    def _thread_hook(self, frame, event, arg):
+        # threading.setprofile 在每个新线程启动时安装此钩子，首次回调时换成该线程自己的 cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        if self.mode == 'cprofile':
+            main_profile = cProfile.Profile()
+            self._profiles = [main_profile]
+            threading.setprofile(self._thread_hook)
+            main_profile.enable()
+        else:
+            tracemalloc.start(1)
+
+    def stop(self):
+        """停止剖析并写出结果文件，返回写出的路径"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.mode == 'cprofile':
+            self._profiles[0].disable()
+            threading.setprofile(None)
+            with self._lock:
+                profiles = list(self._profiles)
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats_path = os.path.join(self.output_dir, "profile.pstats")
+            stats.dump_stats(stats_path)
+            report = io.StringIO()
+            pstats.Stats(stats_path, stream=report).sort_stats('cumulative').print_stats(self.top)
+            text_path = os.path.join(self.output_dir, "profile.txt")
+            with open(text_path, 'w') as f:
+                f.write(report.getvalue())
+            self.paths = [stats_path, text_path]
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot_path = os.path.join(self.output_dir, "tracemalloc.snapshot")
+            snapshot.dump(snapshot_path)
+            text_path = os.path.join(self.output_dir, "tracemalloc.txt")
+            with open(text_path, 'w') as f:
+                f.write(f"current: {current / 1e6:.2f} MB, peak: {peak / 1e6:.2f} MB\n\n")
+                for stat in snapshot.statistics('lineno')[:self.top]:
+                    f.write(f"{stat}\n")
+            self.paths = [snapshot_path, text_path]
+        return self.paths
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
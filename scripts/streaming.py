@@ -0,0 +1,115 @@
+"""
+流式处理模块
+将多个处理阶段用有界队列串联，每个阶段运行在独立线程中；
+下游来不及处理时上游在 put 上阻塞（背压），内存占用与数据总量无关
+"""
+
+import queue
+import threading
+from collections import deque
+
+_END = object()
+_POLL_INTERVAL = 0.1
+
+
+class _StageError:
+    """沿队列向下游传递的阶段异常"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _put(q, item, stop):
+    """阻塞写入队列，流水线停止时放弃"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    """阻塞读取队列，流水线停止时返回结束标记"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+    return _END
+
+
+class StreamPipeline:
+    """由有界队列串联的多阶段流水线
+
+    stages 为 [(名称, 函数)]，每个函数接收上一阶段的一个元素并返回一个元素。
+    run(source) 返回生成器，按输入顺序产出最后一个阶段的结果。
+    """
+
+    def __init__(self, stages, queue_size=8):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+
+    def _feed(self, source, out_q, stop):
+        """源线程：从输入迭代器读取元素"""
+        try:
+            for item in source:
+                if not _put(out_q, item, stop):
+                    return
+        except Exception as e:
+            _put(out_q, _StageError(e), stop)
+            return
+        _put(out_q, _END, stop)
+
+    def _work(self, fn, in_q, out_q, stop):
+        """阶段线程：处理元素并传给下游"""
+        while True:
+            item = _get(in_q, stop)
+            if item is _END or isinstance(item, _StageError):
+                _put(out_q, item, stop)
+                return
+            try:
+                result = fn(item)
+            except Exception as e:
+                _put(out_q, _StageError(e), stop)
+                return
+            if not _put(out_q, result, stop):
+                return
+
+    def run(self, source):
+        """运行流水线，逐个产出结果"""
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(iter(source), queues[0], stop),
+                                    name="stream-source", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._work, args=(fn, queues[i], queues[i + 1], stop),
+                                            name=f"stream-{name}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.exc
+                yield item
+        finally:
+            # 消费者提前退出或出错时通知所有阶段停止
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+
+def bounded_map(executor, fn, iterable, max_in_flight):
+    """与 executor.map 相同的有序结果，但同时在途的任务不超过 max_in_flight 个"""
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,94 @@
+"""
+标注生成测试
+"""
+
+import os
+
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.metadata_codec import load_metadata
+from scripts.image_processing.annotation_generator import AnnotationGenerator
+
+
+def _annotate(output_dir, **kwargs):
+    pipeline = UAVDataPipeline(str(output_dir), seed=5, resolution=(64, 48), **kwargs)
+    return list(pipeline.stream_scenes(3, annotate=True))
+
+
+def test_annotation_file_references_exist(tmp_path):
+    _annotate(tmp_path)
+    annotations = load_metadata(str(tmp_path / "scene_000_annotations.json"))
+    for key in ('image_file', 'metadata_file', 'segmentation_mask', 'instance_mask', 'depth_map'):
+        assert os.path.exists(tmp_path / annotations[key]), key
+    assert annotations['segmentation_mask'] == "scene_000_mask.png"
+
+
+def test_annotation_references_follow_image_format(tmp_path):
+    # webp 无法无损保存 uint16 / float32，掩码与深度图改存为 .npy
+    _annotate(tmp_path, image_format='webp', depth_format='float32')
+    annotations = load_metadata(str(tmp_path / "scene_001_annotations.json"))
+    assert annotations['image_file'] == "scene_001.webp"
+    assert annotations['depth_map'] == "scene_001_depth.npy"
+    assert annotations['instance_mask'] == "scene_001_instances.npy"
+    for key in ('image_file', 'segmentation_mask', 'instance_mask', 'depth_map'):
+        assert os.path.exists(tmp_path / annotations[key]), key
+
+
+def _nadir_scene(objects, altitude=200):
+    return {
+        'scene_id': 0,
+        'scene_type': 'open_field',
+        'camera_parameters': {'position': [0, 0, altitude], 'rotation': [-90, 0, 0], 'fov': 90,
+                              'resolution': [64, 48]},
+        'objects': objects
+    }
+
+
+def test_projected_boxes_match_instance_mask():
+    objects = [
+        {'type': 'obstacle', 'position': [0, 0, 0], 'size': [50, 50, 30], 'color': [80, 80, 80]},
+        {'type': 'building', 'position': [120, 60, 0], 'size': [60, 40, 80], 'color': [100, 100, 100]},
+        {'type': 'tree', 'position': [5000, 0, 0], 'size': [40, 40, 100], 'color': [0, 120, 0]}
+    ]
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    annotations, segmentation_mask, depth_map, instance_mask = AnnotationGenerator().annotate_scene(
+        image, _nadir_scene(objects), "scene_000.png")
+
+    # 画面之外的树不输出边界框
+    boxes = annotations['bounding_boxes']
+    assert [box['object_id'] for box in boxes] == [0, 1]
+    for box in boxes:
+        ys, xs = np.nonzero(instance_mask == box['instance_id'])
+        assert box['area'] == len(xs) > 0
+        assert box['visible_bbox_pixels'] == [xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]
+        x0, y0, x1, y1 = box['bbox_pixels']
+        assert x0 <= xs.min() and y0 <= ys.min() and xs.max() < x1 and ys.max() < y1
+    # 分割掩码与实例掩码覆盖相同的像素，深度图尺寸与图像一致
+    assert np.array_equal(segmentation_mask > 0, instance_mask > 0)
+    assert depth_map.shape == (48, 64)
+    # 相机正下方物体的框以画面中心为中心
+    x0, y0, x1, y1 = boxes[0]['bbox_pixels']
+    assert abs((x0 + x1) / 2 - 32) <= 1 and abs((y0 + y1) / 2 - 24) <= 1
+
+
+def test_instance_statistics_with_occlusion():
+    # 实例掩码与渲染一致按物体顺序覆盖：先绘制的小物体被随后的大物体完全遮挡
+    objects = [
+        {'type': 'obstacle', 'position': [0, 0, 0], 'size': [20, 20, 10], 'color': [50, 50, 50]},
+        {'type': 'obstacle', 'position': [0, 0, 0], 'size': [120, 120, 30], 'color': [80, 80, 80]},
+        {'type': 'building', 'position': [0, 0, 0], 'size': [40, 40, 80], 'color': [100, 100, 100]}
+    ]
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    annotations, _, _, instance_mask = AnnotationGenerator().annotate_scene(image, _nadir_scene(objects),
+                                                                           "scene_000.png")
+    assert instance_mask.dtype == np.uint16
+    assert set(np.unique(instance_mask).tolist()) == {0, 2, 3}
+    hidden, low, tall = annotations['bounding_boxes']
+    assert tall['visible_fraction'] == 1.0
+    assert 0 < low['visible_fraction'] < 1
+    assert low['area'] == np.count_nonzero(instance_mask == 2)
+    assert hidden['area'] == 0 and hidden['visible_bbox'] is None and hidden['centroid'] is None
+    # 质心为可见像素坐标的平均值
+    ys, xs = np.nonzero(instance_mask == 3)
+    assert np.allclose(tall['centroid'], [xs.mean(), ys.mean()])
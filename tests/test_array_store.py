@@ -0,0 +1,46 @@
+"""
+内存映射数组存储测试
+"""
+
+import os
+
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.array_store import ArrayStore, LazyArrayDataset
+from scripts.image_processing.annotation_generator import AnnotationGenerator
+
+
+def test_store_without_instances_keeps_depth_and_mask(tmp_path):
+    store = ArrayStore.create(str(tmp_path), 'train', 3, 4, 5)
+    store.write(1, 1, np.full((4, 5), 2.5, dtype=np.float32), np.full((4, 5), 7, dtype=np.uint16))
+    store.flush()
+    del store
+    # 模拟实例掩码出现之前创建的存储
+    os.unlink(tmp_path / "train_instances.npy")
+    assert ArrayStore.exists(str(tmp_path), 'train')
+    assert ArrayStore.open(str(tmp_path), 'train').instances is None
+
+    store = ArrayStore.open_or_create(str(tmp_path), 'train', 3, 4, 5)
+    assert store.ids.tolist() == [-1, 1, -1]
+    assert float(store.depth[1, 0, 0]) == 2.5 and int(store.mask[1, 0, 0]) == 7
+    assert store.instances.shape == (3, 4, 5) and not store.instances.any()
+
+
+def test_lazy_dataset_matches_annotations(tmp_path):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=2, resolution=(64, 48), array_split='train')
+    list(pipeline.stream_scenes(3, annotate=True))
+    # 深度图与掩码只存入 .npy，不再逐场景写 PNG
+    assert not (tmp_path / "scene_001_depth.png").exists()
+
+    dataset = LazyArrayDataset(str(tmp_path), 'train')
+    assert len(dataset) == 3
+    generator = AnnotationGenerator()
+    for scene_id in range(3):
+        scene_data, image = pipeline.regenerate_scene(scene_id)
+        _, mask, depth, instances = generator.annotate_scene(image, scene_data, f"scene_{scene_id:03d}.png")
+        lazy_depth, lazy_mask = dataset.by_scene_id(scene_id)
+        assert isinstance(lazy_depth, np.memmap) and lazy_depth.dtype == np.float32
+        assert np.array_equal(lazy_depth, depth)
+        assert np.array_equal(lazy_mask, mask)
+        assert np.array_equal(dataset.instances(scene_id), instances)
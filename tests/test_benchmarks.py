@@ -0,0 +1,40 @@
+"""
+基准测试工具测试
+"""
+
+from benchmarks.run_benchmarks import compare_to_baseline, measure_case, prepare_case
+
+RESOLUTION = (64, 48)
+
+
+def _case(stage, **metrics):
+    return dict({'name': f"{stage}/3/64x48", 'stage': stage}, **metrics)
+
+
+def test_latency_recorded_only_for_per_scene_stages(tmp_path):
+    generated = measure_case('generate', str(tmp_path / "generate"), 3, RESOLUTION)
+    assert generated['p50_latency_ms'] > 0 and generated['p99_latency_ms'] >= generated['p50_latency_ms']
+
+    data_dir = str(tmp_path / "annotate_all")
+    prepare_case('annotate_all', data_dir, 3, RESOLUTION)
+    annotated = measure_case('annotate_all', data_dir, 3, RESOLUTION)
+    assert annotated['scenes_per_sec'] > 0 and annotated['bytes'] > 0
+    assert 'p50_latency_ms' not in annotated and 'p99_latency_ms' not in annotated
+
+
+def test_compare_to_baseline():
+    baseline = {'cases': [
+        _case('generate', scenes_per_sec=100.0, p99_latency_ms=10.0, peak_rss_mb=100.0),
+        _case('validate', scenes_per_sec=100.0, p99_latency_ms=10.0, peak_rss_mb=100.0)
+    ]}
+    cases = [
+        _case('generate', scenes_per_sec=95.0, p99_latency_ms=20.0, peak_rss_mb=100.0),
+        _case('validate', scenes_per_sec=50.0, peak_rss_mb=100.0),
+        _case('annotate', scenes_per_sec=1.0)
+    ]
+    regressions = compare_to_baseline(cases, baseline, tolerance=0.25)
+    # validate 不比较延迟，基线中没有的 annotate 用例不比较
+    assert [(r['case'], r['metric']) for r in regressions] == [
+        ('generate/3/64x48', 'p99_latency_ms'),
+        ('validate/3/64x48', 'scenes_per_sec')
+    ]
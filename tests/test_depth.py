@@ -0,0 +1,50 @@
+"""
+深度渲染测试
+"""
+
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.image_processing.depth_renderer import encode_depth, render_depth, render_depth_batch
+
+
+def _nadir_scene(objects, altitude=200):
+    return {
+        'scene_id': 0,
+        'scene_type': 'open_field',
+        'camera_parameters': {'position': [0, 0, altitude], 'rotation': [-90, 0, 0], 'fov': 90,
+                              'resolution': [64, 48]},
+        'objects': objects
+    }
+
+
+def test_depth_is_distance_to_nearest_top():
+    scene_data = _nadir_scene([
+        {'type': 'obstacle', 'position': [0, 0, 0], 'size': [120, 120, 30], 'color': [80, 80, 80]},
+        # 较高的物体部分遮挡较低的物体
+        {'type': 'building', 'position': [0, 0, 0], 'size': [40, 40, 80], 'color': [100, 100, 100]}
+    ])
+    depth = render_depth(scene_data, 64, 48)
+    assert depth.shape == (48, 64) and depth.dtype == np.float32
+    # 俯视相机：地面深度为相机高度，物体顶面深度为相机高度减顶面高度
+    assert set(np.unique(depth).tolist()) == {120.0, 170.0, 200.0}
+    assert depth[24, 32] == 120.0
+    assert depth[24, 32 + 8] == 170.0
+    assert depth[0, 0] == 200.0
+
+
+def test_batch_depth_matches_single_scene():
+    pipeline = UAVDataPipeline(None, seed=6, resolution=(64, 48))
+    scenes = list(pipeline.iter_scenes(6))
+    batch = render_depth_batch(scenes, 64, 48, max_pixels=512)
+    for scene_data, depth in zip(scenes, batch):
+        assert np.array_equal(depth, render_depth(scene_data, 64, 48))
+
+
+def test_encode_depth_formats():
+    depth = np.array([[0.0, 50.0], [100.0, 200.0]], dtype=np.float32)
+    encoded, scale = encode_depth(depth, 'uint16')
+    assert encoded.dtype == np.uint16 and encoded.max() == 65535
+    assert np.allclose(encoded / scale, depth, atol=1 / scale)
+    encoded, scale = encode_depth(depth, 'float32')
+    assert scale == 1.0 and np.array_equal(encoded, depth)
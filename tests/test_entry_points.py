@@ -0,0 +1,31 @@
+"""
+命令行入口测试：脚本可以按文档以 python scripts/... 直接运行
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 按顺序在同一个工作目录中运行（后面的脚本读取前面生成的 generated_data/）
+SCRIPTS = [
+    ('scripts/data_pipeline.py', ['--num-scenes', '2', '--resolution', '64', '48', '--seed', '1', '--workers', '2']),
+    ('scripts/image_processing/annotation_generator.py', []),
+    ('scripts/dataset_utils/validate_dataset.py', []),
+    ('scripts/dataset_utils/validate_dataset_fixed.py', ['--deep', '--workers', '2']),
+]
+
+
+def test_scripts_run_directly(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONPATH'}
+    for script, args in SCRIPTS:
+        result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, script)] + args, cwd=tmp_path, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, f"{script}:\n{result.stderr}"
+    assert (tmp_path / "generated_data" / "scene_001.png").exists()
+    assert (tmp_path / "generated_data" / "scene_001_annotations.json").exists()
+    with open(tmp_path / "generated_data" / "validation_report.json") as f:
+        report = json.load(f)
+    assert all(result['status'] for result in report.values()), report
@@ -0,0 +1,58 @@
+"""
+飞行序列测试
+"""
+
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.storage import ShardReader
+from scripts.image_processing.camera import pixel_boxes, project_arrays
+from scripts.image_processing.flight_sequence import SequenceRenderer, Trajectory
+
+WAYPOINTS = [[-600, -400, 400], [600, 400, 400], [600, 800, 500]]
+
+
+def test_trajectory_interpolation():
+    trajectory = Trajectory([[0, 0, 100], [300, 0, 100], [300, 300, 500]], speed=50, fps=2, heading=True)
+    # 航迹长度按三维距离计算
+    assert trajectory.length == 800
+    assert trajectory.num_frames == 33
+    assert trajectory.camera(0, 64, 48)['position'] == [0.0, 0.0, 100.0]
+    assert trajectory.camera(4, 64, 48)['position'] == [100.0, 0.0, 100.0]
+    assert trajectory.camera(4, 64, 48)['rotation'] == [-90, -90.0, 0]
+    # 第二段上高度线性变化，偏航跟随航向
+    camera = trajectory.camera(16, 64, 48)
+    assert camera['position'] == [300.0, 60.0, 180.0]
+    assert camera['rotation'] == [-90, 0.0, 0]
+    # 超出航迹末端时停在终点
+    assert trajectory.camera(1000, 64, 48)['position'] == [300.0, 300.0, 500.0]
+
+
+def test_frame_tracks_match_brute_force_projection():
+    pipeline = UAVDataPipeline(None, seed=4, resolution=(64, 48))
+    world = pipeline.create_world(3, 3)
+    renderer = SequenceRenderer(world, 64, 48)
+    trajectory = Trajectory(WAYPOINTS, speed=100, fps=2)
+    for frame_id in range(trajectory.num_frames):
+        camera = trajectory.camera(frame_id, 64, 48)
+        _, frame_data = renderer.render(frame_id, camera)
+        # 不经空间索引，投影世界中全部物体
+        geometry = project_arrays(world.positions, world.sizes, world.shapes, camera, 64, 48)
+        boxes, visible = pixel_boxes(geometry, 64, 48)
+        expected = dict(zip(np.flatnonzero(visible).tolist(), boxes[visible].tolist()))
+        assert {track['track_id']: track['bbox_pixels'] for track in frame_data['tracks']} == expected
+
+
+def test_sequence_shards_are_deterministic(tmp_path):
+    trajectory = Trajectory(WAYPOINTS, speed=200, fps=2)
+    frames = []
+    for name in ('first', 'second'):
+        pipeline = UAVDataPipeline(str(tmp_path / name), seed=4, resolution=(64, 48))
+        sequence = pipeline.generate_sequence(trajectory, world_size=(3, 3), output='shards', name="flight")
+        assert sequence['num_frames'] == trajectory.num_frames
+        with ShardReader(str(tmp_path / name / "flight_frames")) as reader:
+            assert reader.scene_ids() == list(range(trajectory.num_frames))
+            frames.append([reader.read(frame_id, f"frame_{frame_id:06d}.png") for frame_id in reader.scene_ids()])
+    assert frames[0] == frames[1]
+    # 相邻帧连续变化而非各自独立生成
+    assert len(set(frames[0])) > 1
@@ -0,0 +1,48 @@
+"""
+性能埋点测试
+"""
+
+import json
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.instrumentation import Metrics, RunProfiler, prometheus_text
+
+
+def test_metrics_merge_across_workers(tmp_path):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=1, resolution=(64, 48))
+    list(pipeline.stream_scenes(4, workers=2, annotate=True))
+    metrics = pipeline.metrics.as_dict()
+    # 子进程中记录的标注统计合并回主进程
+    assert metrics['counters']['scenes_generated'] == 4
+    assert metrics['counters']['annotate.scenes'] == 4
+    assert metrics['timers']['annotate.rasterize']['count'] == 4
+    assert metrics['timers']['encode.png']['count'] > 0
+
+    json_path, prom_path = pipeline.save_metrics()
+    with open(json_path) as f:
+        assert json.load(f) == metrics
+    with open(prom_path) as f:
+        assert 'uav_pipeline_events_total{name="scenes_generated"} 4\n' in f.read()
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.add_time('render', 0.5)
+    metrics.add_time('render', 1.5)
+    metrics.increment('scenes')
+    other = Metrics()
+    other.add_time('render', 0.25)
+    metrics.merge(other.as_dict())
+    lines = prometheus_text(metrics.as_dict(), prefix='test').splitlines()
+    assert 'test_stage_seconds_total{stage="render"} 2.25' in lines
+    assert 'test_stage_calls_total{stage="render"} 3' in lines
+    assert 'test_stage_max_seconds{stage="render"} 1.5' in lines
+    assert 'test_events_total{name="scenes"} 1' in lines
+
+
+def test_tracemalloc_profiler_writes_report(tmp_path):
+    with RunProfiler('tracemalloc', str(tmp_path)) as profiler:
+        data = [bytes(1000) for _ in range(100)]
+    assert len(data) == 100
+    assert [path.rsplit('/', 1)[1] for path in profiler.paths] == ["tracemalloc.snapshot", "tracemalloc.txt"]
+    assert (tmp_path / "tracemalloc.txt").read_text().startswith("current:")
@@ -0,0 +1,79 @@
+"""
+元数据编解码与物体列式表测试
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.metadata_codec import BINARY_PREAMBLE, MetadataCodec, load_metadata
+from scripts.dataset_utils.object_table import ObjectTable, build_object_table, iter_metadata
+from scripts.dataset_utils.scene_model import SceneObjects
+
+
+def _scene(scene_id=0, **kwargs):
+    return UAVDataPipeline(None, seed=3, resolution=(64, 48), **kwargs)._create_scene(scene_id)
+
+
+def _assert_same_objects(actual, expected):
+    for column in ('positions', 'sizes', 'colors', 'class_ids'):
+        assert np.array_equal(getattr(actual, column), getattr(expected, column)), column
+        assert getattr(actual, column).dtype == getattr(expected, column).dtype, column
+    assert actual.types == expected.types
+
+
+def test_json_output_matches_plain_json():
+    scene_data = _scene()
+    plain = dict(scene_data, objects=scene_data['objects'].to_list())
+    encoded = MetadataCodec('json').encode(scene_data)
+    assert encoded == json.dumps(plain, indent=2).encode('utf-8')
+    decoded = MetadataCodec('json').decode(encoded)
+    _assert_same_objects(SceneObjects.from_list(decoded['objects']), scene_data['objects'])
+
+
+def test_binary_round_trip():
+    codec = MetadataCodec('binary')
+    scene_data = _scene(objects_per_scene=500)
+    decoded = codec.decode(codec.encode(scene_data))
+    _assert_same_objects(decoded['objects'], scene_data['objects'])
+    assert {key: value for key, value in decoded.items() if key != 'objects'} == \
+        {key: value for key, value in scene_data.items() if key != 'objects'}
+    # 物体数组为只读视图，不复制数据
+    assert not decoded['objects'].positions.flags.writeable
+    # 空物体集合同样可以往返
+    empty = codec.decode(codec.encode(dict(scene_data, objects=SceneObjects.concatenate([]))))
+    assert len(empty['objects']) == 0
+
+
+def test_binary_rejects_corrupt_data():
+    codec = MetadataCodec('binary')
+    data = codec.encode(_scene())
+    with pytest.raises(ValueError):
+        codec.decode(data[:-8])
+    with pytest.raises(ValueError):
+        codec.decode(data[:BINARY_PREAMBLE.size - 1])
+    with pytest.raises(ValueError):
+        codec.decode(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        MetadataCodec('yaml')
+
+
+@pytest.mark.parametrize('storage', ['files', 'shards'])
+def test_object_table_matches_metadata(tmp_path, storage):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=3, resolution=(64, 48), metadata_format='binary',
+                               storage=storage, samples_per_shard=2)
+    list(pipeline.stream_scenes(5))
+    if storage == 'files':
+        assert load_metadata(str(tmp_path / "scene_000.uavm"))['scene_id'] == 0
+    table = ObjectTable(build_object_table(str(tmp_path), str(tmp_path / "table")))
+    scenes = list(iter_metadata(str(tmp_path)))
+    assert [scene_data['scene_id'] for scene_data in scenes] == list(range(5))
+    assert table.num_scenes == 5
+    assert len(table) == sum(len(scene_data['objects']) for scene_data in scenes)
+    for scene_data in scenes:
+        _assert_same_objects(table.scene_objects(scene_data['scene_id']), scene_data['objects'])
+        assert table.scene_type(scene_data['scene_id']) == scene_data['scene_type']
+    with pytest.raises(KeyError):
+        table.scene_objects(99)
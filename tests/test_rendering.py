@@ -0,0 +1,64 @@
+"""
+渲染测试
+"""
+
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.image_processing import batch_renderer, frame_pool
+from scripts.image_processing.frame_pool import FrameBufferPool
+
+
+def _scenes(num_scenes=10, resolution=(64, 48), **kwargs):
+    pipeline = UAVDataPipeline(None, seed=3, resolution=resolution, **kwargs)
+    return pipeline, list(pipeline.iter_scenes(num_scenes))
+
+
+def test_batch_render_matches_single_render():
+    for resolution, objects_per_scene in (((64, 48), None), ((160, 120), 40)):
+        pipeline, scenes = _scenes(resolution=resolution, objects_per_scene=objects_per_scene)
+        images = batch_renderer.render_batch(scenes, width=resolution[0], height=resolution[1])
+        assert images.shape == (len(scenes), resolution[1], resolution[0], 3) and images.dtype == np.uint8
+        for scene_data, image in zip(scenes, images):
+            assert np.array_equal(image, pipeline._render_scene(scene_data)), scene_data['scene_id']
+
+
+def test_render_into_reused_buffer():
+    pipeline, scenes = _scenes(4)
+    buffer = np.full((48, 64, 3), 7, dtype=np.uint8)
+    for scene_data in scenes:
+        image = pipeline._render_scene(scene_data, out=buffer)
+        assert image is buffer
+        assert np.array_equal(image, pipeline._render_scene(scene_data))
+
+
+def test_background_template_is_cached_and_read_only():
+    template = batch_renderer.background_template('forest', 64, 48)
+    assert template is batch_renderer.background_template('forest', 64, 48)
+    assert not template.flags.writeable
+    assert (template == batch_renderer.scene_background('forest')).all()
+
+
+def test_frame_pool_reuses_released_buffers():
+    pool = FrameBufferPool()
+    batch = pool.acquire((2, 48, 64, 3), users=2)
+    # 批量缓冲的每个场景视图各归还一次后才回到空闲列表
+    assert pool.release(batch[0])
+    assert pool.stats()['free'] == 0
+    assert pool.release(batch[1])
+    assert pool.acquire((2, 48, 64, 3)) is batch
+    assert not pool.release(np.zeros(3))
+    assert pool.stats() == {'allocated': 1, 'reused': 1, 'leased': 1, 'free': 0}
+
+
+def test_stream_scenes_reuses_frame_buffers(tmp_path):
+    pool = frame_pool.shared_pool()
+    pool.clear()
+    before = pool.stats()
+    pipeline = UAVDataPipeline(str(tmp_path), seed=3, resolution=(64, 48))
+    list(pipeline.stream_scenes(20, queue_size=2))
+    after = pool.stats()
+    allocated, reused = after['allocated'] - before['allocated'], after['reused'] - before['reused']
+    # 每个场景取一次缓冲，全部归还；分配次数受在途队列限制
+    assert after['leased'] == before['leased']
+    assert allocated + reused == 20 and allocated < 20
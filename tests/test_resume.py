@@ -0,0 +1,122 @@
+"""
+续跑与清单测试
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from scripts.data_pipeline import MANIFEST_FILE, UAVDataPipeline
+from scripts.dataset_utils import manifest as manifest_module
+from scripts.dataset_utils.array_store import ArrayStore
+from scripts.dataset_utils.manifest import Manifest
+
+RESOLUTION = (64, 48)
+
+
+def _pipeline(output_dir, **kwargs):
+    return UAVDataPipeline(str(output_dir), seed=7, resolution=RESOLUTION, **kwargs)
+
+
+def _generate(pipeline, num_scenes, **kwargs):
+    return [scene['scene_id'] for scene in pipeline.stream_scenes(num_scenes, **kwargs)]
+
+
+def test_resume_skips_finished_scenes(tmp_path):
+    assert _generate(_pipeline(tmp_path), 4) == [0, 1, 2, 3]
+    with open(tmp_path / "scene_001.png", 'rb') as f:
+        before = f.read()
+    # 删除一个输出文件：只有该场景需要重新生成
+    (tmp_path / "scene_002.png").unlink()
+    assert _generate(_pipeline(tmp_path, resume=True), 4) == [2]
+    with open(tmp_path / "scene_001.png", 'rb') as f:
+        assert f.read() == before
+
+
+def test_resume_without_seed_reuses_manifest_seed(tmp_path):
+    first = UAVDataPipeline(str(tmp_path), resolution=RESOLUTION)
+    assert _generate(first, 4) == [0, 1, 2, 3]
+    # 未指定 --seed 续跑：沿用清单中的根种子，未变化的场景全部跳过，新增场景与一次生成的结果相同
+    resumed = UAVDataPipeline(str(tmp_path), resolution=RESOLUTION, resume=True)
+    assert resumed.seed == first.seed
+    assert _generate(resumed, 6) == [4, 5]
+    assert _generate(UAVDataPipeline(str(tmp_path), resolution=RESOLUTION, resume=True), 6) == []
+
+
+def test_resume_without_seed_rejects_manifest_without_seed(tmp_path):
+    _generate(_pipeline(tmp_path), 2)
+    path = os.path.join(tmp_path, MANIFEST_FILE)
+    with open(path) as f:
+        manifest = json.load(f)
+    del manifest['scenes']['1']['seed']
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError, match="--seed"):
+        UAVDataPipeline(str(tmp_path), resolution=RESOLUTION, resume=True)
+    # 指定种子时照常续跑
+    assert _generate(_pipeline(tmp_path, resume=True), 2) == []
+
+
+def test_manifest_appends_records_and_compacts_once(tmp_path, monkeypatch):
+    path = str(tmp_path / MANIFEST_FILE)
+    journal = str(tmp_path / "manifest.jsonl")
+    snapshots = []
+    write_json_atomic = manifest_module.write_json_atomic
+    monkeypatch.setattr(manifest_module, 'write_json_atomic',
+                        lambda *args, **kwargs: snapshots.append(args[0]) or write_json_atomic(*args, **kwargs))
+
+    manifest = Manifest(path)
+    for scene_id in range(250):
+        manifest.record(scene_id, {'root_seed': 1, 'spawn_key': [scene_id]}, 'hash', {f"scene_{scene_id:03d}.png": 'x'})
+    # 记录过程中不重写完整清单，只追加日志
+    assert snapshots == [] and not os.path.exists(path)
+    # 进程中断：最后一行未写完，重放日志得到其余全部条目
+    with open(journal, 'a') as f:
+        f.write('["250", {"status"')
+    assert len(Manifest(path)) == 250
+
+    manifest.save()
+    assert snapshots == [path] and not os.path.exists(journal)
+    assert len(Manifest(path)) == 250 and Manifest(path).is_current(249, 'hash')
+
+
+def test_manifest_part_journals_are_consolidated(tmp_path):
+    path = str(tmp_path / MANIFEST_FILE)
+    for part, scene_ids in (('a', [0, 1]), ('b', [2])):
+        manifest = Manifest(path, part=part)
+        for scene_id in scene_ids:
+            manifest.record(scene_id, None, 'hash', {})
+        manifest.close()
+    # 尚未压实的 part 只有日志，读取时同样可见
+    assert sorted(os.listdir(tmp_path)) == ['manifest.a.jsonl', 'manifest.b.jsonl']
+    assert len(Manifest(path)) == 3
+    assert Manifest.consolidate(path) == 3
+    assert os.listdir(tmp_path) == [MANIFEST_FILE]
+
+
+def test_resume_with_more_scenes_keeps_array_rows(tmp_path):
+    _generate(_pipeline(tmp_path, array_split='train'), 12, annotate=True)
+    depth = np.array(ArrayStore.open(str(tmp_path), 'train').depth[:12])
+
+    assert _generate(_pipeline(tmp_path, array_split='train', resume=True), 20, annotate=True) == list(range(12, 20))
+    store = ArrayStore.open(str(tmp_path), 'train')
+    assert store.ids.tolist() == list(range(20))
+    np.testing.assert_array_equal(store.depth[:12], depth)
+
+
+def test_resume_regenerates_scene_missing_from_array_store(tmp_path):
+    _generate(_pipeline(tmp_path, array_split='train'), 4, annotate=True)
+    store = ArrayStore.open(str(tmp_path), 'train', mode='r+')
+    store.ids[1] = -1
+    store.flush()
+    del store
+    assert _generate(_pipeline(tmp_path, array_split='train', resume=True), 4, annotate=True) == [1]
+
+
+def test_array_store_rejects_different_frame_size(tmp_path):
+    ArrayStore.create(str(tmp_path), 'train', 4, 48, 64)
+    with pytest.raises(ValueError):
+        ArrayStore.open_or_create(str(tmp_path), 'train', 4, 96, 128)
+    assert ArrayStore.open(str(tmp_path), 'train').depth.shape == (4, 48, 64)
@@ -0,0 +1,67 @@
+"""
+场景生成测试
+"""
+
+import json
+
+import numpy as np
+
+from scripts.data_pipeline import CAMERA_CLEARANCE, UAVDataPipeline
+from scripts.dataset_utils.scene_model import SceneObjects, dumps_json
+from scripts.image_processing.annotation_generator import AnnotationGenerator
+
+
+def test_objects_below_camera_and_visible(tmp_path):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=0, resolution=(64, 48))
+    generator = AnnotationGenerator()
+    for scene_id in range(10):
+        scene_data = pipeline._create_scene(scene_id)
+        objects = scene_data['objects']
+        altitude = scene_data['camera_parameters']['position'][2]
+        assert altitude >= CAMERA_CLEARANCE * (objects.positions[:, 2] + objects.sizes[:, 2]).max()
+
+        image = pipeline._render_scene(scene_data)
+        annotations = generator.annotate_scene(image, scene_data, "scene.png")[0]
+        assert annotations['bounding_boxes'], scene_data['scene_type']
+        # 画面不是单一颜色（相机不在物体内部）
+        assert len(np.unique(image.reshape(-1, 3), axis=0)) > 2
+
+
+def test_urban_heights_cycle():
+    pipeline = UAVDataPipeline(None, seed=0, objects_per_scene=12)
+    objects = pipeline._create_scene(0)['objects']
+    assert objects.sizes[:, 2].tolist() == [150, 200, 250, 300, 350] * 2 + [150, 200]
+    assert pipeline._create_scene(0)['camera_parameters']['position'][2] == CAMERA_CLEARANCE * 350
+
+
+def test_scene_objects_match_object_list():
+    scene_data = UAVDataPipeline(None, seed=2, objects_per_scene=40)._create_scene(1)
+    objects = scene_data['objects']
+    listed = objects.to_list()
+    assert [objects[i] for i in range(len(objects))] == listed == list(objects)
+    restored = SceneObjects.from_list(listed)
+    assert restored.to_list() == listed and restored.positions.dtype == objects.positions.dtype
+    # 由数组直接生成的 JSON 与对物体列表 json.dumps 的结果逐字节相同
+    assert dumps_json(scene_data) == json.dumps(dict(scene_data, objects=listed), indent=2)
+
+
+def test_scene_objects_json_with_floats_and_unknown_types():
+    listed = [
+        {'type': 'tree', 'position': [0.5, -1e-07, 3.0], 'size': [1.25, 2.0, 1e+20], 'color': [0, 128, 255]},
+        {'type': 'vehicle', 'position': [10.0, 20.0, 0.0], 'size': [4.0, 2.0, 1.5], 'color': [1, 2, 3]}
+    ]
+    objects = SceneObjects.from_list(listed)
+    assert objects.classes[-1] == 'vehicle' and objects.types == ['tree', 'vehicle']
+    assert dumps_json({'objects': objects}, indent=4) == json.dumps({'objects': listed}, indent=4)
+    assert objects.subset([1]).to_list() == listed[1:]
+    assert SceneObjects.concatenate([objects.subset([1]), objects.subset([0])]).to_list() == listed[::-1]
+
+
+def test_public_api_returns_object_lists(tmp_path):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=2, resolution=(64, 48))
+    scenes = pipeline.generate_synthetic_scenes(3)
+    for scene in scenes + list(pipeline.iter_scenes(3)) + [pipeline.regenerate_scene(1)[0]]:
+        assert isinstance(scene['objects'], list)
+        json.dumps(scene)
+    with open(tmp_path / "scene_001.json") as f:
+        assert scenes[1]['objects'] == json.load(f)['objects']
@@ -0,0 +1,41 @@
+"""
+逐场景种子与单场景重建测试
+"""
+
+import cv2
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.array_store import ArrayStore
+
+RESOLUTION = (64, 48)
+
+
+def _pipeline(output_dir=None, **kwargs):
+    return UAVDataPipeline(str(output_dir) if output_dir is not None else None, seed=11, resolution=RESOLUTION,
+                           **kwargs)
+
+
+def test_regenerate_scene_matches_sequential_generation(tmp_path):
+    scenes = list(_pipeline(tmp_path).stream_scenes(4))
+    scene_data, image = _pipeline().regenerate_scene(2)
+    assert scene_data['objects'] == scenes[2]['objects']
+    np.testing.assert_array_equal(image, cv2.imread(str(tmp_path / "scene_002.png")))
+
+
+def test_scene_ids_regeneration_keeps_other_array_rows(tmp_path):
+    list(_pipeline(tmp_path, array_split='train').stream_scenes(12, annotate=True))
+    before = ArrayStore.open(str(tmp_path), 'train')
+    depth, ids = np.array(before.depth), before.ids.tolist()
+    del before
+
+    list(_pipeline(tmp_path, array_split='train').stream_scenes(5, annotate=True, scene_ids=[3]))
+    store = ArrayStore.open(str(tmp_path), 'train')
+    assert store.ids.tolist() == ids == list(range(12))
+    np.testing.assert_array_equal(store.depth, depth)
+
+
+def test_scene_ids_beyond_store_grow_it(tmp_path):
+    list(_pipeline(tmp_path, array_split='train').stream_scenes(4, annotate=True))
+    list(_pipeline(tmp_path, array_split='train').stream_scenes(4, annotate=True, scene_ids=[6]))
+    assert ArrayStore.open(str(tmp_path), 'train').ids.tolist() == [0, 1, 2, 3, -1, -1, 6]
@@ -0,0 +1,75 @@
+"""
+空间索引测试
+"""
+
+import numpy as np
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.image_processing.camera import pixel_boxes, project_arrays
+from scripts.image_processing.spatial_index import GridIndex
+
+
+def _world(num_cells=4, seed=5):
+    pipeline = UAVDataPipeline(None, seed=seed, resolution=(64, 48))
+    return pipeline, pipeline.create_world(num_cells, num_cells)
+
+
+def _random_cameras(rng, extent, count):
+    """正射与倾斜相机，部分低于最高建筑（350）以覆盖高于相机的物体"""
+    cameras = []
+    for _ in range(count):
+        x, y = rng.uniform(-extent, extent, 2)
+        cameras.append({
+            'position': [float(x), float(y), float(rng.choice([120.0, 200.0, 300.0, 600.0, 1200.0]))],
+            'rotation': [float(rng.uniform(-90, -55)), float(rng.uniform(-180, 180)), float(rng.uniform(-10, 10))],
+            'fov': float(rng.choice([45.0, 60.0, 90.0]))
+        })
+    return cameras
+
+
+def test_visible_never_misses_projected_objects():
+    _, world = _world()
+    extent = world.cols * world.cell_size / 2
+    rng = np.random.default_rng(0)
+    # 自动单元边长与世界单元边长两种索引
+    indexes = [GridIndex(world.positions, world.sizes), world.index]
+    culled = 0
+    for camera in _random_cameras(rng, extent, 200):
+        geometry = project_arrays(world.positions, world.sizes, world.shapes, camera, 64, 48)
+        expected = set(np.flatnonzero(pixel_boxes(geometry, 64, 48)[1]).tolist())
+        for index in indexes:
+            ids = index.visible(camera, 64, 48)
+            assert np.all(np.diff(ids) > 0)
+            assert expected <= set(ids.tolist()), camera
+            culled += len(world.positions) - len(ids)
+    # 索引确实剔除了视野外的物体
+    assert culled > 0
+
+
+def test_horizon_in_view_returns_all_objects():
+    _, world = _world(2)
+    camera = {'position': [0.0, 0.0, 200.0], 'rotation': [-20, 0, 0], 'fov': 60}
+    assert world.index.visible(camera, 64, 48).tolist() == list(range(len(world.positions)))
+
+
+def test_query_is_superset_of_exact_rectangle():
+    rng = np.random.default_rng(1)
+    positions = np.column_stack([rng.uniform(-500, 500, (400, 2)), np.zeros(400)])
+    sizes = np.full((400, 3), 10.0)
+    index = GridIndex(positions, sizes)
+    for _ in range(50):
+        x0, y0 = rng.uniform(-600, 500, 2)
+        x1, y1 = x0 + rng.uniform(0, 300), y0 + rng.uniform(0, 300)
+        inside = ((positions[:, 0] >= x0) & (positions[:, 0] <= x1)
+                  & (positions[:, 1] >= y0) & (positions[:, 1] <= y1))
+        assert set(np.flatnonzero(inside).tolist()) <= set(index.query(x0, y0, x1, y1).tolist())
+    assert index.query(2000, 2000, 3000, 3000).tolist() == []
+
+
+def test_render_views_match_full_render():
+    pipeline, world = _world(3)
+    scene_data = {'scene_id': 0, 'scene_type': 'urban', 'objects': world.objects, 'lighting_conditions': 'daylight'}
+    cameras = _random_cameras(np.random.default_rng(2), world.cols * world.cell_size / 2, 8)
+    for camera_parameters, image in pipeline.render_views(scene_data, cameras):
+        full = pipeline._render_scene(dict(scene_data, camera_parameters=camera_parameters))
+        assert np.array_equal(image, full)
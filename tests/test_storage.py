@@ -0,0 +1,89 @@
+"""
+存储布局测试
+"""
+
+import json
+import os
+import tarfile
+
+import numpy as np
+import pytest
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.async_writer import AsyncSampleWriter
+from scripts.dataset_utils.storage import ImageEncoder, ShardReader, ShardWriter, encode_sample
+
+
+def _sample(scene_id):
+    image = np.full((6, 8, 3), scene_id, dtype=np.uint8)
+    return encode_sample({f"scene_{scene_id:03d}": image, f"scene_{scene_id:03d}.json": {'scene_id': scene_id}},
+                         ImageEncoder('png'))
+
+
+def test_shard_round_trip_and_append(tmp_path):
+    samples = {scene_id: _sample(scene_id) for scene_id in range(7)}
+    with ShardWriter(str(tmp_path), samples_per_shard=2) as writer:
+        for scene_id in range(5):
+            writer.write_sample(scene_id, samples[scene_id])
+    # 追加写入：新建分片并合并索引，已有分片不变
+    with ShardWriter(str(tmp_path), samples_per_shard=2) as writer:
+        for scene_id in (5, 6):
+            writer.write_sample(scene_id, samples[scene_id])
+
+    with ShardReader(str(tmp_path)) as reader:
+        assert reader.scene_ids() == list(range(7))
+        assert len(reader.index['shards']) == 4
+        for scene_id, files in samples.items():
+            assert sorted(reader.members(scene_id)) == sorted(files)
+            for name, data in files.items():
+                assert reader.read(scene_id, name) == data
+        sample = reader.load_sample(3)
+        assert np.array_equal(sample['scene_003.png'], np.full((6, 8, 3), 3, dtype=np.uint8))
+        assert sample['scene_003.json'] == {'scene_id': 3}
+
+    # 分片是标准 tar，可用 tarfile 直接解包
+    with tarfile.open(os.path.join(tmp_path, "shard_000000.tar")) as tar:
+        assert tar.extractfile('scene_001.png').read() == samples[1]['scene_001.png']
+
+
+def test_shard_storage_matches_file_storage(tmp_path):
+    for storage in ('files', 'shards'):
+        pipeline = UAVDataPipeline(str(tmp_path / storage), seed=4, resolution=(64, 48), storage=storage,
+                                   samples_per_shard=2)
+        list(pipeline.stream_scenes(3, annotate=True))
+    with ShardReader(str(tmp_path / "shards")) as reader:
+        assert reader.scene_ids() == [0, 1, 2]
+        for scene_id in reader.scene_ids():
+            for name in reader.members(scene_id):
+                with open(tmp_path / "files" / name, 'rb') as f:
+                    data = f.read()
+                if name.endswith('.json'):
+                    shard_data, file_data = json.loads(reader.read(scene_id, name)), json.loads(data)
+                    shard_data.pop('timestamp', None)
+                    file_data.pop('timestamp', None)
+                    assert shard_data == file_data, name
+                else:
+                    assert reader.read(scene_id, name) == data, name
+
+
+def test_async_writer_matches_synchronous_writes(tmp_path):
+    for name, writer_threads in (('sync', 0), ('async', 3)):
+        pipeline = UAVDataPipeline(str(tmp_path / name), seed=8, resolution=(64, 48), image_format='webp',
+                                   writer_threads=writer_threads)
+        list(pipeline.stream_scenes(5, annotate=True))
+    names = sorted(os.listdir(tmp_path / "sync"))
+    assert names == sorted(os.listdir(tmp_path / "async"))
+    for name in names:
+        if name.endswith('.webp') or name.endswith('.npy'):
+            assert (tmp_path / "sync" / name).read_bytes() == (tmp_path / "async" / name).read_bytes(), name
+
+
+def test_async_writer_reports_sink_errors():
+    class FailingSink:
+        def write_sample(self, scene_id, files):
+            raise OSError("disk full")
+
+    writer = AsyncSampleWriter(FailingSink(), ImageEncoder('png'), num_threads=2)
+    writer.submit(0, {'scene_000': np.zeros((4, 4, 3), dtype=np.uint8)})
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
@@ -0,0 +1,68 @@
+"""
+流式处理测试
+"""
+
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.streaming import StreamPipeline, bounded_map
+
+
+def test_stream_pipeline_keeps_order_and_applies_backpressure():
+    consumed = []
+
+    def source():
+        for i in itertools.count():
+            consumed.append(i)
+            yield i
+
+    pipeline = StreamPipeline([('double', lambda x: 2 * x), ('inc', lambda x: x + 1)], queue_size=2)
+    results = pipeline.run(source())
+    assert list(itertools.islice(results, 10)) == [2 * i + 1 for i in range(10)]
+    results.close()
+    # 无限输入只被读取到队列容量为止
+    assert len(consumed) <= 10 + 3 * (2 + 1) + 1
+
+
+def test_stream_pipeline_raises_stage_errors():
+    def fail(x):
+        if x == 3:
+            raise RuntimeError("stage failed")
+        return x
+
+    with pytest.raises(RuntimeError, match="stage failed"):
+        list(StreamPipeline([('fail', fail)]).run(range(10)))
+
+
+def test_bounded_map_limits_tasks_in_flight():
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def work(x):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        with lock:
+            state['running'] -= 1
+        return x * x
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        submitted = []
+        results = bounded_map(executor, work, (submitted.append(i) or i for i in range(50)), max_in_flight=3)
+        assert next(results) == 0
+        assert len(submitted) == 3
+        assert list(results) == [i * i for i in range(1, 50)]
+    assert state['peak'] <= 3
+
+
+def test_stream_scenes_is_lazy(tmp_path):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=1, resolution=(64, 48))
+    scenes = pipeline.stream_scenes(1000, queue_size=2)
+    assert [scene['scene_id'] for scene in itertools.islice(scenes, 3)] == [0, 1, 2]
+    scenes.close()
+    written = [name for name in tmp_path.iterdir() if name.suffix == '.png']
+    assert 3 <= len(written) < 30
@@ -0,0 +1,48 @@
+"""
+分块渲染测试
+"""
+
+import hashlib
+
+import cv2
+import numpy as np
+import pytest
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.image_processing import tiled_renderer
+
+WIDTH, HEIGHT = 300, 200
+
+
+@pytest.fixture
+def scenes():
+    pipeline = UAVDataPipeline(None, seed=13, resolution=(WIDTH, HEIGHT), objects_per_scene=12)
+    return [(scene_data, pipeline._render_scene(scene_data)) for scene_data in pipeline.iter_scenes(5)]
+
+
+def test_read_tiles_matches_full_frame(tmp_path, scenes):
+    for scene_data, full in scenes:
+        tile_dir = str(tmp_path / f"scene_{scene_data['scene_id']:03d}")
+        tiled_renderer.write_tiles(scene_data, tile_dir, WIDTH, HEIGHT, tile_size=64)
+        assert np.array_equal(tiled_renderer.read_tiles(tile_dir), full)
+        # 跨越多个分块的区域
+        region = tiled_renderer.read_tiles(tile_dir, region=(50, 30, 100, 90))
+        assert np.array_equal(region, full[30:120, 50:150])
+
+
+def test_streamed_png_matches_full_frame(tmp_path, scenes):
+    for scene_data, full in scenes:
+        path = str(tmp_path / f"scene_{scene_data['scene_id']:03d}.png")
+        digest = tiled_renderer.write_streamed_png(scene_data, path, WIDTH, HEIGHT, strip_height=48)
+        assert np.array_equal(cv2.imread(path), full)
+        with open(path, 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == digest
+
+
+def test_png_stream_writer_rejects_incomplete_image(tmp_path):
+    path = tmp_path / "partial.png"
+    writer = tiled_renderer.PNGStreamWriter(str(path), 8, 4)
+    writer.write_rows(np.zeros((3, 8, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        writer.close()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,113 @@
+"""
+数据集验证测试
+"""
+
+import os
+
+import pytest
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.array_store import ArrayStore
+from scripts.dataset_utils.validate_dataset_fixed import DatasetValidator
+
+
+def _generate(output_dir, **kwargs):
+    pipeline = UAVDataPipeline(str(output_dir), seed=9, resolution=(64, 48), **kwargs)
+    return list(pipeline.stream_scenes(3, annotate=True))
+
+
+def _validate(data_dir, use_cache=False, **kwargs):
+    return DatasetValidator(str(data_dir), workers=1, use_cache=use_cache, **kwargs).validate_all()
+
+
+def test_png_dataset_passes(tmp_path):
+    _generate(tmp_path)
+    results = _validate(tmp_path, deep=True)
+    assert all(result['status'] for result in results.values())
+    # 每个场景：图像、掩码、实例掩码、深度图
+    assert len(results['image_files']['details']) == 12
+
+
+def test_webp_and_npy_images_are_validated(tmp_path):
+    _generate(tmp_path, image_format='webp', depth_format='float32')
+    results = _validate(tmp_path, deep=True)
+    assert results['image_files']['status'], results['image_files']
+    checked = {detail['file'] for detail in results['image_files']['details']}
+    assert {'scene_000.webp', 'scene_000_depth.npy'} <= checked
+
+
+def test_shard_dataset_is_validated(tmp_path):
+    _generate(tmp_path, storage='shards', samples_per_shard=2)
+    results = _validate(tmp_path, deep=True)
+    assert results['directory_structure']['details']['layout'] == 'shards'
+    assert all(result['status'] for result in results.values())
+
+
+def test_array_split_dataset_is_consistent(tmp_path):
+    _generate(tmp_path, array_split='train')
+    results = _validate(tmp_path)
+    assert all(result['status'] for result in results.values()), results['data_consistency']
+
+    # 存储中的行不属于该场景时报告缺失
+    store = ArrayStore.open(str(tmp_path), 'train', mode='r+')
+    store.ids[1] = -1
+    store.flush()
+    del store
+    assert _validate(tmp_path)['data_consistency']['details'] == [
+        {'image': 'scene_001.png', 'missing_files': ['train_mask.npy[1]', 'train_depth.npy[1]']}
+    ]
+
+
+def test_truncated_image_fails_header_check(tmp_path):
+    _generate(tmp_path, image_format='webp', depth_format='float32')
+    for name in ('scene_001.webp', 'scene_001_depth.npy', 'scene_002_mask.webp'):
+        path = tmp_path / name
+        path.write_bytes(path.read_bytes()[:-16])
+    results = _validate(tmp_path)
+    failed = {detail['file'] for detail in results['image_files']['details'] if detail['status'] == '❌'}
+    assert failed == {'scene_001.webp', 'scene_001_depth.npy', 'scene_002_mask.webp'}
+
+
+def test_directory_scanned_once(tmp_path, monkeypatch):
+    _generate(tmp_path)
+    (tmp_path / "scene_002_depth.png").unlink()
+    (tmp_path / "scene_001_depth.png").rename(tmp_path / "depth_scene_001.png")
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scans.append(path) or scandir(path))
+    monkeypatch.setattr(os, 'listdir', lambda path: pytest.fail("listdir 不应被调用"))
+
+    validator = DatasetValidator(str(tmp_path), workers=1, use_cache=False)
+    results = validator.validate_all()
+    assert scans == [str(tmp_path)]
+    assert validator.index.scenes['scene_000'] == {
+        'image': 'scene_000.png', 'metadata': 'scene_000.json', 'annotations': 'scene_000_annotations.json',
+        'mask': 'scene_000_mask.png', 'depth': 'scene_000_depth.png', 'instances': 'scene_000_instances.png'
+    }
+    # 旧命名的深度图仍视为存在，缺失的深度图被报告
+    assert results['data_consistency']['details'] == [
+        {'image': 'scene_002.png', 'missing_files': ['scene_002_depth.png']}
+    ]
+
+
+def test_cache_rechecks_only_changed_files(tmp_path):
+    _generate(tmp_path)
+    first = _validate(tmp_path, use_cache=True)['validation_cache']
+    assert first['cached'] == 0 and first['recomputed'] > 0
+
+    second = _validate(tmp_path, use_cache=True)['validation_cache']
+    assert (second['cached'], second['recomputed']) == (first['recomputed'], 0)
+
+    path = tmp_path / "scene_001.png"
+    path.write_bytes(path.read_bytes()[:-16])
+    results = _validate(tmp_path, use_cache=True)
+    assert results['validation_cache']['recomputed'] == 1
+    failed = [detail['file'] for detail in results['image_files']['details'] if detail['status'] == '❌']
+    assert failed == ['scene_001.png']
+
+
+def test_parallel_validation_matches_serial(tmp_path):
+    _generate(tmp_path)
+    serial = _validate(tmp_path, deep=True)
+    parallel = DatasetValidator(str(tmp_path), deep=True, workers=2, use_cache=False, chunk_size=2).validate_all()
+    assert parallel == serial
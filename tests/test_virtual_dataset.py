@@ -0,0 +1,53 @@
+"""
+虚拟数据集测试
+"""
+
+import pickle
+
+import cv2
+import numpy as np
+import pytest
+
+from scripts.data_pipeline import UAVDataPipeline
+from scripts.dataset_utils.virtual_dataset import SampleCache, VirtualUAVDataset
+
+
+def test_samples_match_generated_dataset(tmp_path):
+    pipeline = UAVDataPipeline(str(tmp_path), seed=21, resolution=(64, 48))
+    list(pipeline.stream_scenes(4, annotate=True))
+    dataset = VirtualUAVDataset(4, seed=21, resolution=(64, 48))
+    for scene_id in range(4):
+        sample = dataset[scene_id]
+        stem = tmp_path / f"scene_{scene_id:03d}"
+        assert np.array_equal(sample['image'], cv2.imread(f"{stem}.png"))
+        assert np.array_equal(sample['segmentation_mask'], cv2.imread(f"{stem}_mask.png", cv2.IMREAD_UNCHANGED))
+        assert not sample['image'].flags.writeable
+    assert dataset[-1]['scene_id'] == 3
+    with pytest.raises(IndexError):
+        dataset[4]
+
+
+def test_cache_hits_and_lru_eviction():
+    dataset = VirtualUAVDataset(5, seed=1, annotate=False, resolution=(64, 48), cache_size=2)
+    first = dataset[0]
+    assert dataset[0] is first
+    dataset[1]
+    dataset[2]
+    # 容量为 2：场景 0 已被淘汰，重新渲染得到相同像素的新样本
+    again = dataset[0]
+    assert again is not first and np.array_equal(again['image'], first['image'])
+    info = dataset.cache_info()
+    assert (info['hits'], info['misses'], info['items']) == (1, 4, 2)
+
+
+def test_sample_cache_byte_limit():
+    cache = SampleCache(max_items=10, max_bytes=250)
+    for key in range(4):
+        cache.put(key, key, nbytes=100)
+    assert (len(cache), cache.nbytes) == (2, 200)
+    assert cache.get(0) is None and cache.get(3) == 3
+    cache.put('large', 'value', nbytes=300)
+    assert cache.get('large') is None
+    # 传给子进程时只复制配置
+    copy = pickle.loads(pickle.dumps(cache))
+    assert (len(copy), copy.max_bytes) == (0, 250)
@@ -0,0 +1,54 @@
+"""
+租约工作队列测试
+"""
+
+import os
+import time
+
+from scripts.data_pipeline import MANIFEST_FILE, UAVDataPipeline
+from scripts.dataset_utils.manifest import Manifest
+from scripts.dataset_utils.work_queue import LeaseQueue
+
+
+def _age_lease(queue, name, seconds):
+    path = os.path.join(queue.lease_dir, f"{name}.lease")
+    mtime = os.stat(path).st_mtime - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_lease_stolen_after_ttl(tmp_path):
+    first = LeaseQueue(str(tmp_path), 30, chunk_size=10, ttl=60, worker_id="first")
+    second = LeaseQueue(str(tmp_path), 30, chunk_size=10, ttl=60, worker_id="second")
+    assert first.claim() == 0
+    # 有效租约不能被认领
+    assert second.claim() == 1
+    assert first.owner("chunk_000000") == "first"
+
+    _age_lease(first, "chunk_000000", 120)
+    assert second.claim() == 0
+    assert second.owner("chunk_000000") == "second"
+    # 原持有者心跳失败，得知租约已丢失
+    assert not first.heartbeat("chunk_000000")
+    assert second.heartbeat("chunk_000000")
+
+    for name in ("chunk_000000", "chunk_000001"):
+        second.complete(name)
+    assert first.pending() == [2]
+    assert first.claim() == 2 and second.claim() is None
+    first.complete("chunk_000002")
+    assert second.all_done()
+
+
+def test_shared_generation_recovers_crashed_worker(tmp_path):
+    # 模拟已崩溃进程留下的租约
+    crashed = LeaseQueue(str(tmp_path), 6, chunk_size=2, ttl=60, worker_id="crashed")
+    assert crashed.claim() == 0
+    _age_lease(crashed, "chunk_000000", 120)
+
+    pipeline = UAVDataPipeline(str(tmp_path), seed=5, resolution=(64, 48))
+    start = time.perf_counter()
+    assert pipeline.generate_shared(6, chunk_size=2, lease_ttl=60) == 6
+    assert time.perf_counter() - start < 30
+    manifest = Manifest(os.path.join(tmp_path, MANIFEST_FILE))
+    assert sorted(manifest.entries) == [str(scene_id) for scene_id in range(6)]
+    assert all((tmp_path / f"scene_{scene_id:03d}.png").exists() for scene_id in range(6))